@@ -0,0 +1,260 @@
+"""
+Motor de alertas avaliado sobre as cotações de cada execução.
+
+As regras são compiladas uma única vez (no cold start) e avaliadas de
+forma colunar sobre todas as cotações da execução: os campos são
+extraídos uma vez em colunas (preço, variação, volume, volume médio) e
+cada regra percorre apenas as colunas de que precisa. Os eventos passam
+por um cool-down por (regra, símbolo) e seguem para um sink plugável;
+emit() retorna os eventos entregues, e só eles iniciam o cool-down (um
+alerta que falhou volta a ser avaliado na execução seguinte).
+
+Tipos de regra:
+    {"id": "...", "type": "price_above", "symbol": "AAPL", "value": 200}
+    {"id": "...", "type": "price_below", "symbol": "*", "value": 10}
+    {"id": "...", "type": "pct_move", "threshold": 3.0}
+    {"id": "...", "type": "volume_spike", "multiplier": 3.0}
+
+Configuração por ambiente:
+    ALERT_RULES  JSON com a lista de regras (padrão: DEFAULT_RULES)
+    ALERT_SINK   log | file:/caminho.jsonl | sns:<topic-arn> | sqs:<queue-url>
+"""
+
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES = [
+    {"id": "big-move", "type": "pct_move", "threshold": 3.0},
+    {"id": "volume-spike", "type": "volume_spike", "multiplier": 3.0},
+]
+DEFAULT_COOLDOWN = 900   # 15 minutos por (regra, símbolo)
+VOLUME_WINDOW = 12       # Média móvel das últimas 12 barras (1 hora)
+
+
+# ===== SINKS =====
+class LogSink:
+    """Escreve os alertas no log (padrão)"""
+
+    def emit(self, events: List[Dict]) -> List[Dict]:
+        for event in events:
+            logger.warning(f"🚨 ALERTA {event['rule_id']}: {event['symbol']} - {event['message']}")
+        return events
+
+
+class FileSink:
+    """Anexa os alertas em um arquivo JSON Lines"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def emit(self, events: List[Dict]) -> List[Dict]:
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write("".join(json.dumps(event) + "\n" for event in events))
+        return events
+
+
+class SNSSink:
+    """Publica cada alerta em um tópico SNS"""
+
+    def __init__(self, topic_arn: str, client=None):
+        import boto3
+
+        self.topic_arn = topic_arn
+        self.client = client or boto3.client('sns')
+
+    def emit(self, events: List[Dict]) -> List[Dict]:
+        delivered = []
+        for event in events:
+            try:
+                self.client.publish(
+                    TopicArn=self.topic_arn,
+                    Subject=f"Alerta {event['symbol']}: {event['rule_id']}"[:100],
+                    Message=json.dumps(event)
+                )
+            except Exception as e:
+                logger.error(f"❌ Falha ao publicar alerta {event['rule_id']} de {event['symbol']}: {str(e)}")
+                continue
+            delivered.append(event)
+        return delivered
+
+
+class SQSSink:
+    """Envia os alertas para uma fila SQS (em lotes de 10)"""
+
+    def __init__(self, queue_url: str, client=None):
+        import boto3
+
+        self.queue_url = queue_url
+        self.client = client or boto3.client('sqs')
+
+    def emit(self, events: List[Dict]) -> List[Dict]:
+        delivered = []
+        for start in range(0, len(events), 10):
+            batch = events[start:start + 10]
+            try:
+                response = self.client.send_message_batch(
+                    QueueUrl=self.queue_url,
+                    Entries=[{"Id": str(idx), "MessageBody": json.dumps(event)}
+                             for idx, event in enumerate(batch)]
+                )
+            except Exception as e:
+                logger.error(f"❌ Falha ao enviar {len(batch)} alertas: {str(e)}")
+                continue
+            # O lote pode falhar parcialmente (HTTP 200 com entradas em Failed)
+            failed = {entry["Id"]: entry.get("Message", entry.get("Code")) for entry in response.get("Failed", [])}
+            for idx, event in enumerate(batch):
+                if str(idx) in failed:
+                    logger.error(f"❌ Alerta {event['rule_id']} de {event['symbol']} não enviado: "
+                                 f"{failed[str(idx)]}")
+                else:
+                    delivered.append(event)
+        return delivered
+
+
+def sink_from_config(config: str):
+    """Cria o sink a partir de 'log', 'file:...', 'sns:...' ou 'sqs:...'"""
+    kind, _, target = config.partition(":")
+    if kind == "file":
+        return FileSink(target)
+    if kind == "sns":
+        return SNSSink(target)
+    if kind == "sqs":
+        return SQSSink(target)
+    return LogSink()
+
+
+# ===== COMPILAÇÃO DAS REGRAS =====
+# Cada regra compilada recebe as colunas e devolve [(índice, mensagem)]
+CompiledRule = Callable[[Dict[str, list]], List[tuple]]
+
+
+def _symbol_mask(spec: Dict) -> Callable[[str], bool]:
+    target = spec.get("symbol", "*")
+    if target == "*":
+        return lambda symbol: True
+    targets = {target} if isinstance(target, str) else set(target)
+    return targets.__contains__
+
+
+def compile_rule(spec: Dict) -> CompiledRule:
+    """Compila uma regra declarativa em uma função sobre colunas"""
+    rule_type = spec["type"]
+    matches = _symbol_mask(spec)
+
+    if rule_type in ("price_above", "price_below"):
+        value = float(spec["value"])
+        above = rule_type == "price_above"
+
+        def rule(columns):
+            return [(idx, f"preço {price:.2f} {'acima' if above else 'abaixo'} de {value:.2f}")
+                    for idx, (symbol, price) in enumerate(zip(columns["symbol"], columns["price"]))
+                    if matches(symbol) and (price > value if above else price < value)]
+        return rule
+
+    if rule_type == "pct_move":
+        threshold = float(spec["threshold"])
+
+        def rule(columns):
+            return [(idx, f"variação de {change:+.2f}%")
+                    for idx, (symbol, change) in enumerate(zip(columns["symbol"], columns["change_percent"]))
+                    if matches(symbol) and abs(change) >= threshold]
+        return rule
+
+    if rule_type == "volume_spike":
+        multiplier = float(spec["multiplier"])
+
+        def rule(columns):
+            return [(idx, f"volume {volume:,} = {volume / average:.1f}x a média")
+                    for idx, (symbol, volume, average) in enumerate(
+                        zip(columns["symbol"], columns["volume"], columns["avg_volume"]))
+                    if matches(symbol) and average > 0 and volume >= multiplier * average]
+        return rule
+
+    raise ValueError(f"Tipo de regra desconhecido: {rule_type}")
+
+
+# ===== MOTOR =====
+class AlertEngine:
+    """Avalia regras compiladas sobre lotes de cotações"""
+
+    def __init__(self, rules: List[Dict], sink, cooldown: int = DEFAULT_COOLDOWN):
+        self.rules = [(spec.get("id", spec["type"]), int(spec.get("cooldown", cooldown)),
+                       compile_rule(spec)) for spec in rules]
+        self.sink = sink
+        self._last_emitted: Dict[tuple, float] = {}
+        self._volumes: Dict[str, deque] = {}
+        self._last_bar: Dict[str, str] = {}
+
+    @classmethod
+    def from_env(cls) -> "AlertEngine":
+        rules = json.loads(os.environ['ALERT_RULES']) if os.environ.get('ALERT_RULES') else DEFAULT_RULES
+        return cls(rules, sink_from_config(os.environ.get('ALERT_SINK', 'log')))
+
+    def _columns(self, quotes: List[Dict]) -> Dict[str, list]:
+        """Extrai as colunas usadas pelas regras (uma passada sobre as cotações)"""
+        averages = []
+        for quote in quotes:
+            history = self._volumes.get(quote["symbol"])
+            averages.append(sum(history) / len(history) if history else 0.0)
+
+        return {
+            "symbol": [quote["symbol"] for quote in quotes],
+            "price": [quote.get("price", 0.0) for quote in quotes],
+            "change_percent": [quote.get("change_percent", 0.0) for quote in quotes],
+            "volume": [quote.get("volume", 0) for quote in quotes],
+            "avg_volume": averages,
+        }
+
+    def evaluate(self, quotes: List[Dict], now: Optional[float] = None) -> List[Dict]:
+        """Avalia todas as regras, aplica o cool-down e retorna os alertas entregues pelo sink"""
+        if not quotes:
+            return []
+
+        now = now or time.time()
+        columns = self._columns(quotes)
+        events = []
+        batch_keys = set()
+
+        for rule_id, cooldown, rule in self.rules:
+            for idx, message in rule(columns):
+                symbol = columns["symbol"][idx]
+                if (rule_id, symbol) in batch_keys or \
+                        now - self._last_emitted.get((rule_id, symbol), 0) < cooldown:
+                    continue
+                batch_keys.add((rule_id, symbol))
+                events.append({
+                    "rule_id": rule_id,
+                    "symbol": symbol,
+                    "message": message,
+                    "price": columns["price"][idx],
+                    "change_percent": columns["change_percent"][idx],
+                    "volume": columns["volume"][idx],
+                    "bar_timestamp": quotes[idx].get("timestamp"),
+                    "emitted_at": datetime.fromtimestamp(now, timezone.utc).isoformat()
+                })
+
+        # Volumes entram na média móvel só depois da avaliação (uma vez por barra)
+        for quote, volume in zip(quotes, columns["volume"]):
+            symbol, bar = quote["symbol"], quote.get("timestamp")
+            if self._last_bar.get(symbol) != bar:
+                self._last_bar[symbol] = bar
+                self._volumes.setdefault(symbol, deque(maxlen=VOLUME_WINDOW)).append(volume)
+
+        if not events:
+            return []
+        try:
+            delivered = self.sink.emit(events)
+        except Exception as e:
+            logger.error(f"❌ Falha ao emitir {len(events)} alertas: {str(e)}")
+            return []
+        # Cool-down só para os entregues: os demais são reavaliados na próxima execução
+        for event in delivered:
+            self._last_emitted[(event["rule_id"], event["symbol"])] = now
+        return delivered
@@ -0,0 +1,534 @@
+"""
+Camada analítica em DuckDB sobre o arquivo de cotações e fundamentais.
+
+Os objetos de quotes/{YYYY-MM-DD}/ e fundamentals/{YYYY-MM-DD}/ são
+espelhados em um diretório local (ANALYTICS_CACHE_DIR) com a extensão do
+Content-Encoding (.json.gz, .json.zst), e registrados como views do
+DuckDB lidas direto dos arquivos:
+
+    quotes          uma linha por cotação (date, symbol, timestamp, price, ...)
+    fundamentals    uma linha por empresa e dia (date, symbol, market_cap, ...)
+
+As views recebem o intervalo de datas da consulta e incluem apenas as
+partições (dias) do intervalo. Dias já encerrados são compactados em
+Parquet (columnar/{fonte}/{YYYY-MM-DD}.parquet) e lidos no formato
+colunar; o dia corrente continua em JSON.
+
+Tabelas de resumo no arquivo do DuckDB (ANALYTICS_DB_PATH), atualizadas
+de forma incremental: refresh() espelha só os objetos novos (ou
+alterados) e recalcula apenas os dias que mudaram.
+
+    daily_quotes         OHLCV diário e retorno do dia por símbolo
+    daily_fundamentals   capitalização e indicadores por símbolo e dia
+    sector_daily         retorno médio e ponderado pela capitalização por setor
+
+Com ANALYTICS_DB_PATH definido (e o pacote `duckdb` instalado) o
+pipeline atualiza os resumos ao fim de cada execução. Consultas:
+
+    python analytics.py refresh [--start 2024-01-02] [--end 2024-01-31]
+    python analytics.py top-movers [--date 2024-01-15] [--limit 10]
+    python analytics.py sector-returns --start 2024-01-02 --end 2024-03-28
+    python analytics.py history AAPL [--start ...] [--end ...]
+    python analytics.py sql "SELECT symbol, max(high) FROM quotes GROUP BY 1" --start ... --end ...
+
+Benchmark com um ano sintético (252 pregões, 78 execuções por dia):
+    python analytics.py bench [--days 252] [--symbols 42]
+
+Referência (42 símbolos, ~20 mil objetos, 825 mil cotações): carga
+inicial ~60 s (espelho, Parquet e resumos do ano), atualização após uma
+execução ~50 ms; top movers, retorno por setor no ano e histórico de um
+símbolo ~2 ms nas tabelas de resumo; agregação sobre a view quotes ~40 ms
+no último mês e ~100 ms no ano inteiro.
+"""
+
+import argparse
+import glob
+import logging
+import os
+import re
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    import duckdb
+except ImportError:  # DuckDB é opcional
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "/tmp/analytics-cache"
+COLUMNAR_PREFIX = "columnar"
+EXTENSIONS = {"gzip": ".json.gz", "zstd": ".json.zst"}
+
+# Colunas lidas de cada fonte (campos ausentes viram NULL)
+SOURCES = {
+    "quotes": ("quotes", (
+        ("symbol", "VARCHAR"), ("timestamp", "VARCHAR"), ("price", "DOUBLE"), ("change", "DOUBLE"),
+        ("change_percent", "DOUBLE"), ("volume", "BIGINT"), ("open", "DOUBLE"), ("high", "DOUBLE"),
+        ("low", "DOUBLE"), ("close", "DOUBLE"), ("name", "VARCHAR"), ("sector", "VARCHAR"),
+        ("industry", "VARCHAR"),
+    )),
+    "fundamentals": ("companies", (
+        ("symbol", "VARCHAR"), ("name", "VARCHAR"), ("sector", "VARCHAR"), ("industry", "VARCHAR"),
+        ("market_cap", "DOUBLE"), ("pe_ratio", "DOUBLE"), ("dividend_yield", "DOUBLE"),
+        ("beta", "DOUBLE"), ("eps", "DOUBLE"),
+    )),
+}
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS archive_objects (
+        key VARCHAR PRIMARY KEY, source VARCHAR, date DATE, size BIGINT, mirrored_at TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS daily_quotes (
+        date DATE, symbol VARCHAR, name VARCHAR, sector VARCHAR, industry VARCHAR,
+        open DOUBLE, high DOUBLE, low DOUBLE, close DOUBLE, volume BIGINT,
+        bars INTEGER, first_bar VARCHAR, last_bar VARCHAR, day_return DOUBLE
+    );
+    CREATE TABLE IF NOT EXISTS daily_fundamentals (
+        date DATE, symbol VARCHAR, name VARCHAR, sector VARCHAR, industry VARCHAR,
+        market_cap DOUBLE, pe_ratio DOUBLE, dividend_yield DOUBLE, beta DOUBLE, eps DOUBLE
+    );
+    CREATE TABLE IF NOT EXISTS sector_daily (
+        date DATE, sector VARCHAR, symbols INTEGER, avg_return DOUBLE,
+        cap_weighted_return DOUBLE, volume BIGINT
+    );
+"""
+
+# Uma barra por (símbolo, timestamp): execuções repetidas não contam duas vezes
+DAILY_QUOTES_SQL = """
+    INSERT INTO daily_quotes
+    SELECT date, symbol, any_value(name), any_value(sector), any_value(industry),
+           arg_min(open, timestamp), max(high), min(low), arg_max(close, timestamp), sum(volume),
+           count(*), min(timestamp), max(timestamp),
+           arg_max(close, timestamp) / nullif(arg_min(open, timestamp), 0) - 1
+    FROM (SELECT DISTINCT ON (symbol, timestamp) * FROM ({source}) ORDER BY symbol, timestamp)
+    GROUP BY date, symbol
+"""
+
+DAILY_FUNDAMENTALS_SQL = """
+    INSERT INTO daily_fundamentals
+    SELECT DISTINCT ON (symbol) date, symbol, name, sector, industry,
+           market_cap, pe_ratio, dividend_yield, beta, eps
+    FROM ({source})
+"""
+
+# Capitalização do dia ou, na falta dela, a última conhecida (ASOF JOIN)
+SECTOR_DAILY_SQL = """
+    INSERT INTO sector_daily
+    SELECT q.date, coalesce(nullif(q.sector, ''), 'Unknown'), count(*), avg(q.day_return),
+           sum(q.day_return * f.market_cap) / nullif(sum(f.market_cap), 0), sum(q.volume)
+    FROM daily_quotes q
+    ASOF LEFT JOIN daily_fundamentals f ON q.symbol = f.symbol AND q.date >= f.date
+    WHERE q.date = ?
+    GROUP BY ALL
+"""
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _sql_list(values: Iterable[str]) -> str:
+    return "[" + ", ".join(_quote(value) for value in values) + "]"
+
+
+def date_range(start: str, end: str) -> List[str]:
+    """Dias de start a end (inclusive), YYYY-MM-DD"""
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    return [(first + timedelta(days=offset)).isoformat() for offset in range((last - first).days + 1)]
+
+
+# ===== CAMADA ANALÍTICA =====
+class AnalyticsStore:
+    """Espelho local do arquivo + views e resumos diários no DuckDB"""
+
+    def __init__(self, backend, db_path: str, cache_dir: str = DEFAULT_CACHE_DIR):
+        if duckdb is None:
+            raise RuntimeError("analytics requer o pacote duckdb (pip install duckdb)")
+        self.backend = backend
+        self.db_path = db_path
+        self.cache_dir = os.path.abspath(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.connection = duckdb.connect(db_path)
+        self.connection.execute(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    # ----- Espelho e partições -----
+    def _mirror_path(self, key: str, content_encoding: Optional[str]) -> str:
+        base = os.path.join(self.cache_dir, *key.split("/"))
+        return base[:-len(".json")] + EXTENSIONS.get(content_encoding, ".json") if base.endswith(".json") \
+            else base
+
+    def _parquet_path(self, source: str, date_str: str) -> str:
+        return os.path.join(self.cache_dir, COLUMNAR_PREFIX, source, f"{date_str}.parquet")
+
+    def _json_files(self, source: str, date_str: str) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.cache_dir, source, date_str, "*.json*")))
+
+    def partitions(self, source: str) -> List[str]:
+        """Dias espelhados de uma fonte (JSON ou Parquet)"""
+        days = set()
+        json_root = os.path.join(self.cache_dir, source)
+        if os.path.isdir(json_root):
+            days.update(name for name in os.listdir(json_root) if re.fullmatch(r"\d{4}-\d{2}-\d{2}", name))
+        parquet_root = os.path.join(self.cache_dir, COLUMNAR_PREFIX, source)
+        if os.path.isdir(parquet_root):
+            days.update(name[:-len(".parquet")] for name in os.listdir(parquet_root) if name.endswith(".parquet"))
+        return sorted(days)
+
+    def _source_sql(self, source: str, days: List[str]) -> str:
+        """SELECT das linhas da fonte nos dias pedidos (Parquet quando existir)"""
+        field, columns = SOURCES[source]
+        parquet_files, json_files = [], []
+        for date_str in days:
+            parquet = self._parquet_path(source, date_str)
+            if os.path.exists(parquet):
+                parquet_files.append(parquet)
+            else:
+                json_files.extend(self._json_files(source, date_str))
+
+        names = ", ".join(name for name, _ in columns)
+        parts = []
+        if parquet_files:
+            parts.append(f"SELECT date, {names} FROM read_parquet({_sql_list(parquet_files)})")
+        if json_files:
+            struct = ", ".join(f'"{name}" {kind}' for name, kind in columns)
+            parts.append(
+                f"SELECT CAST(regexp_extract(filename, '(\\d{{4}}-\\d{{2}}-\\d{{2}})[/\\\\][^/\\\\]*$', 1) AS DATE) "
+                f"AS date, {names} FROM (SELECT filename, unnest({field}, recursive := true) "
+                f"FROM read_json({_sql_list(json_files)}, filename = true, "
+                f"columns = {{'{field}': 'STRUCT({struct})[]'}}))")
+        if not parts:
+            typed = ", ".join(f'CAST(NULL AS {kind}) AS "{name}"' for name, kind in columns)
+            return f"SELECT CAST(NULL AS DATE) AS date, {typed} LIMIT 0"
+        return " UNION ALL ".join(parts)
+
+    def register_views(self, start: Optional[str] = None, end: Optional[str] = None):
+        """Views quotes e fundamentals limitadas às partições de [start, end]"""
+        for source in SOURCES:
+            days = [day for day in self.partitions(source)
+                    if (start is None or day >= start) and (end is None or day <= end)]
+            self.connection.execute(f"CREATE OR REPLACE TEMP VIEW {source} AS {self._source_sql(source, days)}")
+
+    # ----- Atualização incremental -----
+    def _mirror(self, source: str, date_str: str) -> bool:
+        """Espelha os objetos novos ou alterados de um dia; True se algo mudou"""
+        listed = self.backend.list(f"{source}/{date_str}/")
+        known = dict(self.connection.execute(
+            "SELECT key, size FROM archive_objects WHERE source = ? AND date = ?",
+            (source, date_str)).fetchall())
+        changed = [item for item in listed if known.get(item["key"]) != item["size"]]
+        if not changed:
+            return False
+
+        keys = [item["key"] for item in changed]
+        for item, stored in zip(changed, self.backend.get_many(keys)):
+            if stored is None:
+                continue
+            path = self._mirror_path(item["key"], stored["content_encoding"])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Outra codificação do mesmo objeto (regravado) sai do espelho
+            for stale in glob.glob(path.split(".json")[0] + ".json*"):
+                if stale != path:
+                    os.remove(stale)
+            with open(path, "wb") as handle:
+                handle.write(stored["body"])
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO archive_objects VALUES (?, ?, ?, ?, ?)",
+            [(item["key"], source, date_str, item["size"], now) for item in changed])
+        return True
+
+    def _compact(self, source: str, date_str: str):
+        """Grava o dia encerrado em Parquet (lido no lugar dos JSON)"""
+        parquet = self._parquet_path(source, date_str)
+        os.makedirs(os.path.dirname(parquet), exist_ok=True)
+        if os.path.exists(parquet):
+            os.remove(parquet)
+        temp_path = parquet + ".tmp"
+        self.connection.execute(f"COPY ({self._source_sql(source, [date_str])}) "
+                                f"TO {_quote(temp_path)} (FORMAT parquet, COMPRESSION zstd)")
+        os.replace(temp_path, parquet)
+
+    def refresh(self, dates: List[str], current_date: Optional[str] = None) -> List[str]:
+        """
+        Espelha os objetos novos dos dias e recalcula os resumos apenas dos
+        dias alterados; dias anteriores a current_date viram Parquet.
+        Retorna os dias recalculados.
+        """
+        current_date = current_date or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        changed = {source: [date_str for date_str in dates if self._mirror(source, date_str)]
+                   for source in SOURCES}
+
+        for source, days in changed.items():
+            for date_str in days:
+                parquet = self._parquet_path(source, date_str)
+                if date_str < current_date:
+                    self._compact(source, date_str)
+                elif os.path.exists(parquet):
+                    os.remove(parquet)
+            # Dias encerrados sem objetos novos desde a última atualização
+            for date_str in self.partitions(source):
+                if date_str < current_date and not os.path.exists(self._parquet_path(source, date_str)):
+                    self._compact(source, date_str)
+
+        touched = sorted(set(changed["quotes"]) | set(changed["fundamentals"]))
+        if not touched:
+            return []
+
+        self.connection.execute("BEGIN TRANSACTION")
+        try:
+            for table, source, insert_sql in (("daily_quotes", "quotes", DAILY_QUOTES_SQL),
+                                              ("daily_fundamentals", "fundamentals", DAILY_FUNDAMENTALS_SQL)):
+                days = changed[source]
+                if days:
+                    self.connection.execute(f"DELETE FROM {table} WHERE date IN ({', '.join('?' * len(days))})",
+                                            days)
+                    self.connection.execute(insert_sql.format(source=self._source_sql(source, days)))
+            for date_str in touched:
+                self.connection.execute("DELETE FROM sector_daily WHERE date = ?", (date_str,))
+                self.connection.execute(SECTOR_DAILY_SQL, (date_str,))
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+
+        logger.info(f"📊 Analytics: resumos recalculados para {len(touched)} dia(s)")
+        return touched
+
+    # ----- Consultas -----
+    def query(self, sql: str, params: Tuple = (), start: Optional[str] = None,
+              end: Optional[str] = None) -> Tuple[List[str], List[Tuple]]:
+        """Executa SQL com as views limitadas a [start, end]; retorna (colunas, linhas)"""
+        self.register_views(start, end)
+        return self._fetch(sql, params)
+
+    def _fetch(self, sql: str, params: Tuple = ()) -> Tuple[List[str], List[Tuple]]:
+        cursor = self.connection.execute(sql, params)
+        return [column[0] for column in cursor.description], cursor.fetchall()
+
+    def top_movers(self, date_str: Optional[str] = None, limit: int = 10) -> Tuple[List[str], List[Tuple]]:
+        """Maiores altas e quedas do dia (padrão: último dia com dados)"""
+        return self._fetch("""
+            WITH day AS (
+                SELECT * FROM daily_quotes
+                WHERE date = coalesce(CAST(? AS DATE), (SELECT max(date) FROM daily_quotes))
+            )
+            (SELECT 'alta' AS side, date, symbol, sector, open, close, round(day_return * 100, 2) AS return_pct
+             FROM day ORDER BY day_return DESC LIMIT ?)
+            UNION ALL
+            (SELECT 'queda', date, symbol, sector, open, close, round(day_return * 100, 2)
+             FROM day ORDER BY day_return ASC LIMIT ?)
+        """, (date_str, limit, limit))
+
+    def sector_returns(self, start: str, end: str) -> Tuple[List[str], List[Tuple]]:
+        """Retorno acumulado por setor no período (ponderado pela capitalização)"""
+        return self._fetch("""
+            SELECT sector,
+                   count(DISTINCT date) AS days,
+                   round((exp(sum(ln(1 + coalesce(cap_weighted_return, avg_return)))) - 1) * 100, 2)
+                       AS cap_weighted_pct,
+                   round((exp(sum(ln(1 + avg_return))) - 1) * 100, 2) AS equal_weighted_pct,
+                   sum(volume) AS volume
+            FROM sector_daily
+            WHERE date BETWEEN ? AND ?
+            GROUP BY sector
+            ORDER BY cap_weighted_pct DESC
+        """, (start, end))
+
+    def symbol_history(self, symbol: str, start: Optional[str] = None,
+                       end: Optional[str] = None) -> Tuple[List[str], List[Tuple]]:
+        """Barras diárias de um símbolo"""
+        return self._fetch("""
+            SELECT date, open, high, low, close, volume, bars, round(day_return * 100, 2) AS return_pct
+            FROM daily_quotes
+            WHERE symbol = ? AND date BETWEEN coalesce(CAST(? AS DATE), DATE '1900-01-01')
+                                        AND coalesce(CAST(? AS DATE), DATE '2999-12-31')
+            ORDER BY date
+        """, (symbol.upper(), start, end))
+
+
+def analytics_from_env(backend) -> Optional[AnalyticsStore]:
+    """AnalyticsStore de ANALYTICS_DB_PATH (None quando desativado)"""
+    db_path = os.environ.get('ANALYTICS_DB_PATH')
+    if not db_path:
+        return None
+    if duckdb is None:
+        logger.warning("⚠️  ANALYTICS_DB_PATH definido, mas o pacote duckdb não está instalado")
+        return None
+    return AnalyticsStore(backend, db_path, os.environ.get('ANALYTICS_CACHE_DIR', DEFAULT_CACHE_DIR))
+
+
+def print_rows(columns: List[str], rows: List[Tuple]):
+    """Tabela simples alinhada por coluna"""
+    cells = [[("" if value is None else f"{value:.4f}" if isinstance(value, float) else str(value))
+              for value in row] for row in rows]
+    widths = [max([len(column)] + [len(row[idx]) for row in cells]) for idx, column in enumerate(columns)]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in cells:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+# ===== BENCHMARK =====
+def _synthetic_year(backend, days: int, symbols: int, runs_per_day: int) -> List[str]:
+    """Grava um arquivo sintético (quotes/ e fundamentals/) no backend"""
+    import random
+    from company_list import COMPANIES
+    from compression import json_body
+
+    random.seed(7)
+    universe = list(COMPANIES)[:symbols]
+    prices = {symbol: 50 + random.random() * 300 for symbol in universe}
+    trading_days, day = [], date(2023, 1, 2)
+    while len(trading_days) < days:
+        if day.weekday() < 5:
+            trading_days.append(day.isoformat())
+        day += timedelta(days=1)
+
+    for date_str in trading_days:
+        items = []
+        for run in range(runs_per_day):
+            minutes = 9 * 60 + 30 + 5 * run
+            timestamp = f"{date_str} {minutes // 60:02d}:{minutes % 60:02d}:00"
+            quotes = []
+            for symbol in universe:
+                open_price = prices[symbol]
+                close = open_price * (1 + random.gauss(0, 0.002))
+                prices[symbol] = close
+                info = COMPANIES[symbol]
+                quotes.append({"symbol": symbol, "timestamp": timestamp, "price": close,
+                               "volume": random.randint(1000, 50000), "open": open_price,
+                               "high": max(open_price, close) * 1.001, "low": min(open_price, close) * 0.999,
+                               "close": close, "change": close - open_price,
+                               "change_percent": (close - open_price) / open_price * 100,
+                               "name": info["name"], "sector": info["sector"], "industry": info["industry"]})
+            document = {"metadata": {"data_type": "stock_quotes"}, "date": date_str, "quotes": quotes}
+            items.append((f"quotes/{date_str}/stock-quotes-{date_str.replace('-', '')}-{run:03d}.json",
+                          json_body(document), "gzip", None))
+
+        companies = [{"symbol": symbol, "name": COMPANIES[symbol]["name"],
+                      "sector": COMPANIES[symbol]["sector"], "industry": COMPANIES[symbol]["industry"],
+                      "market_cap": prices[symbol] * 1e9, "pe_ratio": 20.0, "beta": 1.1}
+                     for symbol in universe]
+        items.append((f"fundamentals/{date_str}/company-fundamentals.json",
+                      json_body({"date": date_str, "companies": companies}), "gzip", None))
+        backend.put_many(items)
+    return trading_days
+
+
+def _bench(args):
+    import shutil
+    import tempfile
+    from compression import decode_body, json_body
+    from storage_backends import LocalFSBackend
+
+    workdir = tempfile.mkdtemp(prefix="analytics-bench-")
+    try:
+        backend = LocalFSBackend(os.path.join(workdir, "archive"), fsync="never")
+        start = time.perf_counter()
+        days = _synthetic_year(backend, args.days, args.symbols, args.runs_per_day)
+        rows = len(days) * args.runs_per_day * min(args.symbols, 42)
+        print(f"Arquivo sintético: {len(days)} dias, {len(days) * (args.runs_per_day + 1)} objetos, "
+              f"{rows:,} cotações ({time.perf_counter() - start:.1f}s para gerar)")
+
+        store = AnalyticsStore(backend, os.path.join(workdir, "analytics.duckdb"),
+                               os.path.join(workdir, "cache"))
+        start = time.perf_counter()
+        store.refresh(days, current_date=days[-1])
+        print(f"Carga inicial (espelho + Parquet + resumos): {time.perf_counter() - start:.1f}s")
+
+        # Uma execução nova no último dia: só esse dia é recalculado
+        last = days[-1]
+        previous = backend.get(f"quotes/{last}/stock-quotes-{last.replace('-', '')}-000.json")
+        document = decode_body(previous["body"], previous["content_encoding"])
+        for quote in document["quotes"]:
+            quote["timestamp"] = f"{last} 16:00:00"
+        backend.put(f"quotes/{last}/stock-quotes-{last.replace('-', '')}-999.json", json_body(document), "gzip")
+        start = time.perf_counter()
+        touched = store.refresh([last], current_date=last)
+        print(f"Atualização incremental após uma execução: {(time.perf_counter() - start) * 1000:.0f} ms "
+              f"({len(touched)} dia recalculado)")
+
+        month = [day for day in days if day[:7] == days[-1][:7]]
+        queries = [
+            ("top movers (um dia)", lambda: store.top_movers(last)),
+            ("retorno por setor (ano)", lambda: store.sector_returns(days[0], last)),
+            ("histórico de um símbolo (ano)", lambda: store.symbol_history("AAPL", days[0], last)),
+            ("view quotes, último mês (JSON + Parquet)", lambda: store.query(
+                "SELECT symbol, max(high), sum(volume) FROM quotes GROUP BY symbol", (), month[0], last)),
+            ("view quotes, ano inteiro (Parquet)", lambda: store.query(
+                "SELECT symbol, max(high), sum(volume) FROM quotes GROUP BY symbol", (), days[0], last)),
+        ]
+        print(f"Latência das consultas (mediana de {args.repeat}):")
+        for label, run in queries:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - start)
+            print(f"  {label:>42}: {sorted(timings)[len(timings) // 2] * 1000:8.1f} ms")
+        store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consultas SQL sobre o arquivo de cotações")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    refresh_parser = commands.add_parser("refresh", help="Espelha objetos novos e recalcula os resumos")
+    refresh_parser.add_argument("--start")
+    refresh_parser.add_argument("--end")
+
+    movers_parser = commands.add_parser("top-movers", help="Maiores altas e quedas do dia")
+    movers_parser.add_argument("--date")
+    movers_parser.add_argument("--limit", type=int, default=10)
+
+    sectors_parser = commands.add_parser("sector-returns", help="Retorno acumulado por setor")
+    sectors_parser.add_argument("--start", required=True)
+    sectors_parser.add_argument("--end", required=True)
+
+    history_parser = commands.add_parser("history", help="Histórico diário de um símbolo")
+    history_parser.add_argument("symbol")
+    history_parser.add_argument("--start")
+    history_parser.add_argument("--end")
+
+    sql_parser = commands.add_parser("sql", help="SQL livre (views quotes e fundamentals, tabelas de resumo)")
+    sql_parser.add_argument("query")
+    sql_parser.add_argument("--start")
+    sql_parser.add_argument("--end")
+
+    bench_parser = commands.add_parser("bench", help="Latência das consultas em um ano sintético")
+    bench_parser.add_argument("--days", type=int, default=252)
+    bench_parser.add_argument("--symbols", type=int, default=42)
+    bench_parser.add_argument("--runs-per-day", type=int, default=78)
+    bench_parser.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.command == "bench":
+        _bench(args)
+        raise SystemExit(0)
+
+    # Import tardio: lambda_function valida variáveis de ambiente ao carregar
+    from lambda_function import get_runtime
+
+    store = AnalyticsStore(get_runtime().s3_manager.backend,
+                           os.environ.get('ANALYTICS_DB_PATH', '/tmp/analytics.duckdb'),
+                           os.environ.get('ANALYTICS_CACHE_DIR', DEFAULT_CACHE_DIR))
+    if args.command == "refresh":
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        touched = store.refresh(date_range(args.start or today, args.end or args.start or today))
+        print(f"{len(touched)} dia(s) recalculado(s): {', '.join(touched)}")
+    elif args.command == "top-movers":
+        print_rows(*store.top_movers(args.date, args.limit))
+    elif args.command == "sector-returns":
+        print_rows(*store.sector_returns(args.start, args.end))
+    elif args.command == "history":
+        print_rows(*store.symbol_history(args.symbol, args.start, args.end))
+    else:
+        print_rows(*store.query(args.query, (), args.start, args.end))
+    store.close()
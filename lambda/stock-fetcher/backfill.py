@@ -0,0 +1,218 @@
+"""
+Backfill histórico de cotações intraday, mês a mês.
+
+Percorre fatias mensais (parâmetro `month` do TIME_SERIES_INTRADAY) para os
+símbolos e o período pedidos, usando uma fila de trabalho retomável que
+respeita o mesmo rate limit do pipeline. O progresso é salvo em um
+checkpoint no S3, de modo que backfills de vários dias sobrevivem a
+reinícios e timeouts da Lambda.
+"""
+
+import argparse
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from rollups import RollupStore
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_PREFIX = "backfill/checkpoints"
+
+
+def month_range(start: str, end: str) -> List[str]:
+    """Lista os meses (YYYY-MM) entre start e end, inclusive"""
+    year, month = (int(part) for part in start.split("-")[:2])
+    end_year, end_month = (int(part) for part in end.split("-")[:2])
+
+    months = []
+    while (year, month) <= (end_year, end_month):
+        months.append(f"{year:04d}-{month:02d}")
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return months
+
+
+class BackfillJob:
+    """Fila de trabalho (símbolo, mês) com checkpoint no S3"""
+
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, job_id: str, api_client, processor, s3_manager, interval: str = "5min",
+                 rollups: Optional[RollupStore] = None):
+        self.job_id = job_id
+        self.api_client = api_client
+        self.processor = processor
+        self.s3_manager = s3_manager
+        self.interval = interval
+        self.state: Dict = {}
+        # Agregados derivados só existem para a série base de 5 minutos
+        self.rollups = (rollups or RollupStore(s3_manager)) if interval == "5min" else None
+
+    @property
+    def checkpoint_key(self) -> str:
+        return f"{CHECKPOINT_PREFIX}/{self.job_id}.json"
+
+    def load_or_create(self, symbols: List[str], start: str, end: str) -> Dict:
+        """
+        Retoma o checkpoint existente ou cria a fila de trabalho. Uma falha
+        de leitura do checkpoint (StorageReadError) interrompe o job em vez
+        de recomeçá-lo do zero
+        """
+        state = self.s3_manager.read_json(self.checkpoint_key)
+        if state:
+            logger.info(f"♻️  Retomando backfill {self.job_id}: {len(state['pending'])} fatias pendentes")
+        else:
+            state = {
+                "job_id": self.job_id,
+                "interval": self.interval,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "pending": [[symbol, month] for symbol in symbols
+                            for month in month_range(start, end)],
+                "completed": [],
+                "failed": [],
+                "attempts": {},
+                "bars_written": 0
+            }
+            logger.info(f"🆕 Novo backfill {self.job_id}: {len(state['pending'])} fatias")
+
+        self.state = state
+        return state
+
+    def save_checkpoint(self) -> bool:
+        self.state["updated_at"] = datetime.now(timezone.utc).isoformat()
+        return self.s3_manager.write_json(self.checkpoint_key, self.state)
+
+    def _process_slice(self, symbol: str, month: str) -> Optional[int]:
+        """Busca e grava uma fatia; retorna barras novas ou None em falha"""
+        data = self.api_client.get_intraday_month(symbol, month, self.interval)
+        if not data:
+            return None
+
+        bars = self.processor.extract_bars(data, symbol, self.interval)
+        if not bars:
+            # Mês sem pregão para o símbolo (ex.: antes do IPO) não é falha
+            logger.info(f"   ∅ {symbol} {month}: sem barras")
+            return 0
+
+        new_bars = self.s3_manager.save_bars(symbol, bars, self.interval)
+        if self.rollups is not None:
+            self.rollups.ingest({symbol: bars})
+            if not self.rollups.save():
+                return None
+        return new_bars
+
+    def run(self, deadline: Optional[float] = None) -> Dict:
+        """
+        Processa a fila até esvaziar ou até o deadline (epoch em segundos).
+        O checkpoint é gravado após cada fatia.
+        """
+        pending = self.state["pending"]
+
+        while pending:
+            if deadline is not None and time.time() >= deadline:
+                logger.warning(f"⏸️  Deadline atingido com {len(pending)} fatias pendentes")
+                break
+
+            symbol, month = pending[0]
+            slice_id = f"{symbol}:{month}"
+            logger.info(f"[{len(self.state['completed']) + 1}] Backfill {symbol} {month}")
+
+            try:
+                new_bars = self._process_slice(symbol, month)
+            except Exception as e:
+                logger.error(f"   💥 Erro inesperado em {slice_id}: {str(e)}")
+                new_bars = None
+
+            pending.pop(0)
+            if new_bars is None:
+                attempts = self.state["attempts"].get(slice_id, 0) + 1
+                self.state["attempts"][slice_id] = attempts
+                if attempts < self.MAX_ATTEMPTS:
+                    pending.append([symbol, month])
+                    logger.warning(f"   ✗ Falha ({attempts}/{self.MAX_ATTEMPTS}), reenfileirado")
+                else:
+                    self.state["failed"].append(slice_id)
+                    logger.error(f"   ✗ Falha definitiva em {slice_id}")
+            else:
+                self.state["completed"].append(slice_id)
+                self.state["bars_written"] += new_bars
+                logger.info(f"   ✓ {new_bars} barras novas")
+
+            self.save_checkpoint()
+
+        self.state["status"] = "completed" if not pending else "partial"
+        self.save_checkpoint()
+        return self.state
+
+
+def backfill_handler(event, context) -> Dict:
+    """
+    Handler Lambda do backfill.
+
+    Evento: {"symbols": [...], "start": "YYYY-MM", "end": "YYYY-MM",
+             "interval": "5min", "job_id": "..."}
+    Quando o status retornado é "partial", basta reinvocar com o mesmo job_id.
+    """
+    # Import tardio: lambda_function valida variáveis de ambiente ao carregar
+    from lambda_function import get_runtime
+    from company_list import get_all_symbols
+
+    symbols = [symbol.upper() for symbol in event.get("symbols") or get_all_symbols()]
+    start = event["start"]
+    end = event.get("end", start)
+    interval = event.get("interval", "5min")
+    job_id = event.get("job_id") or f"{start}_{end}_{interval}_{'-'.join(symbols)}"[:200]
+
+    # Margem de 30s antes do timeout da Lambda para gravar o checkpoint
+    deadline = None
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        deadline = time.time() + context.get_remaining_time_in_millis() / 1000 - 30
+
+    # Cliente do container: o rate limit de 12,1s é o mesmo da varredura
+    runtime = get_runtime()
+    runtime.begin_invocation()
+    job = BackfillJob(
+        job_id,
+        runtime.api_client,
+        runtime.processor,
+        runtime.s3_manager,
+        interval,
+        runtime.rollups
+    )
+    job.load_or_create(symbols, start, end)
+    state = job.run(deadline)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'status': state["status"],
+            'job_id': job_id,
+            'pending_slices': len(state["pending"]),
+            'completed_slices': len(state["completed"]),
+            'failed_slices': state["failed"],
+            'bars_written': state["bars_written"]
+        })
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill histórico mês a mês")
+    parser.add_argument("--symbols", nargs="*", help="Símbolos (padrão: todos)")
+    parser.add_argument("--start", required=True, help="Mês inicial (YYYY-MM)")
+    parser.add_argument("--end", help="Mês final (YYYY-MM)")
+    parser.add_argument("--interval", default="5min")
+    parser.add_argument("--job-id")
+    args = parser.parse_args()
+
+    result = backfill_handler({
+        "symbols": args.symbols,
+        "start": args.start,
+        "end": args.end or args.start,
+        "interval": args.interval,
+        "job_id": args.job_id
+    }, None)
+    print(json.dumps(json.loads(result['body']), indent=2))
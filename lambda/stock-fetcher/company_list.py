@@ -3,6 +3,8 @@ Lista de empresas para monitorar com seus metadados.
 Esta lista pode ser expandida conforme necessário.
 """
 
+from functools import lru_cache
+
 # Lista de empresas organizadas por categoria
 COMPANIES = {
     # ============ Large-Cap Technology ============
@@ -322,6 +324,17 @@ def get_sector_distribution():
     return distribution
 
 
+@lru_cache(maxsize=None)
+def get_group_index(field):
+    """
+    Índice de grupos para agregações ('sector' ou 'industry').
+    Retorna (lista de grupos, {símbolo: posição do grupo na lista}).
+    """
+    groups = sorted({info[field] for info in COMPANIES.values()})
+    position = {group: idx for idx, group in enumerate(groups)}
+    return groups, {symbol: position[info[field]] for symbol, info in COMPANIES.items()}
+
+
 if __name__ == "__main__":
     # Teste das funções
     print(f"Total de empresas: {len(get_all_symbols())}")
@@ -0,0 +1,172 @@
+"""
+Compressão dos objetos JSON gravados no S3.
+
+Os objetos são serializados e comprimidos em streaming (iterencode ->
+compressor -> arquivo temporário em memória com transbordo para disco),
+então a memória fica limitada mesmo para payloads grandes. O header
+Content-Encoding do objeto indica o formato; a leitura descomprime de
+forma transparente e aceita objetos antigos sem compressão.
+
+Formatos: gzip (padrão, biblioteca padrão) e zstd (opcional, requer o
+pacote `zstandard`).
+
+Benchmark de tamanho e CPU por nível:
+    python compression.py
+"""
+
+import json
+import tempfile
+import time
+import zlib
+from typing import Any, BinaryIO, Iterable, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # zstd é opcional
+    zstandard = None
+
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+SPOOL_MAX_SIZE = 8 * 1024 * 1024  # Acima disso o buffer vai para /tmp
+ENCODE_BATCH_SIZE = 64 * 1024
+
+
+def available_encodings() -> list:
+    return ["gzip", "zstd"] if zstandard else ["gzip"]
+
+
+def _compressor(encoding: str, level: Optional[int]):
+    level = DEFAULT_LEVELS[encoding] if level is None else level
+    if encoding == "gzip":
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("Compressão zstd requer o pacote 'zstandard'")
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    raise ValueError(f"Content-Encoding não suportado: {encoding}")
+
+
+def _decompressor(encoding: str):
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("Descompressão zstd requer o pacote 'zstandard'")
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Content-Encoding não suportado: {encoding}")
+
+
+# ===== COMPRESSÃO =====
+def compress_stream(chunks: Iterable[bytes], encoding: str = "gzip",
+                    level: Optional[int] = None) -> Iterator[bytes]:
+    """Comprime um fluxo de bytes pedaço a pedaço"""
+    compressor = _compressor(encoding, level)
+    for chunk in chunks:
+        output = compressor.compress(chunk)
+        if output:
+            yield output
+    yield compressor.flush()
+
+
+def iter_json_bytes(data: Any) -> Iterator[bytes]:
+    """Serializa JSON compacto em pedaços de ~64 KB (sem montar a string inteira)"""
+    batch, size = [], 0
+    for piece in json.JSONEncoder(separators=(',', ':')).iterencode(data):
+        batch.append(piece)
+        size += len(piece)
+        if size >= ENCODE_BATCH_SIZE:
+            yield "".join(batch).encode()
+            batch, size = [], 0
+    if batch:
+        yield "".join(batch).encode()
+
+
+def json_body(data: Any, encoding: Optional[str] = "gzip",
+              level: Optional[int] = None) -> BinaryIO:
+    """
+    Retorna um arquivo (posicionado no início) com o JSON comprimido,
+    pronto para put_object(Body=...). encoding=None grava sem compressão.
+    """
+    chunks = iter_json_bytes(data)
+    if encoding:
+        chunks = compress_stream(chunks, encoding, level)
+
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    for chunk in chunks:
+        body.write(chunk)
+    body.seek(0)
+    return body
+
+
+# ===== DESCOMPRESSÃO =====
+def decompress_stream(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    """Descomprime um fluxo; encoding vazio/identity repassa os bytes"""
+    if not encoding or encoding == "identity":
+        yield from chunks
+        return
+
+    decompressor = _decompressor(encoding)
+    for chunk in chunks:
+        output = decompressor.decompress(chunk)
+        if output:
+            yield output
+    if hasattr(decompressor, "flush"):
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+
+def decode_body(body: bytes, encoding: Optional[str]) -> Any:
+    """Decodifica o corpo de um objeto JSON (comprimido ou não)"""
+    return json.loads(b"".join(decompress_stream([body], encoding)))
+
+
+# ===== BENCHMARK =====
+def _realistic_payloads() -> dict:
+    """Payloads no formato real de quotes/ e fundamentals/"""
+    from company_list import COMPANIES
+
+    quotes, companies = [], []
+    for idx, (symbol, info) in enumerate(COMPANIES.items()):
+        price = 50 + idx * 7.31
+        quotes.append({
+            "symbol": symbol, "timestamp": "2024-01-15 15:55:00",
+            "price": price, "volume": 100000 + idx * 1731,
+            "open": price - 0.42, "high": price + 0.87, "low": price - 1.13, "close": price,
+            "change": 0.42, "change_percent": 0.42 / (price - 0.42) * 100,
+            "name": info["name"], "sector": info["sector"], "industry": info["industry"]
+        })
+        companies.append({
+            "symbol": symbol, "name": info["name"],
+            "description": f"{info['name']} operates in the {info['industry']} industry. " * 6,
+            "sector": info["sector"], "industry": info["industry"], "exchange": "NYSE",
+            "currency": "USD", "country": "USA", "market_cap": 1.5e11 + idx * 1e9,
+            "pe_ratio": 20.5 + idx, "dividend_yield": 0.012, "beta": 1.1,
+            "analyst_rating": "", "last_updated": "2024-01-15T14:30:00+00:00"
+        })
+
+    metadata = {"pipeline_version": "1.0", "execution_timestamp": "2024-01-15T15:55:03+00:00"}
+    return {
+        "quotes": {"metadata": metadata, "date": "2024-01-15", "quotes": quotes},
+        "fundamentals": {"metadata": metadata, "date": "2024-01-15", "companies": companies},
+    }
+
+
+if __name__ == "__main__":
+    levels = {"gzip": [1, 3, 6, 9], "zstd": [1, 3, 9, 19]}
+    for name, payload in _realistic_payloads().items():
+        raw = b"".join(iter_json_bytes(payload))
+        print(f"\n{name}: {len(raw):,} bytes sem compressão "
+              f"({len(json.dumps(payload, indent=2)):,} com indent=2)")
+        for encoding in available_encodings():
+            for level in levels[encoding]:
+                start = time.perf_counter()
+                for _ in range(50):
+                    compressed = json_body(payload, encoding, level).read()
+                elapsed = (time.perf_counter() - start) / 50
+                start = time.perf_counter()
+                for _ in range(50):
+                    decode_body(compressed, encoding)
+                decode_time = (time.perf_counter() - start) / 50
+                print(f"  {encoding:>4} nível {level:>2}: {len(compressed):>7,} bytes "
+                      f"({len(raw) / len(compressed):4.1f}x)  "
+                      f"comprimir {elapsed * 1000:6.2f} ms  ler {decode_time * 1000:5.2f} ms")
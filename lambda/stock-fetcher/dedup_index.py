@@ -0,0 +1,110 @@
+"""
+Índice de deduplicação de cotações por (símbolo, timestamp da barra).
+
+Como a última barra de 5 minutos muitas vezes não muda entre execuções,
+o mesmo par (símbolo, timestamp) seria gravado várias vezes. O índice
+mantém um set em memória durante a execução, persistido no S3 como um
+arquivo compacto por dia: index/quotes/{YYYY-MM-DD}.json, no formato
+{"SYMBOL": ["HH:MM:SS", ...]} com horários ordenados.
+
+Se o índice de um dia não pode ser lido (erro diferente de inexistente),
+as cotações desse dia passam como novas nesta execução, mas o índice não
+é regravado (apagaria o histórico do dia) e é relido na execução seguinte.
+"""
+
+import logging
+from typing import Dict, List, Set, Tuple
+
+from storage_backends import StorageReadError
+
+logger = logging.getLogger(__name__)
+
+INDEX_PREFIX = "index/quotes"
+
+
+class QuoteDedupIndex:
+    """Set de (símbolo, timestamp) já gravados, particionado por dia"""
+
+    def __init__(self, s3_manager):
+        self.s3_manager = s3_manager
+        self._days: Dict[str, Set[Tuple[str, str]]] = {}
+        self._dirty: Set[str] = set()
+        self._staged: List[Tuple[str, str]] = []
+        # Dias cujo índice não foi lido: nunca regravados
+        self._unreadable: Set[str] = set()
+
+    def _load_day(self, date_str: str) -> Set[Tuple[str, str]]:
+        """Carrega (uma vez por container) o índice de um dia"""
+        if date_str not in self._days:
+            try:
+                stored = self.s3_manager.read_json(f"{INDEX_PREFIX}/{date_str}.json") or {}
+            except StorageReadError:
+                logger.warning(f"⚠️  Índice de deduplicação de {date_str} não lido: "
+                               f"cotações do dia tratadas como novas, índice não regravado")
+                self._unreadable.add(date_str)
+                stored = {}
+            self._days[date_str] = {
+                (symbol, f"{date_str} {time_str}")
+                for symbol, times in stored.items()
+                for time_str in times
+            }
+        return self._days[date_str]
+
+    def contains(self, symbol: str, timestamp: str) -> bool:
+        return (symbol, timestamp) in self._load_day(timestamp[:10])
+
+    def filter_new(self, quotes: List[Dict]) -> List[Dict]:
+        """
+        Retorna apenas as cotações com (símbolo, timestamp) inéditos e as
+        registra no índice em memória. Use flush() após gravar no S3 ou
+        rollback() se a gravação falhar.
+        """
+        new_quotes = []
+        for quote in quotes:
+            timestamp = quote.get("timestamp", "")
+            key = (quote["symbol"], timestamp)
+            day = self._load_day(timestamp[:10])
+            if key in day:
+                continue
+            day.add(key)
+            self._dirty.add(timestamp[:10])
+            self._staged.append(key)
+            new_quotes.append(quote)
+
+        skipped = len(quotes) - len(new_quotes)
+        if skipped:
+            logger.info(f"♻️  Deduplicação: {skipped} cotações repetidas ignoradas")
+        return new_quotes
+
+    def _forget_unreadable(self):
+        """Descarta os dias não lidos (relidos do S3 na próxima execução)"""
+        for date_str in self._unreadable:
+            self._days.pop(date_str, None)
+            self._dirty.discard(date_str)
+        self._unreadable.clear()
+
+    def flush(self) -> bool:
+        """Persiste os dias alterados na execução (exceto os de índice não lido)"""
+        complete = not self._unreadable
+        self._forget_unreadable()
+        success = True
+        for date_str in sorted(self._dirty):
+            by_symbol: Dict[str, List[str]] = {}
+            for symbol, timestamp in self._days[date_str]:
+                by_symbol.setdefault(symbol, []).append(timestamp[11:])
+
+            data = {symbol: sorted(times) for symbol, times in sorted(by_symbol.items())}
+            if not self.s3_manager.write_json(f"{INDEX_PREFIX}/{date_str}.json", data):
+                success = False
+
+        if success:
+            self._dirty.clear()
+            self._staged.clear()
+        return success and complete
+
+    def rollback(self):
+        """Desfaz as chaves registradas desde o último flush()"""
+        for symbol, timestamp in self._staged:
+            self._days.get(timestamp[:10], set()).discard((symbol, timestamp))
+        self._staged.clear()
+        self._forget_unreadable()
@@ -0,0 +1,270 @@
+"""
+Registro declarativo dos endpoints da Alpha Vantage.
+
+Cada endpoint descreve a função da API, os parâmetros fixos, o TTL do
+cache em memória, o custo na cota (chamadas), a cadência de atualização,
+o parser e o dataset de saída. O cliente (AlphaVantageAPI.fetch), o cache,
+o planejador de chamadas e o writer genérico (S3DataManager.save_dataset)
+trabalham a partir do registro, então um dataset novo é só uma entrada
+nova aqui.
+
+Datasets adicionais são habilitados por ambiente e planejados dentro do
+orçamento de chamadas da execução, depois das cotações intraday:
+    EXTRA_DATASETS     lista separada por vírgulas (ex.: global_quote,earnings,fx_rate)
+    FX_PAIRS           pares de moedas (padrão: EUR/USD,USD/JPY,USD/BRL)
+    API_CALLS_PER_RUN  orçamento de chamadas por execução (padrão: sem limite)
+
+Gravação:
+    datasets/{dataset}/{YYYY-MM-DD}.json   {"records": {chave: registro}}
+"""
+
+import logging
+import os
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY = "state/endpoints.json"
+DEFAULT_FX_PAIRS = "EUR/USD,USD/JPY,USD/BRL"
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(str(value).rstrip("%"))
+    except (TypeError, ValueError):
+        return None
+
+
+# ===== PARSERS =====
+def parse_global_quote(data: Dict, symbol: str) -> Optional[Dict]:
+    quote = data.get("Global Quote") or {}
+    if not quote.get("05. price"):
+        return None
+    return {
+        "symbol": symbol,
+        "trading_day": quote.get("07. latest trading day"),
+        "price": _float(quote.get("05. price")),
+        "open": _float(quote.get("02. open")),
+        "high": _float(quote.get("03. high")),
+        "low": _float(quote.get("04. low")),
+        "volume": int(_float(quote.get("06. volume")) or 0),
+        "previous_close": _float(quote.get("08. previous close")),
+        "change": _float(quote.get("09. change")),
+        "change_percent": _float(quote.get("10. change percent"))
+    }
+
+
+def parse_daily_adjusted(data: Dict, symbol: str) -> Optional[Dict]:
+    series = data.get("Time Series (Daily)") or {}
+    if not series:
+        return None
+    return {
+        "symbol": symbol,
+        "bars": [{
+            "date": day,
+            "open": _float(values.get("1. open")),
+            "high": _float(values.get("2. high")),
+            "low": _float(values.get("3. low")),
+            "close": _float(values.get("4. close")),
+            "adjusted_close": _float(values.get("5. adjusted close")),
+            "volume": int(_float(values.get("6. volume")) or 0),
+            "dividend": _float(values.get("7. dividend amount")),
+            "split_coefficient": _float(values.get("8. split coefficient"))
+        } for day, values in sorted(series.items())]
+    }
+
+
+def parse_earnings(data: Dict, symbol: str, quarters: int = 8) -> Optional[Dict]:
+    if "quarterlyEarnings" not in data:
+        return None
+    return {
+        "symbol": symbol,
+        "quarterly": [{
+            "fiscal_date_ending": item.get("fiscalDateEnding"),
+            "reported_date": item.get("reportedDate"),
+            "reported_eps": _float(item.get("reportedEPS")),
+            "estimated_eps": _float(item.get("estimatedEPS")),
+            "surprise": _float(item.get("surprise")),
+            "surprise_percent": _float(item.get("surprisePercentage"))
+        } for item in data["quarterlyEarnings"][:quarters]]
+    }
+
+
+def parse_fx_rate(data: Dict, pair: str) -> Optional[Dict]:
+    rate = data.get("Realtime Currency Exchange Rate") or {}
+    if not rate.get("5. Exchange Rate"):
+        return None
+    return {
+        "pair": pair,
+        "rate": _float(rate.get("5. Exchange Rate")),
+        "bid": _float(rate.get("8. Bid Price")),
+        "ask": _float(rate.get("9. Ask Price")),
+        "last_refreshed": rate.get("6. Last Refreshed")
+    }
+
+
+# ===== REGISTRO =====
+class Endpoint:
+    """Descrição declarativa de uma função da API"""
+
+    def __init__(self, name: str, function: str, params: Optional[Dict] = None,
+                 key_param: str = "symbol", ttl: float = 0, cost: int = 1,
+                 refresh: Optional[float] = None, parser: Optional[Callable] = None,
+                 dataset: Optional[str] = None):
+        self.name = name
+        self.function = function
+        self.params = params or {}
+        self.key_param = key_param   # "symbol", "pair" (from/to) ou "" (sem chave)
+        self.ttl = ttl               # Cache em memória (0 = sem cache)
+        self.cost = cost             # Chamadas consumidas da cota
+        self.refresh = refresh       # Cadência de atualização (segundos)
+        self.parser = parser         # (dados, chave) -> registro
+        self.dataset = dataset       # Dataset gravado pelo writer genérico
+
+    def build_params(self, key: Optional[str], api_key: str, **overrides) -> Dict:
+        params = {"function": self.function, **self.params}
+        if self.key_param == "pair":
+            params["from_currency"], params["to_currency"] = key.split("/")
+        elif self.key_param:
+            params[self.key_param] = key
+        params.update(overrides)
+        params["apikey"] = api_key
+        return params
+
+
+ENDPOINTS: Dict[str, Endpoint] = {}
+
+
+def register_endpoint(endpoint: Endpoint) -> Endpoint:
+    ENDPOINTS[endpoint.name] = endpoint
+    return endpoint
+
+
+# Núcleo do pipeline (processados por StockDataProcessor em run_pipeline)
+register_endpoint(Endpoint("intraday", "TIME_SERIES_INTRADAY",
+                           {"interval": "5min", "outputsize": "compact", "datatype": "json"},
+                           refresh=300))
+register_endpoint(Endpoint("overview", "OVERVIEW", ttl=6 * 3600, refresh=86400))
+
+# Datasets adicionais (writer genérico)
+register_endpoint(Endpoint("global_quote", "GLOBAL_QUOTE", ttl=60, refresh=300,
+                           parser=parse_global_quote, dataset="global_quote"))
+register_endpoint(Endpoint("daily_adjusted", "TIME_SERIES_DAILY_ADJUSTED",
+                           {"outputsize": "compact"}, ttl=12 * 3600, refresh=86400,
+                           parser=parse_daily_adjusted, dataset="daily_adjusted"))
+register_endpoint(Endpoint("earnings", "EARNINGS", ttl=24 * 3600, refresh=7 * 86400,
+                           parser=parse_earnings, dataset="earnings"))
+register_endpoint(Endpoint("fx_rate", "CURRENCY_EXCHANGE_RATE", key_param="pair",
+                           ttl=60, refresh=300, parser=parse_fx_rate, dataset="fx_rate"))
+
+
+def requested_datasets(symbols: List[str]) -> Dict[str, List[str]]:
+    """Datasets adicionais habilitados (EXTRA_DATASETS) e suas chaves"""
+    names = [name.strip() for name in os.environ.get('EXTRA_DATASETS', '').split(",") if name.strip()]
+    pairs = [pair.strip() for pair in os.environ.get('FX_PAIRS', DEFAULT_FX_PAIRS).split(",") if pair.strip()]
+
+    requested = {}
+    for name in names:
+        endpoint = ENDPOINTS.get(name)
+        if endpoint is None or endpoint.dataset is None:
+            logger.warning(f"Dataset desconhecido em EXTRA_DATASETS: {name}")
+            continue
+        requested[name] = pairs if endpoint.key_param == "pair" else list(symbols)
+    return requested
+
+
+def call_budget() -> Optional[int]:
+    value = os.environ.get('API_CALLS_PER_RUN')
+    return int(value) if value else None
+
+
+# ===== PLANEJAMENTO =====
+class CallPlanner:
+    """Escolhe as chamadas mais atrasadas de todos os endpoints dentro do orçamento"""
+
+    def __init__(self, s3_manager):
+        self.s3_manager = s3_manager
+        # endpoint -> chave -> epoch da última coleta
+        self.last_fetched: Optional[Dict[str, Dict[str, float]]] = None
+
+    def load(self) -> Dict[str, Dict[str, float]]:
+        if self.last_fetched is None:
+            self.last_fetched = self.s3_manager.read_json(STATE_KEY) or {}
+        return self.last_fetched
+
+    def plan(self, requested: Dict[str, List[str]], budget: Optional[int],
+             now: float, force: bool = False) -> List[Tuple[str, str]]:
+        """
+        Chamadas vencidas (idade >= cadência), das mais atrasadas para as
+        menos atrasadas, até esgotar o orçamento. Com force, todas as
+        chamadas pedidas contam como vencidas (execuções sob demanda).
+        """
+        last_fetched = self.load()
+        due = []
+        for name, keys in requested.items():
+            endpoint = ENDPOINTS[name]
+            for key in keys:
+                age = now - last_fetched.get(name, {}).get(key, 0)
+                if force or age >= endpoint.refresh:
+                    due.append((age / endpoint.refresh, name, key))
+
+        calls, spent = [], 0
+        for _, name, key in sorted(due, reverse=True):
+            cost = ENDPOINTS[name].cost
+            if budget is not None and spent + cost > budget:
+                continue
+            calls.append((name, key))
+            spent += cost
+
+        if len(calls) < len(due):
+            logger.info(f"📋 Orçamento: {len(calls)}/{len(due)} chamadas de datasets adicionais")
+        return calls
+
+    def record(self, name: str, key: str, now: float):
+        self.load().setdefault(name, {})[key] = now
+
+    def save(self) -> bool:
+        return self.s3_manager.write_json(STATE_KEY, self.load())
+
+
+def fetch_datasets(api_client, planner: CallPlanner, requested: Dict[str, List[str]],
+                   budget: Optional[int], current_time: datetime,
+                   should_stop: Optional[Callable[[], bool]] = None,
+                   force: bool = False) -> Dict[str, Dict[str, Dict]]:
+    """Busca e interpreta os datasets adicionais planejados (sem gravar)"""
+    records: Dict[str, Dict[str, Dict]] = {}
+
+    for name, key in planner.plan(requested, budget, current_time.timestamp(), force):
+        if should_stop and should_stop():
+            break
+        endpoint = ENDPOINTS[name]
+        data = api_client.fetch(name, key)
+        record = endpoint.parser(data, key) if data else None
+        if record is None:
+            logger.warning(f"   ✗ {name} {key}: sem dados")
+            continue
+        records.setdefault(name, {})[key] = record
+    return records
+
+
+def collect_datasets(api_client, s3_manager, planner: CallPlanner, requested: Dict[str, List[str]],
+                     budget: Optional[int], current_time: datetime,
+                     should_stop: Optional[Callable[[], bool]] = None,
+                     force: bool = False) -> Dict[str, int]:
+    """Busca, interpreta e grava os datasets adicionais planejados"""
+    now = current_time.timestamp()
+    records = fetch_datasets(api_client, planner, requested, budget, current_time, should_stop, force)
+
+    # A coleta só conta para a cadência depois de gravada
+    date_str = current_time.strftime("%Y-%m-%d")
+    saved = {}
+    for name, by_key in records.items():
+        if s3_manager.save_dataset(ENDPOINTS[name].dataset, date_str, by_key):
+            saved[name] = len(by_key)
+            for key in by_key:
+                planner.record(name, key, now)
+
+    if saved:
+        planner.save()
+    return saved
@@ -0,0 +1,279 @@
+"""
+Requisições HTTP com timeouts separados, retry com jitter e hedging.
+
+Uma conexão lenta não pode travar a varredura sequencial por 30s:
+    - timeouts de conexão e de leitura separados (falha rápida no connect);
+    - retry automático em erros de conexão, timeouts e respostas 5xx, com
+      backoff exponencial e jitter completo;
+    - latência registrada por endpoint (parâmetro "function" da API);
+    - hedging opcional: se a resposta não chega até o p95 do endpoint,
+      uma segunda tentativa é disparada e vence a que responder primeiro.
+      Cada hedge consome uma requisição extra da cota da API, então só é
+      enviado enquanto houver orçamento (HTTP_HEDGE_BUDGET_PER_MINUTE; 0
+      desativa, o padrão para o plano gratuito).
+
+Retries e hedges também gastam cota: com has_budget, nenhum dos dois é
+enviado quando o orçamento de chamadas do chamador já acabou.
+
+Configuração por ambiente:
+    HTTP_CONNECT_TIMEOUT          segundos (padrão 3.05)
+    HTTP_READ_TIMEOUT             segundos (padrão 20)
+    HTTP_MAX_RETRIES              tentativas extras (padrão 2)
+    HTTP_HEDGE_BUDGET_PER_MINUTE  hedges por minuto (padrão 0)
+
+Benchmark contra um servidor local com respostas lentas injetadas:
+    python http_client.py [--requests 300] [--slow-rate 0.03]
+"""
+
+import argparse
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 20.0
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+HEDGE_PERCENTILE = 95
+LATENCY_WINDOW = 200   # Amostras mantidas por endpoint
+MIN_SAMPLES = 20       # Sem amostras suficientes, não há hedge
+
+
+# ===== LATÊNCIA =====
+class LatencyTracker:
+    """Janela deslizante de latências por endpoint"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self.samples: Dict[str, deque] = {}
+
+    def record(self, endpoint: str, seconds: float):
+        self.samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, endpoint: str, pct: float) -> Optional[float]:
+        """Percentil da janela ou None se ainda há poucas amostras"""
+        samples = self.samples.get(endpoint)
+        if not samples or len(samples) < MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def summary(self) -> Dict[str, Dict]:
+        result = {}
+        for endpoint, samples in self.samples.items():
+            ordered = sorted(samples)
+            result[endpoint] = {
+                "count": len(ordered),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+                "max_ms": round(ordered[-1] * 1000, 1)
+            }
+        return result
+
+
+class HedgeBudget:
+    """Token bucket de requisições extras (hedges) por minuto"""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.tokens = per_minute
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.per_minute,
+                              self.tokens + (now - self.updated_at) * self.per_minute / 60)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+# ===== REQUISIÇÕES =====
+class HedgedRequester:
+    """GET com timeouts separados, retry com jitter e hedging pelo p95"""
+
+    def __init__(self, session: requests.Session,
+                 connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 max_retries: int = MAX_RETRIES, hedge_budget: Optional[HedgeBudget] = None,
+                 before_attempt: Optional[Callable[[], None]] = None,
+                 has_budget: Optional[Callable[[], bool]] = None):
+        self.session = session
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.hedge_budget = hedge_budget
+        self.before_attempt = before_attempt
+        # Orçamento de chamadas do chamador, consultado antes de cada retry/hedge
+        self.has_budget = has_budget
+        self.latency = LatencyTracker()
+        self.counters = {"requests": 0, "retries": 0, "hedges_sent": 0, "hedges_won": 0}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls, session: requests.Session,
+                 before_attempt: Optional[Callable[[], None]] = None,
+                 has_budget: Optional[Callable[[], bool]] = None) -> "HedgedRequester":
+        hedges_per_minute = float(os.environ.get('HTTP_HEDGE_BUDGET_PER_MINUTE', 0))
+        return cls(
+            session,
+            connect_timeout=float(os.environ.get('HTTP_CONNECT_TIMEOUT', CONNECT_TIMEOUT)),
+            read_timeout=float(os.environ.get('HTTP_READ_TIMEOUT', READ_TIMEOUT)),
+            max_retries=int(os.environ.get('HTTP_MAX_RETRIES', MAX_RETRIES)),
+            hedge_budget=HedgeBudget(hedges_per_minute) if hedges_per_minute > 0 else None,
+            before_attempt=before_attempt,
+            has_budget=has_budget
+        )
+
+    def _timed_get(self, url: str, params: Dict, endpoint: str) -> requests.Response:
+        start = time.perf_counter()
+        response = self.session.get(url, params=params, timeout=self.timeout, verify=True)
+        self.latency.record(endpoint, time.perf_counter() - start)
+        return response
+
+    def _attempt(self, url: str, params: Dict, endpoint: str) -> requests.Response:
+        """Uma tentativa; com orçamento, dispara um hedge após o p95 do endpoint"""
+        hedge_after = (self.latency.percentile(endpoint, HEDGE_PERCENTILE)
+                       if self.hedge_budget else None)
+        if hedge_after is None:
+            return self._timed_get(url, params, endpoint)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hedge")
+
+        primary = self._executor.submit(self._timed_get, url, params, endpoint)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done or not self._budget_left() or not self.hedge_budget.try_acquire():
+            return primary.result()
+
+        logger.debug(f"Hedge para {endpoint} após {hedge_after * 1000:.0f} ms")
+        self.counters["hedges_sent"] += 1
+        hedge = self._executor.submit(self._timed_get, url, params, endpoint)
+
+        # Vence a primeira resposta; a outra termina em segundo plano e é descartada
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.exceptions.RequestException as e:
+                    error = e
+                    continue
+                if future is hedge:
+                    self.counters["hedges_won"] += 1
+                return response
+        raise error
+
+    def _budget_left(self) -> bool:
+        return self.has_budget is None or self.has_budget()
+
+    def get(self, url: str, params: Dict, endpoint: str = "default") -> requests.Response:
+        """
+        GET com retry em erros de conexão, timeouts e 5xx. Levanta a última
+        exceção (requests.exceptions.*) quando as tentativas se esgotam.
+        """
+        self.counters["requests"] += 1
+        for attempt in range(self.max_retries + 1):
+            if self.before_attempt:
+                self.before_attempt()
+            try:
+                response = self._attempt(url, params, endpoint)
+                if response.status_code >= 500:
+                    raise requests.exceptions.HTTPError(
+                        f"{response.status_code} Server Error", response=response)
+                return response
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.HTTPError) as e:
+                if attempt == self.max_retries:
+                    raise
+                if not self._budget_left():
+                    logger.warning(f"💸 {endpoint}: {type(e).__name__} - sem orçamento de chamadas "
+                                   f"para nova tentativa")
+                    raise
+                delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                self.counters["retries"] += 1
+                logger.warning(f"🔁 {endpoint}: {type(e).__name__} - nova tentativa "
+                               f"{attempt + 1}/{self.max_retries} em {delay:.2f}s")
+                time.sleep(delay)
+
+    def stats(self) -> Dict:
+        return dict(self.counters, latency=self.latency.summary())
+
+
+# ===== BENCHMARK =====
+def _start_stand_in(slow_rate: float, fast_delay: float, slow_delay: float):
+    """Servidor local que imita a API, com respostas lentas injetadas"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    body = b'{"Meta Data": {}, "Time Series (5min)": {}}'
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(slow_delay if random.random() < slow_rate else fast_delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _measure(requester: HedgedRequester, url: str, count: int) -> list:
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        requester.get(url, {"function": "TIME_SERIES_INTRADAY"}, endpoint="TIME_SERIES_INTRADAY")
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de latência de cauda com hedging")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--slow-rate", type=float, default=0.03, help="Fração de respostas lentas")
+    parser.add_argument("--fast-ms", type=float, default=20)
+    parser.add_argument("--slow-ms", type=float, default=1500)
+    args = parser.parse_args()
+
+    server = _start_stand_in(args.slow_rate, args.fast_ms / 1000, args.slow_ms / 1000)
+    url = f"http://127.0.0.1:{server.server_address[1]}/query"
+    print(f"Stand-in em {url}: {args.slow_rate:.0%} das respostas com {args.slow_ms:.0f} ms")
+
+    def percentiles(latencies):
+        pick = lambda pct: latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))] * 1000
+        return f"p50 {pick(50):7.1f} ms  p95 {pick(95):7.1f} ms  p99 {pick(99):7.1f} ms  " \
+               f"max {latencies[-1] * 1000:7.1f} ms"
+
+    with requests.Session() as session:
+        plain = HedgedRequester(session, max_retries=0)
+        print(f"{'sem hedge':>10}: {percentiles(_measure(plain, url, args.requests))}")
+
+        hedged = HedgedRequester(session, max_retries=0, hedge_budget=HedgeBudget(per_minute=10_000))
+        _measure(hedged, url, MIN_SAMPLES)  # Aquecimento: amostras para o p95
+        latencies = _measure(hedged, url, args.requests)
+        print(f"{'com hedge':>10}: {percentiles(latencies)}")
+        print(f"{'':>10}  hedges enviados {hedged.counters['hedges_sent']}, "
+              f"vencidos {hedged.counters['hedges_won']}")
+
+    server.shutdown()
@@ -0,0 +1,291 @@
+"""
+Esquema do evento de invocação para execuções parciais.
+
+Sem campos do esquema (evento do EventBridge ou {}), a Lambda faz a
+varredura agendada completa. Com eles, a execução é restrita ao pedido:
+atualizações avulsas, nova tentativa dos failed_symbols de uma execução
+anterior ou backfill de poucos símbolos terminam em segundos.
+
+    {
+      "symbols":   ["AAPL", "MSFT"],          símbolos (somados aos dos setores)
+      "sectors":   ["Technology"],            setores do company_list
+      "endpoints": ["intraday", "overview"],  endpoints do registro (padrão: os da varredura)
+      "pairs":     ["EUR/USD"],               pares do fx_rate (padrão: FX_PAIRS)
+      "interval":  "5min",                    intervalo das barras intraday
+      "output":    "s3",                      s3 | quotes | response
+      "backfill":  {"start": "YYYY-MM", "end": "YYYY-MM"}
+    }
+
+Endpoints listados no evento são buscados mesmo fora da cadência (sem a
+regra de fundamentais uma vez por pregão nem o CallPlanner). Saídas:
+    s3        grava como a varredura agendada; agregados de setor só são
+              publicados em varreduras completas (universo inteiro)
+    quotes    grava apenas as cotações e o snapshot latest (só o endpoint
+              intraday: fundamentais e datasets não são buscados)
+    response  não grava nada nem emite alertas; os registros voltam no corpo
+              da resposta
+
+Intervalos diferentes de 5min só valem com "output": "response" (ou com
+"backfill", que grava em bars/{intervalo}/): o índice de deduplicação, os
+arquivos quotes/, o snapshot latest e as médias do scheduler e dos alertas
+são da série de 5 minutos, e uma barra de 60min gravada ali faria a
+varredura descartar a barra de 5 minutos com o mesmo timestamp.
+
+Com "backfill", o evento é repassado ao backfill.backfill_handler com os
+mesmos símbolos e intervalo.
+
+CLI (imprime o evento; --invoke executa o handler localmente):
+    python invocation_event.py --symbols AAPL MSFT --endpoints intraday overview
+    python invocation_event.py --sectors Technology --output response --invoke
+    python invocation_event.py --retry-failed resposta.json
+    python invocation_event.py --symbols NVDA --backfill 2024-01 2024-03
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+from typing import Dict, List, Optional
+
+from company_list import COMPANIES, get_companies_by_sector, get_sector_distribution
+from endpoints import DEFAULT_FX_PAIRS, ENDPOINTS
+
+logger = logging.getLogger(__name__)
+
+INTERVALS = ("1min", "5min", "15min", "30min", "60min")
+OUTPUT_MODES = ("s3", "quotes", "response")
+
+SYMBOL_PATTERN = re.compile(r"^[A-Z][A-Z0-9.\-]{0,9}$")
+PAIR_PATTERN = re.compile(r"^[A-Z]{3}/[A-Z]{3}$")
+MONTH_PATTERN = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
+class InvalidEventError(ValueError):
+    """Evento fora do esquema; errors lista todos os problemas encontrados"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def _string_list(event: Dict, field: str, errors: List[str]) -> Optional[List[str]]:
+    value = event.get(field)
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        errors.append(f"{field}: esperada lista de textos")
+        return None
+    return [item.strip() for item in value if item.strip()]
+
+
+class InvocationRequest:
+    """Pedido de execução validado a partir do evento"""
+
+    def __init__(self, symbols: Optional[List[str]] = None, endpoints: Optional[List[str]] = None,
+                 pairs: Optional[List[str]] = None, interval: str = "5min", output: str = "s3",
+                 backfill: Optional[Dict] = None):
+        self.symbols = symbols        # None = universo completo, na ordem do scheduler
+        self.endpoints = endpoints    # None = comportamento agendado
+        self.pairs = pairs
+        self.interval = interval
+        self.output = output
+        self.backfill = backfill
+
+    @classmethod
+    def from_event(cls, event: Optional[Dict]) -> "InvocationRequest":
+        """Valida o evento; campos fora do esquema (ex.: do EventBridge) são ignorados"""
+        event = event or {}
+        errors: List[str] = []
+
+        symbols = None
+        raw_symbols = _string_list(event, "symbols", errors)
+        sectors = _string_list(event, "sectors", errors)
+        if raw_symbols is not None or sectors is not None:
+            symbols = []
+            for symbol in raw_symbols or []:
+                symbol = symbol.upper()
+                if not SYMBOL_PATTERN.match(symbol):
+                    errors.append(f"symbols: símbolo inválido {symbol!r}")
+                elif symbol not in symbols:
+                    symbols.append(symbol)
+                    if symbol not in COMPANIES:
+                        logger.warning(f"⚠️  {symbol} não está no company_list (sem setor/indústria)")
+            known_sectors = get_sector_distribution()
+            for sector in sectors or []:
+                if sector not in known_sectors:
+                    errors.append(f"sectors: setor desconhecido {sector!r} "
+                                  f"(válidos: {', '.join(sorted(known_sectors))})")
+                    continue
+                symbols += [symbol for symbol in get_companies_by_sector(sector) if symbol not in symbols]
+            if not symbols and not errors:
+                errors.append("symbols/sectors: nenhum símbolo selecionado")
+
+        endpoints = _string_list(event, "endpoints", errors)
+        if endpoints is not None:
+            for name in endpoints:
+                if name not in ENDPOINTS:
+                    errors.append(f"endpoints: endpoint desconhecido {name!r} "
+                                  f"(válidos: {', '.join(ENDPOINTS)})")
+            if not endpoints:
+                errors.append("endpoints: lista vazia")
+
+        pairs = _string_list(event, "pairs", errors)
+        for pair in pairs or []:
+            if not PAIR_PATTERN.match(pair.upper()):
+                errors.append(f"pairs: par inválido {pair!r} (formato XXX/YYY)")
+        if pairs is not None:
+            pairs = [pair.upper() for pair in pairs]
+
+        interval = event.get("interval", "5min")
+        if interval not in INTERVALS:
+            errors.append(f"interval: {interval!r} (válidos: {', '.join(INTERVALS)})")
+
+        output = event.get("output", "s3")
+        if output not in OUTPUT_MODES:
+            errors.append(f"output: {output!r} (válidos: {', '.join(OUTPUT_MODES)})")
+
+        backfill = event.get("backfill")
+        if backfill is not None:
+            if not isinstance(backfill, dict) or not MONTH_PATTERN.match(str(backfill.get("start", ""))):
+                errors.append("backfill: esperado {\"start\": \"YYYY-MM\", \"end\": \"YYYY-MM\"}")
+            elif backfill.get("end") and not MONTH_PATTERN.match(str(backfill["end"])):
+                errors.append(f"backfill.end: mês inválido {backfill['end']!r}")
+            elif str(backfill.get("end") or backfill["start"]) < backfill["start"]:
+                errors.append("backfill: end anterior a start")
+
+        if interval in INTERVALS and interval != "5min" and output != "response" and backfill is None:
+            errors.append(f"interval: {interval!r} só com \"output\": \"response\" "
+                          f"(as gravações são da série de 5min)")
+
+        if output == "quotes" and endpoints is not None:
+            extra = [name for name in endpoints if name != "intraday"]
+            if extra:
+                errors.append(f"endpoints: {', '.join(extra)} não são gravados com \"output\": \"quotes\" "
+                              f"(só intraday)")
+
+        if errors:
+            raise InvalidEventError(errors)
+        return cls(symbols, endpoints, pairs, interval, output, backfill)
+
+    @property
+    def is_scheduled(self) -> bool:
+        """Varredura agendada: universo completo, comportamento e saída padrão"""
+        return (self.symbols is None and self.endpoints is None and self.interval == "5min"
+                and self.output == "s3" and self.backfill is None)
+
+    @property
+    def targeted(self) -> bool:
+        """Pedido restrito a uma lista de símbolos"""
+        return self.symbols is not None
+
+    @property
+    def fetch_intraday(self) -> bool:
+        return self.endpoints is None or "intraday" in self.endpoints
+
+    @property
+    def fetch_overview(self) -> Optional[bool]:
+        """True/False quando o evento lista endpoints; None = regra do pregão"""
+        return None if self.endpoints is None else "overview" in self.endpoints
+
+    def dataset_requests(self, symbols: List[str]) -> Dict[str, List[str]]:
+        """Datasets adicionais pedidos no evento e suas chaves"""
+        pairs = self.pairs or [pair.strip() for pair in
+                               os.environ.get('FX_PAIRS', DEFAULT_FX_PAIRS).split(",") if pair.strip()]
+        return {
+            name: pairs if ENDPOINTS[name].key_param == "pair" else list(symbols)
+            for name in self.endpoints or [] if ENDPOINTS[name].dataset is not None
+        }
+
+    def backfill_event(self) -> Dict:
+        """Evento equivalente para backfill.backfill_handler"""
+        return {
+            "symbols": self.symbols,
+            "start": self.backfill["start"],
+            "end": self.backfill.get("end") or self.backfill["start"],
+            "interval": self.interval,
+            "job_id": self.backfill.get("job_id")
+        }
+
+    def to_event(self) -> Dict:
+        event = {"symbols": self.symbols, "endpoints": self.endpoints, "pairs": self.pairs,
+                 "interval": self.interval, "output": self.output, "backfill": self.backfill}
+        return {field: value for field, value in event.items()
+                if value is not None and not (field == "interval" and value == "5min")
+                and not (field == "output" and value == "s3")}
+
+    def describe(self) -> str:
+        scope = "universo completo" if self.symbols is None else f"{len(self.symbols)} símbolos"
+        endpoints = ",".join(self.endpoints) if self.endpoints else "agendado"
+        return f"{scope}, endpoints {endpoints}, intervalo {self.interval}, saída {self.output}"
+
+
+# ===== CLI =====
+def failed_symbols_from(path: str) -> List[str]:
+    """failed_symbols de uma resposta salva (corpo ou resposta completa da Lambda)"""
+    with open(path, encoding="utf-8") as handle:
+        response = json.load(handle)
+    body = response.get("body", response)
+    if isinstance(body, str):
+        body = json.loads(body)
+    return body.get("failed_symbols", [])
+
+
+def build_event(args: argparse.Namespace) -> Dict:
+    event: Dict = {}
+    symbols = list(args.symbols or [])
+    if args.retry_failed:
+        failed = failed_symbols_from(args.retry_failed)
+        if not failed:
+            raise InvalidEventError([f"{args.retry_failed}: nenhum failed_symbols para repetir"])
+        symbols += [symbol for symbol in failed if symbol not in symbols]
+    if symbols:
+        event["symbols"] = symbols
+    for field in ("sectors", "endpoints", "pairs"):
+        if getattr(args, field):
+            event[field] = getattr(args, field)
+    if args.interval != "5min":
+        event["interval"] = args.interval
+    if args.output != "s3":
+        event["output"] = args.output
+    if args.backfill:
+        event["backfill"] = {"start": args.backfill[0], "end": args.backfill[-1]}
+
+    # Valida com as mesmas regras do handler
+    InvocationRequest.from_event(event)
+    return event
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monta eventos de execução parcial da Lambda")
+    parser.add_argument("--symbols", nargs="*", help="Símbolos a buscar")
+    parser.add_argument("--sectors", nargs="*", help="Setores do company_list")
+    parser.add_argument("--endpoints", nargs="*", help=f"Endpoints ({', '.join(ENDPOINTS)})")
+    parser.add_argument("--pairs", nargs="*", help="Pares do fx_rate (ex.: EUR/USD)")
+    parser.add_argument("--interval", default="5min", choices=INTERVALS)
+    parser.add_argument("--output", default="s3", choices=OUTPUT_MODES)
+    parser.add_argument("--retry-failed", metavar="RESPOSTA.json",
+                        help="Repete os failed_symbols de uma resposta salva")
+    parser.add_argument("--backfill", nargs="+", metavar="YYYY-MM", help="Mês inicial [mês final]")
+    parser.add_argument("--invoke", action="store_true", help="Executa o lambda_handler localmente")
+    args = parser.parse_args()
+
+    try:
+        event = build_event(args)
+    except InvalidEventError as e:
+        for error in e.errors:
+            print(f"❌ {error}", file=sys.stderr)
+        raise SystemExit(2)
+
+    print(json.dumps(event, indent=2))
+    if args.invoke:
+        # Import tardio: lambda_function valida variáveis de ambiente ao carregar
+        from lambda_function import lambda_handler
+        result = lambda_handler(event, None)
+        print(json.dumps(json.loads(result["body"]), indent=2, ensure_ascii=False))
+    else:
+        print(f"\naws lambda invoke --function-name <função> --cli-binary-format raw-in-base64-out "
+              f"--payload '{json.dumps(event)}' resposta.json", file=sys.stderr)
@@ -4,6 +4,7 @@ Lambda Function para coletar dados de cotações de ações da Alpha Vantage API
 e salvar no Amazon S3 - Versão Produção.
 """
 
+import hashlib
 import json
 import os
 import sys
@@ -12,8 +13,7 @@ import requests
 from datetime import datetime, timezone
 import time
 import logging
-from typing import Dict, List, Any, Optional
-import hashlib
+from typing import Dict, List, Optional, Callable, Tuple
 
 # Adicionar diretório atual ao path para importar módulos locais
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -90,6 +90,9 @@ except ValueError as e:
     sys.exit(1)
 
 # ===== INICIALIZAÇÃO DE CLIENTES =====
+from s3_writer import s3_client_config
+from storage_backends import StorageBackend, StorageReadError, storage_backend_from_env
+
 class AWSClientManager:
     """Gerencia clientes AWS com tratamento de erros"""
     
@@ -99,7 +102,8 @@ class AWSClientManager:
         try:
             # Para Lambda, usa IAM Role automaticamente
             # Para local, usa credenciais do ~/.aws/credentials
-            client = boto3.client('s3')
+            # Pool de conexões, retries adaptive e keepalive para gravações concorrentes
+            client = boto3.client('s3', config=s3_client_config())
             
             # Testar conexão (operação leve)
             client.list_buckets()
@@ -123,7 +127,7 @@ try:
     s3_client = AWSClientManager.get_s3_client()
 except Exception:
     # Em último caso, criar um cliente básico (pode falhar depois)
-    s3_client = boto3.client('s3')
+    s3_client = boto3.client('s3', config=s3_client_config())
     logger.warning("⚠️  Usando cliente S3 sem validação inicial")
 
 # ===== IMPORTAR LISTA DE EMPRESAS =====
@@ -134,12 +138,33 @@ except ImportError as e:
     logger.critical(f"❌ Falha ao importar company_list: {e}")
     raise
 
+# ===== IMPORTAR MÓDULOS DO PIPELINE =====
+from dedup_index import QuoteDedupIndex
+from scheduler import SymbolScheduler
+from market_calendar import is_market_open
+from compression import json_body, decode_body
+from alerts import AlertEngine
+from snapshots import LatestSnapshot
+from quote_diffs import QuoteDiffPublisher, index_key as quote_state_index_key
+from analytics import analytics_from_env
+from run_ledger import RunLedger, schedule_slot
+from http_client import HedgedRequester
+from rollups import RollupStore
+from sector_aggregates import SectorAggregator
+from record_schema import convert_bar, convert_overview
+from memory_budget import MemoryBudget, SpillList
+from endpoints import (ENDPOINTS, CallPlanner, call_budget, collect_datasets, fetch_datasets,
+                       requested_datasets)
+from invocation_event import InvalidEventError, InvocationRequest
+from retry_queue import clear_recovered, load_recovered, retry_queue_from_env
+
 # ===== CLASSE ALPHA VANTAGE API =====
 class AlphaVantageAPI:
     """Cliente robusto para Alpha Vantage API"""
     
     BASE_URL = "https://www.alphavantage.co/query"
     RATE_LIMIT_DELAY = 12.1  # 12.1 segundos entre requisições (5/min free tier)
+    RATE_LIMIT_BACKOFF = 60  # Delay após aviso de rate limit
     
     def __init__(self, api_key: str):
         self.api_key = api_key
@@ -149,6 +174,32 @@ class AlphaVantageAPI:
             'Accept': 'application/json'
         })
         self.last_request_time = 0
+        # Teto de calls_made da execução em andamento (None = sem orçamento)
+        self.call_limit: Optional[int] = None
+        # Timeouts connect/read, retry com jitter e hedging opcional
+        self.http = HedgedRequester.from_env(self.session, before_attempt=self._respect_rate_limit,
+                                             has_budget=lambda: not self.budget_exhausted)
+        # Cache de respostas: parâmetros (sem apikey) -> (expira_em, dados)
+        self.response_cache: Dict[tuple, tuple] = {}
+    
+    def reset_backoff(self):
+        """Volta ao delay padrão se o último aviso de rate limit já expirou"""
+        if 'RATE_LIMIT_DELAY' in vars(self) and \
+                time.time() - self.last_request_time >= self.RATE_LIMIT_BACKOFF:
+            del self.RATE_LIMIT_DELAY
+    
+    def _cached_request(self, params: Dict, ttl: float) -> Optional[Dict]:
+        """Requisição com cache em memória (reaproveitado em containers quentes)"""
+        cache_key = tuple(sorted((name, value) for name, value in params.items() if name != "apikey"))
+        cached = self.response_cache.get(cache_key)
+        if cached and cached[0] > time.time():
+            logger.debug(f"Cache hit: {cache_key}")
+            return cached[1]
+        
+        data = self._make_request(params)
+        if data:
+            self.response_cache[cache_key] = (time.time() + ttl, data)
+        return data
     
     def _respect_rate_limit(self):
         """Respeita rate limit da API"""
@@ -164,17 +215,11 @@ class AlphaVantageAPI:
     
     def _make_request(self, params: Dict) -> Optional[Dict]:
         """Faz requisição HTTP com tratamento de erros"""
-        self._respect_rate_limit()
-        
         try:
             logger.debug(f"Request: {params.get('function')} para {params.get('symbol', 'N/A')}")
             
-            response = self.session.get(
-                self.BASE_URL,
-                params=params,
-                timeout=30,
-                verify=True  # Verificar SSL
-            )
+            # Rate limit é respeitado antes de cada tentativa (inclusive retries)
+            response = self.http.get(self.BASE_URL, params, endpoint=params.get("function", "default"))
             
             response.raise_for_status()
             data = response.json()
@@ -189,17 +234,19 @@ class AlphaVantageAPI:
                 if "rate limit" in note.lower():
                     logger.warning(f"⚠️  Rate limit detectado: {note}")
                     # Aumentar delay para próxima requisição
-                    self.RATE_LIMIT_DELAY = 60  # 1 minuto
+                    self.RATE_LIMIT_DELAY = self.RATE_LIMIT_BACKOFF
                 else:
                     logger.info(f"API Note: {note}")
             
             return data
             
         except requests.exceptions.Timeout:
-            logger.error("Timeout na requisição (30s)")
+            connect_timeout, read_timeout = self.http.timeout
+            logger.error(f"Timeout na requisição (connect {connect_timeout}s / read {read_timeout}s, "
+                         f"{self.http.max_retries + 1} tentativas)")
             return None
         except requests.exceptions.ConnectionError:
-            logger.error("Erro de conexão")
+            logger.error(f"Erro de conexão ({self.http.max_retries + 1} tentativas)")
             return None
         except requests.exceptions.HTTPError as e:
             logger.error(f"HTTP Error {e.response.status_code}: {e.response.text[:100]}")
@@ -211,38 +258,45 @@ class AlphaVantageAPI:
             logger.error(f"Erro inesperado: {str(e)}")
             return None
     
-    def get_intraday_quotes(self, symbol: str) -> Optional[Dict]:
-        """Busca cotações intraday (5min interval)"""
-        params = {
-            "function": "TIME_SERIES_INTRADAY",
-            "symbol": symbol,
-            "interval": "5min",
-            "apikey": self.api_key,
-            "outputsize": "compact",
-            "datatype": "json"
-        }
-        
+    @property
+    def calls_made(self) -> int:
+        """Chamadas consumidas da cota (requisições lógicas + retries + hedges)"""
+        counters = self.http.counters
+        return counters["requests"] + counters["retries"] + counters["hedges_sent"]
+    
+    @property
+    def budget_exhausted(self) -> bool:
+        return self.call_limit is not None and self.calls_made >= self.call_limit
+    
+    def fetch(self, endpoint_name: str, key: Optional[str] = None, **overrides) -> Optional[Dict]:
+        """Chamada genérica a um endpoint do registro (endpoints.py)"""
+        endpoint = ENDPOINTS[endpoint_name]
+        params = endpoint.build_params(key, self.api_key, **overrides)
+        if endpoint.ttl:
+            return self._cached_request(params, endpoint.ttl)
         return self._make_request(params)
     
+    def get_intraday_quotes(self, symbol: str, interval: str = "5min") -> Optional[Dict]:
+        """Busca cotações intraday (5min por padrão)"""
+        return self.fetch("intraday", symbol, interval=interval)
+    
+    def get_intraday_month(self, symbol: str, month: str, interval: str = "5min") -> Optional[Dict]:
+        """Busca um mês completo de barras intraday (month no formato YYYY-MM)"""
+        return self.fetch("intraday", symbol, interval=interval, month=month, outputsize="full")
+    
     def get_company_overview(self, symbol: str) -> Optional[Dict]:
         """Busca dados fundamentais"""
-        params = {
-            "function": "OVERVIEW",
-            "symbol": symbol,
-            "apikey": self.api_key
-        }
-        
-        return self._make_request(params)
+        return self.fetch("overview", symbol)
 
 # ===== PROCESSADOR DE DADOS =====
 class StockDataProcessor:
     """Processa e transforma dados brutos"""
     
     @staticmethod
-    def extract_latest_quote(api_data: Dict, symbol: str) -> Optional[Dict]:
+    def extract_latest_quote(api_data: Dict, symbol: str, interval: str = "5min") -> Optional[Dict]:
         """Extrai a cotação mais recente"""
         try:
-            time_series = api_data.get("Time Series (5min)", {})
+            time_series = api_data.get(f"Time Series ({interval})", {})
             if not time_series:
                 logger.warning(f"Sem dados de série temporal para {symbol}")
                 return None
@@ -284,66 +338,54 @@ class StockDataProcessor:
             return None
     
     @staticmethod
-    def process_overview_data(api_data: Dict) -> Optional[Dict]:
-        """Processa dados fundamentais"""
-        try:
-            if not api_data or "Symbol" not in api_data:
-                return None
-            
-            processed = {
-                "symbol": api_data.get("Symbol"),
-                "name": api_data.get("Name", ""),
-                "description": (api_data.get("Description", "")[:400] + "...") 
-                              if len(api_data.get("Description", "")) > 400 
-                              else api_data.get("Description", ""),
-                "sector": api_data.get("Sector", ""),
-                "industry": api_data.get("Industry", ""),
-                "exchange": api_data.get("Exchange", ""),
-                "currency": api_data.get("Currency", ""),
-                "country": api_data.get("Country", ""),
-                "market_cap": StockDataProcessor._safe_float(api_data.get("MarketCapitalization")),
-                "pe_ratio": StockDataProcessor._safe_float(api_data.get("PERatio")),
-                "dividend_yield": StockDataProcessor._safe_float(api_data.get("DividendYield")),
-                "roe": StockDataProcessor._safe_float(api_data.get("ReturnOnEquityTTM")),
-                "revenue_ttm": StockDataProcessor._safe_float(api_data.get("RevenueTTM")),
-                "gross_profit_ttm": StockDataProcessor._safe_float(api_data.get("GrossProfitTTM")),
-                "profit_margin": StockDataProcessor._safe_float(api_data.get("ProfitMargin")),
-                "operating_margin": StockDataProcessor._safe_float(api_data.get("OperatingMarginTTM")),
-                "eps": StockDataProcessor._safe_float(api_data.get("EPS")),
-                "beta": StockDataProcessor._safe_float(api_data.get("Beta")),
-                "52_week_high": StockDataProcessor._safe_float(api_data.get("52WeekHigh")),
-                "52_week_low": StockDataProcessor._safe_float(api_data.get("52WeekLow")),
-                "50_day_moving_avg": StockDataProcessor._safe_float(api_data.get("50DayMovingAverage")),
-                "200_day_moving_avg": StockDataProcessor._safe_float(api_data.get("200DayMovingAverage")),
-                "shares_outstanding": StockDataProcessor._safe_float(api_data.get("SharesOutstanding")),
-                "analyst_target_price": StockDataProcessor._safe_float(api_data.get("AnalystTargetPrice")),
-                "analyst_rating": api_data.get("AnalystRating", ""),
-                "last_updated": datetime.now(timezone.utc).isoformat()
-            }
-            
-            return processed
-            
-        except Exception as e:
-            logger.error(f"Erro ao processar overview: {str(e)}")
-            return None
+    def extract_bars(api_data: Dict, symbol: str, interval: str = "5min") -> List[Dict]:
+        """Extrai todas as barras OHLCV da série temporal, em ordem cronológica"""
+        time_series = api_data.get(f"Time Series ({interval})", {})
+        bars = []
+        
+        for timestamp in sorted(time_series):
+            values, errors = convert_bar(time_series[timestamp])
+            if values is None:
+                logger.warning(f"Barra inválida ignorada: {symbol} {timestamp} {errors}")
+                continue
+            bar = {"symbol": symbol, "timestamp": timestamp}
+            bar.update(values)
+            bars.append(bar)
+        
+        return bars
     
     @staticmethod
-    def _safe_float(value: Any) -> Optional[float]:
-        """Converte para float com segurança"""
-        if not value or value in ["None", "N/A", "-"]:
-            return None
-        try:
-            return float(str(value).replace(',', ''))
-        except (ValueError, TypeError):
+    def process_overview_data(api_data: Dict) -> Optional[Dict]:
+        """Processa dados fundamentais (conversor pré-compilado de record_schema)"""
+        if not api_data or "Symbol" not in api_data:
             return None
+        
+        processed, errors = convert_overview(api_data)
+        for field, value, reason in errors:
+            logger.warning(f"Overview {api_data.get('Symbol')}: campo {field} {reason} ({value!r})")
+        return processed
 
 # ===== GERENCIADOR S3 =====
 class S3DataManager:
-    """Gerencia armazenamento no S3"""
+    """Gerencia armazenamento no S3 (ou no backend de STORAGE_BACKEND)"""
     
-    def __init__(self, bucket_name: str, s3_client):
+    def __init__(self, bucket_name: str, s3_client, content_encoding: Optional[str] = None,
+                 backend: Optional[StorageBackend] = None):
         self.bucket_name = bucket_name
         self.s3_client = s3_client
+        # Operações por chave passam pelo backend (S3, diretório local, SQLite ou DuckDB)
+        self.backend = backend or storage_backend_from_env(bucket_name, s3_client)
+        # gzip por padrão; S3_CONTENT_ENCODING=identity desativa a compressão
+        encoding = content_encoding or os.environ.get('S3_CONTENT_ENCODING', 'gzip')
+        self.content_encoding = None if encoding == 'identity' else encoding
+        # Chave do último objeto de dados gravado (usada pelo ledger de execução)
+        self.last_written_key: Optional[str] = None
+    
+    def _put_json(self, s3_key: str, data: Dict, metadata: Optional[Dict] = None,
+                  cache_control: Optional[str] = None):
+        """Serializa, comprime em streaming e grava um objeto JSON"""
+        with json_body(data, self.content_encoding) as body:
+            self.backend.put(s3_key, body, self.content_encoding, metadata, cache_control)
     
     def save_quotes(self, quotes: List[Dict]) -> bool:
         """Salva cotações no S3"""
@@ -369,26 +411,21 @@ class S3DataManager:
                 "quotes": quotes
             }
             
-            # Gerar hash para integridade
-            data_json = json.dumps(data, separators=(',', ':'))
-            data_hash = hashlib.md5(data_json.encode()).hexdigest()[:8]
-            
+            # Hash do conteúdo normalizado (sem execution_timestamp)
+            normalized = json.dumps(quotes, sort_keys=True, separators=(',', ':'))
+            data_hash = hashlib.md5(normalized.encode()).hexdigest()[:8]
             s3_key = f"quotes/{date_str}/stock-quotes-{timestamp_str}-{data_hash}.json"
             
             # Upload para S3
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Body=data_json,
-                ContentType='application/json',
-                Metadata={
-                    'total-companies': str(len(quotes)),
-                    'data-hash': data_hash,
-                    'pipeline-version': '1.0'
-                }
-            )
-            
-            logger.info(f"✅ Cotações salvas: s3://{self.bucket_name}/{s3_key}")
+            self._put_json(s3_key, data, {
+                'total-companies': str(len(quotes)),
+                'data-hash': data_hash,
+                'pipeline-version': '1.0'
+            })
+            
+            self.last_written_key = s3_key
+            
+            logger.info(f"✅ Cotações salvas: {self.backend.location(s3_key)}")
             logger.info(f"   Empresas: {len(quotes)}, Hash: {data_hash}")
             
             return True
@@ -397,169 +434,692 @@ class S3DataManager:
             logger.error(f"❌ Falha ao salvar cotações: {str(e)}")
             return False
     
-    def save_fundamentals(self, fundamentals: List[Dict]) -> bool:
-        """Salva dados fundamentais"""
+    def read_json(self, s3_key: str) -> Optional[Dict]:
+        """
+        Lê um objeto JSON do S3 (None se não existir). Qualquer outra falha
+        (throttling, 5xx, timeout, corpo inválido) levanta StorageReadError:
+        quem lê para mesclar e regravar não pode confundi-la com objeto novo
+        """
+        try:
+            stored = self.backend.get(s3_key)
+            return decode_body(stored["body"], stored["content_encoding"]) if stored else None
+        except Exception as e:
+            logger.error(f"❌ Falha ao ler {self.backend.location(s3_key)}: {str(e)}")
+            raise StorageReadError(s3_key) from e
+    
+    def write_json(self, s3_key: str, data: Dict, metadata: Optional[Dict] = None,
+                   cache_control: Optional[str] = None) -> bool:
+        """Grava um objeto JSON compacto (e comprimido) no S3"""
+        try:
+            self._put_json(s3_key, data, metadata, cache_control)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Falha ao gravar {self.backend.location(s3_key)}: {str(e)}")
+            return False
+    
+    def write_many(self, items: List[Tuple[str, Dict, Optional[Dict]]],
+                   cache_control: Optional[str] = None) -> Dict[str, bool]:
+        """Grava vários objetos (chave, dados, metadados) em um lote do backend"""
+        bodies = [json_body(data, self.content_encoding) for _, data, _ in items]
+        try:
+            results = self.backend.put_many(
+                [(s3_key, body, self.content_encoding, metadata)
+                 for (s3_key, _, metadata), body in zip(items, bodies)], cache_control)
+        finally:
+            for body in bodies:
+                body.close()
+        
+        failed = sum(1 for success in results.values() if not success)
+        if failed:
+            logger.warning(f"⚠️  {failed}/{len(items)} objetos não gravados no lote")
+        return results
+    
+    def read_many(self, s3_keys: List[str]) -> List[Optional[Dict]]:
+        """
+        Lê vários objetos JSON em um lote do backend (None para os
+        inexistentes); uma falha de leitura levanta StorageReadError
+        """
+        try:
+            stored_many = self.backend.get_many(s3_keys)
+        except Exception as e:
+            logger.error(f"❌ Falha ao ler o lote de {len(s3_keys)} objetos: {str(e)}")
+            raise StorageReadError(", ".join(s3_keys)) from e
+        documents = []
+        for s3_key, stored in zip(s3_keys, stored_many):
+            try:
+                documents.append(decode_body(stored["body"], stored["content_encoding"]) if stored else None)
+            except Exception as e:
+                logger.error(f"❌ Falha ao ler {self.backend.location(s3_key)}: {str(e)}")
+                raise StorageReadError(s3_key) from e
+        return documents
+    
+    def flush(self):
+        """Torna duráveis as gravações pendentes do backend (fsync em lote)"""
+        self.backend.flush()
+    
+    def object_exists(self, s3_key: str) -> bool:
+        """Verifica a existência de um objeto (HEAD, sem baixar o conteúdo)"""
+        return self.object_metadata(s3_key) is not None
+    
+    def object_metadata(self, s3_key: str) -> Optional[Dict]:
+        """
+        Metadados de usuário de um objeto (HEAD); None se não existir.
+        Outras falhas do HEAD levantam StorageReadError
+        """
+        try:
+            head = self.backend.head(s3_key)
+        except Exception as e:
+            logger.error(f"❌ Falha ao consultar {self.backend.location(s3_key)}: {str(e)}")
+            raise StorageReadError(s3_key) from e
+        return head["metadata"] if head is not None else None
+    
+    def save_bars(self, symbol: str, bars: List[Dict], interval: str = "5min") -> Optional[int]:
+        """
+        Grava barras no armazenamento particionado por dia:
+        bars/{interval}/{YYYY-MM-DD}/{symbol}.json
+        
+        Barras já armazenadas (mesmo timestamp) são ignoradas. Retorna o
+        número de barras novas gravadas, ou None se algum dia não foi
+        gravado (a fatia inteira é refeita). Falhas de leitura levantam
+        StorageReadError em vez de regravar o dia só com as barras novas.
+        """
+        by_date: Dict[str, List[Dict]] = {}
+        for bar in bars:
+            by_date.setdefault(bar["timestamp"][:10], []).append(bar)
+        
+        # Um objeto por dia: leituras e gravações do mês em paralelo
+        dates = sorted(by_date)
+        keys = [f"bars/{interval}/{date_str}/{symbol}.json" for date_str in dates]
+        items, added_by_key = [], {}
+        for date_str, s3_key, existing in zip(dates, keys, self.read_many(keys)):
+            existing = existing or {"symbol": symbol, "interval": interval, "date": date_str, "bars": []}
+            stored = {bar["timestamp"]: bar for bar in existing["bars"]}
+            
+            added = [bar for bar in by_date[date_str] if bar["timestamp"] not in stored]
+            if not added:
+                continue
+            
+            for bar in added:
+                stored[bar["timestamp"]] = bar
+            existing["bars"] = [stored[ts] for ts in sorted(stored)]
+            items.append((s3_key, existing, {'total-bars': str(len(existing["bars"]))}))
+            added_by_key[s3_key] = len(added)
+        
+        written = self.write_many(items)
+        if not all(written.values()):
+            return None
+        return sum(added_by_key.values())
+    
+    def save_dataset(self, dataset: str, date_str: str, records: Dict[str, Dict]) -> bool:
+        """
+        Writer genérico dos datasets do registro de endpoints:
+        datasets/{dataset}/{YYYY-MM-DD}.json, mesclado por chave
+        """
+        s3_key = f"datasets/{dataset}/{date_str}.json"
+        try:
+            existing = self.read_json(s3_key) or {"dataset": dataset, "date": date_str, "records": {}}
+        except StorageReadError:
+            return False
+        existing["records"].update(records)
+        existing["updated_at"] = datetime.now(timezone.utc).isoformat()
+        
+        if self.write_json(s3_key, existing, {'total-records': str(len(existing["records"]))}):
+            logger.info(f"✅ Dataset {dataset}: {len(records)} registros em {self.backend.location(s3_key)}")
+            return True
+        return False
+    
+    def save_fundamentals(self, fundamentals: List[Dict], merge: bool = False) -> bool:
+        """
+        Salva dados fundamentais. Com merge (execuções parciais), substitui
+        apenas as empresas recebidas no arquivo do dia; um arquivo criado
+        assim fica marcado como parcial e a varredura agendada o refaz.
+        """
         if not fundamentals:
             return False
         
         try:
             current_time = datetime.now(timezone.utc)
             date_str = current_time.strftime("%Y-%m-%d")
+            s3_key = f"fundamentals/{date_str}/company-fundamentals.json"
+            
+            partial = False
+            if merge:
+                # Falha de leitura levanta StorageReadError e nada é gravado: o
+                # arquivo do dia não é substituído só pelas empresas recebidas
+                existing = self.read_json(s3_key)
+                partial = existing is None or existing["metadata"].get("partial", False)
+                refreshed = {company["symbol"] for company in fundamentals}
+                fundamentals = [company for company in (existing or {}).get("companies", [])
+                                if company["symbol"] not in refreshed] + list(fundamentals)
             
             data = {
                 "metadata": {
                     "pipeline_version": "1.0",
                     "execution_timestamp": current_time.isoformat(),
                     "total_companies": len(fundamentals),
-                    "data_type": "company_fundamentals"
+                    "data_type": "company_fundamentals",
+                    "partial": partial
                 },
                 "date": date_str,
                 "companies": fundamentals
             }
             
-            s3_key = f"fundamentals/{date_str}/company-fundamentals.json"
-            
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Body=json.dumps(data, indent=2),
-                ContentType='application/json'
-            )
+            self._put_json(s3_key, data, {'partial': 'true'} if partial else None)
+            self.last_written_key = s3_key
             
-            logger.info(f"✅ Fundamentais salvas: s3://{self.bucket_name}/{s3_key}")
+            logger.info(f"✅ Fundamentais salvas: {self.backend.location(s3_key)}")
             return True
             
         except Exception as e:
             logger.error(f"❌ Falha ao salvar fundamentais: {str(e)}")
             return False
 
-# ===== HANDLER PRINCIPAL =====
-def lambda_handler(event, context) -> Dict:
+# ===== ESTADO DO CONTAINER =====
+class PipelineRuntime:
     """
-    Handler principal da Lambda Function
+    Estado reaproveitado entre invocações no mesmo container (warm start):
+    sessão HTTP com conexões abertas, estado do rate limit, cache de
+    respostas, índices carregados do S3 e watermarks por símbolo.
+    """
+    
+    def __init__(self, api_key: str, bucket_name: str, client):
+        self.api_client = AlphaVantageAPI(api_key)
+        self.processor = StockDataProcessor()
+        self.s3_manager = S3DataManager(bucket_name, client)
+        self.scheduler = SymbolScheduler(self.s3_manager)
+        self.dedup_index = QuoteDedupIndex(self.s3_manager)
+        # Regras de alerta compiladas uma vez por container
+        self.alert_engine = AlertEngine.from_env()
+        self.latest_snapshot = LatestSnapshot(self.s3_manager)
+        # Vetor de cotações da execução anterior (diffs entre execuções)
+        self.quote_diffs = QuoteDiffPublisher.from_env(self.s3_manager)
+        # Resumos diários no DuckDB (None sem ANALYTICS_DB_PATH)
+        self.analytics = analytics_from_env(self.s3_manager.backend)
+        self.rollups = RollupStore(self.s3_manager)
+        self.call_planner = CallPlanner(self.s3_manager)
+        self.sector_aggregator = SectorAggregator(self.s3_manager, self.rollups)
+        self.memory = MemoryBudget.from_env()
+        # Fila de novas tentativas dos símbolos com falha (None = desativada)
+        self.retry_queue = retry_queue_from_env()
+        # Timestamp da última barra vista por símbolo
+        self.watermarks: Dict[str, str] = {}
+        # Data (YYYY-MM-DD) em que os fundamentais já foram gravados
+        self.fundamentals_date: Optional[str] = None
+        self.created_at = time.time()
+        self.invocations = 0
+    
+    @property
+    def is_cold_start(self) -> bool:
+        return self.invocations == 1
+    
+    def begin_invocation(self):
+        self.invocations += 1
+        self.api_client.reset_backoff()
+        self.api_client.call_limit = None
+    
+    def update_watermark(self, symbol: str, timestamp: str) -> bool:
+        """Atualiza o watermark; retorna True se a barra é mais nova"""
+        if timestamp <= self.watermarks.get(symbol, ""):
+            return False
+        self.watermarks[symbol] = timestamp
+        return True
+
+_runtime: Optional[PipelineRuntime] = None
+
+def get_runtime() -> PipelineRuntime:
+    """Retorna o runtime do container, criando-o no cold start"""
+    global _runtime
+    if _runtime is None:
+        _runtime = PipelineRuntime(ALPHA_VANTAGE_API_KEY, S3_BUCKET_NAME, s3_client)
+    return _runtime
+
+# ===== EXECUÇÃO DO PIPELINE =====
+def run_pipeline(runtime: PipelineRuntime, current_time: datetime,
+                 should_stop: Optional[Callable[[], bool]] = None,
+                 ledger: Optional[RunLedger] = None,
+                 request: Optional[InvocationRequest] = None) -> Dict:
+    """
+    Executa uma varredura: agenda, coleta, deduplica e salva.
+    Usado pelo handler da Lambda e pelo worker daemon; should_stop permite
+    interromper a varredura entre símbolos (desligamento gracioso), o
+    ledger torna idempotentes as novas tentativas da mesma janela e request
+    restringe a execução ao pedido do evento (invocation_event.py).
     """
-    # Início da execução
     start_time = time.time()
-    logger.info("🚀 === INICIANDO PIPELINE DE DADOS ===")
+    memory = runtime.memory
+    memory.start("plan")
     
-    # Informações de execução
-    if context:
-        logger.info(f"Request ID: {context.aws_request_id}")
-        logger.info(f"Function: {context.function_name}")
-        logger.info(f"Memory: {context.memory_limit_in_mb}MB")
+    api_client = runtime.api_client
+    processor = runtime.processor
+    s3_manager = runtime.s3_manager
+    dedup_index = runtime.dedup_index
+    scheduler = runtime.scheduler
     
-    # Inicializar componentes
-    api_client = AlphaVantageAPI(ALPHA_VANTAGE_API_KEY)
-    processor = StockDataProcessor()
-    s3_manager = S3DataManager(S3_BUCKET_NAME, s3_client)
+    # Pedido do evento (padrão: varredura agendada com todas as gravações)
+    request = request or InvocationRequest()
+    write = request.output != "response"
+    full_output = request.output == "s3"
+    # Agregados 15min/60min/diário são montados a partir de barras de 5 minutos
+    ingest_rollups = full_output and request.interval == "5min"
     
-    # Obter empresas
-    symbols = get_all_symbols()
-    logger.info(f"📊 Empresas monitoradas: {len(symbols)}")
-    logger.info(f"Símbolos: {', '.join(symbols[:10])}{'...' if len(symbols) > 10 else ''}")
+    # Obter empresas, em ordem de prioridade (ou as pedidas no evento)
+    all_symbols = get_all_symbols()
+    symbols = request.symbols if request.targeted else scheduler.plan(all_symbols)
+    if not request.is_scheduled:
+        logger.info(f"🎯 Execução sob demanda: {request.describe()}")
     
-    # Verificar se deve coletar fundamentais
-    current_time = datetime.now(timezone.utc)
-    current_hour = current_time.hour
-    current_minute = current_time.minute
+    # Orçamento de chamadas da execução (cotações primeiro, depois datasets adicionais)
+    budget = call_budget()
+    calls_at_start = api_client.calls_made
+    if budget is not None:
+        symbols = symbols[:budget]
+        # Retries e hedges também contam: o cliente não passa do teto da execução
+        api_client.call_limit = calls_at_start + budget
+    
+    # Nova tentativa da mesma janela: reaproveitar o que já foi buscado
+    successful_quotes = ledger.fetched_quotes if ledger else []
+    if ledger:
+        symbols = ledger.pending(symbols)
+        
+        # Heartbeat do lease a cada símbolo ou dataset (o worker de novas
+        # tentativas não chama a API enquanto a varredura estiver ativa)
+        stop_requested = should_stop
+        def should_stop() -> bool:
+            ledger.heartbeat()
+            return bool(stop_requested and stop_requested())
+    
+    logger.info(f"📊 Empresas monitoradas: {len(all_symbols)}")
+    logger.info(f"Símbolos: {', '.join(symbols[:10])}{'...' if len(symbols) > 10 else ''}")
     
-    # Coletar fundamentais apenas ~9:30 AM EST (14:30 UTC)
-    collect_fundamentals = (current_hour == 14 and current_minute <= 35)
+    # Coletar fundamentais uma vez por pregão (primeira execução sem o arquivo
+    # completo do dia) ou quando o evento pede o endpoint overview
+    date_str = current_time.strftime('%Y-%m-%d')
+    # Saída "quotes" grava só cotações e latest: nada de fundamentais nem datasets
+    collect_extras = request.output != "quotes"
+    if not collect_extras:
+        collect_fundamentals = False
+    elif request.fetch_overview is not None:
+        collect_fundamentals = request.fetch_overview
+    elif runtime.fundamentals_date == date_str:
+        collect_fundamentals = False
+    else:
+        try:
+            stored = s3_manager.object_metadata(f"fundamentals/{date_str}/company-fundamentals.json")
+            collect_fundamentals = stored is None or stored.get('partial') == 'true'
+        except StorageReadError:
+            # Sem saber se o arquivo do dia existe, não gasta chamadas OVERVIEW
+            # nem arrisca regravá-lo: a próxima execução consulta de novo
+            logger.warning("⚠️  Estado dos fundamentais do dia desconhecido; coleta adiada")
+            collect_fundamentals = False
     
     if collect_fundamentals:
-        logger.info("⭐ Coletando dados fundamentais (primeira execução do dia)")
+        logger.info("⭐ Coletando dados fundamentais (primeira execução do pregão)")
     
-    # Coletar dados
-    successful_quotes = []
-    successful_fundamentals = []
+    # Coletar dados (fundamentais transbordam para /tmp acima do limiar de memória)
+    successful_fundamentals = SpillList("fundamentals", memory)
     failed_symbols = []
+    rollups_saved = True
+    memory.checkpoint("collect")
     
     logger.info("🔄 Iniciando coleta de dados...")
     
+    interrupted = False
     for idx, symbol in enumerate(symbols, 1):
+        if should_stop and should_stop():
+            logger.warning(f"⏹️  Varredura interrompida após {idx - 1}/{len(symbols)} símbolos")
+            interrupted = True
+            break
+        if api_client.budget_exhausted:
+            logger.warning(f"💸 Orçamento de {budget} chamadas esgotado após {idx - 1}/{len(symbols)} símbolos")
+            break
+        
         try:
             logger.info(f"[{idx}/{len(symbols)}] Processando {symbol}")
             
             # 1. Coletar cotações
-            quote_data = api_client.get_intraday_quotes(symbol)
-            
-            if quote_data:
-                quote = processor.extract_latest_quote(quote_data, symbol)
-                if quote:
-                    successful_quotes.append(quote)
-                    
-                    # Log resumido
-                    change_str = f"Δ {quote.get('change_percent', 0):+.2f}%"
-                    logger.info(f"   ✓ ${quote['price']:.2f} ({change_str})")
+            if request.fetch_intraday:
+                quote_data = api_client.get_intraday_quotes(symbol, request.interval)
+                
+                if quote_data:
+                    # Barras vão direto para os agregados 15min/60min/diário (sem acumular)
+                    if ingest_rollups:
+                        try:
+                            runtime.rollups.ingest({symbol: processor.extract_bars(quote_data, symbol)},
+                                                   current_time)
+                        except StorageReadError:
+                            # Agregado não lido: as barras entram na próxima execução
+                            rollups_saved = False
+                    quote = processor.extract_latest_quote(quote_data, symbol, request.interval)
+                    if quote:
+                        successful_quotes.append(quote)
+                        if write:
+                            scheduler.record(quote)
+                        if ledger:
+                            ledger.record_quote(quote)
+                        if not runtime.update_watermark(symbol, quote["timestamp"]):
+                            logger.debug(f"   Sem barra nova desde a última invocação")
+                        
+                        # Log resumido
+                        change_str = f"Δ {quote.get('change_percent', 0):+.2f}%"
+                        logger.info(f"   ✓ ${quote['price']:.2f} ({change_str})")
+                    else:
+                        failed_symbols.append(symbol)
+                        logger.warning(f"   ✗ Sem dados de cotação")
                 else:
                     failed_symbols.append(symbol)
-                    logger.warning(f"   ✗ Sem dados de cotação")
-            else:
-                failed_symbols.append(symbol)
-                logger.warning(f"   ✗ Falha na API")
+                    logger.warning(f"   ✗ Falha na API")
             
             # 2. Coletar fundamentais (se for hora)
             if collect_fundamentals:
                 overview_data = api_client.get_company_overview(symbol)
-                if overview_data:
-                    fundamentals = processor.process_overview_data(overview_data)
-                    if fundamentals:
-                        successful_fundamentals.append(fundamentals)
-                        logger.info(f"   ✓ Fundamentais coletados")
+                fundamentals = processor.process_overview_data(overview_data) if overview_data else None
+                if fundamentals:
+                    successful_fundamentals.append(fundamentals)
+                    logger.info(f"   ✓ Fundamentais coletados")
+                elif not request.fetch_intraday:
+                    # Sem cotações no pedido: a falha do overview é a falha do símbolo
+                    failed_symbols.append(symbol)
+                    logger.warning(f"   ✗ Sem dados fundamentais")
             
             # Progresso
             if idx % 5 == 0:
                 progress = (idx / len(symbols)) * 100
                 logger.info(f"📈 Progresso: {progress:.1f}% ({idx}/{len(symbols)})")
+                if memory.over_threshold():
+                    logger.info(f"💧 Memória acima de {memory.threshold_mb:.0f} MB: gravando agregados pendentes")
+                    rollups_saved &= runtime.rollups.flush()
                 
         except Exception as e:
             failed_symbols.append(symbol)
             logger.error(f"   💥 Erro inesperado em {symbol}: {str(e)}")
             continue
     
+    # Datasets adicionais do registro de endpoints, com o que sobrou do orçamento
+    memory.checkpoint("datasets")
+    datasets_saved: Dict[str, int] = {}
+    dataset_records: Dict[str, Dict[str, Dict]] = {}
+    if request.endpoints is not None:
+        # Endpoints pedidos no evento: buscados mesmo fora da cadência
+        requested = request.dataset_requests(symbols)
+    else:
+        requested = requested_datasets(all_symbols)
+    if requested and collect_extras and not interrupted:
+        remaining = None if budget is None else max(0, budget - (api_client.calls_made - calls_at_start))
+        force = request.endpoints is not None
+        try:
+            if write:
+                datasets_saved = collect_datasets(api_client, s3_manager, runtime.call_planner, requested,
+                                                  remaining, current_time, should_stop, force)
+            else:
+                dataset_records = fetch_datasets(api_client, runtime.call_planner, requested,
+                                                 remaining, current_time, should_stop, force)
+        except StorageReadError:
+            # Estado do planejador não lido: datasets ficam para a próxima execução
+            logger.warning("⚠️  Datasets adicionais ignorados nesta execução")
+    
+    # Cotações recuperadas pelo worker de novas tentativas (retry_queue.py): a
+    # varredura agendada é o único escritor de deduplicação, diffs e latest
+    recovered_keys: List[str] = []
+    quotes_recovered = 0
+    if request.is_scheduled and write and runtime.retry_queue is not None and \
+            not (ledger and ledger.is_written("quotes")):
+        recovered, recovered_keys = load_recovered(s3_manager)
+        fetched = {quote["symbol"] for quote in successful_quotes}
+        for quote in recovered:
+            if quote["symbol"] not in fetched:
+                successful_quotes.append(quote)
+                scheduler.record(quote)
+                quotes_recovered += 1
+        if quotes_recovered:
+            logger.info(f"🔁 {quotes_recovered} cotações recuperadas pelo worker de novas tentativas")
+    
+    # Alertas avaliados sobre todas as cotações, antes de qualquer gravação
+    # (as já avaliadas numa tentativa anterior da janela não geram alertas de novo)
+    memory.checkpoint("alerts")
+    alerts = []
+    if write:
+        alert_quotes = ledger.unalerted(successful_quotes) if ledger else successful_quotes
+        alerts = runtime.alert_engine.evaluate(alert_quotes)
+        if ledger and alert_quotes:
+            ledger.record_alerted([quote["symbol"] for quote in alert_quotes])
+    
     # Salvar dados
     save_results = {
         "quotes_saved": False,
+        "latest_saved": False,
+        "diff_saved": False,
+        "rollups_saved": False,
+        "aggregates_saved": False,
         "fundamentals_saved": False
     }
     
-    # Salvar cotações
-    if successful_quotes:
-        save_results["quotes_saved"] = s3_manager.save_quotes(successful_quotes)
+    memory.checkpoint("save")
+    if write:
+        scheduler.save()
+    
+    # Salvar cotações (apenas barras inéditas; nunca duas vezes na mesma janela):
+    # numa nova tentativa, só as dos símbolos que nenhum objeto anterior contém
+    unsaved_quotes = ledger.unsaved(successful_quotes) if ledger else successful_quotes
+    if len(unsaved_quotes) < len(successful_quotes):
+        logger.info(f"♻️  {len(successful_quotes) - len(unsaved_quotes)} cotações desta janela "
+                    f"já gravadas em tentativa anterior")
+        save_results["quotes_saved"] = not unsaved_quotes
+    new_quotes = dedup_index.filter_new(unsaved_quotes) if write else []
+    quote_diffs = runtime.quote_diffs
+    if new_quotes and quote_diffs.write_files:
+        save_results["quotes_saved"] = s3_manager.save_quotes(new_quotes)
+        if save_results["quotes_saved"]:
+            dedup_index.flush()
+            if ledger:
+                ledger.record_object("quotes", s3_manager.last_written_key)
+        else:
+            dedup_index.rollback()
+    
+    # Apenas os símbolos/campos alterados desde a execução anterior (com
+    # snapshots completos periódicos); mesma janela de barras de 5 minutos
+    if ledger and ledger.is_written("quote_diff") and not unsaved_quotes:
+        save_results["diff_saved"] = True
+    elif successful_quotes and write and quote_diffs.enabled and request.interval == "5min":
+        save_results["diff_saved"] = quote_diffs.publish(successful_quotes, current_time)
+        if save_results["diff_saved"] and ledger:
+            ledger.record_object("quote_diff", quote_state_index_key(date_str))
+        if not quote_diffs.write_files:
+            # Sem arquivos quotes/: os diffs são o registro das cotações
+            save_results["quotes_saved"] = save_results["diff_saved"]
+            if new_quotes:
+                if save_results["diff_saved"]:
+                    dedup_index.flush()
+                else:
+                    dedup_index.rollback()
+    
+    if ledger and unsaved_quotes and save_results["quotes_saved"]:
+        ledger.record_saved([quote["symbol"] for quote in unsaved_quotes])
+    
+    # Snapshot "latest" para leitura com um único GET
+    if successful_quotes and write:
+        save_results["latest_saved"] = runtime.latest_snapshot.publish(successful_quotes)
+    
+    # Objetos do worker incorporados: apagados quando as cotações estão gravadas
+    if recovered_keys and (save_results["quotes_saved"] or not new_quotes):
+        clear_recovered(s3_manager, recovered_keys)
+    
+    # Agregados por setor/indústria (ponderados pela capitalização) sobre o
+    # universo inteiro do snapshot latest: o scheduler busca só os símbolos
+    # devidos, e agregar apenas esses distorceria os grupos a cada execução
+    if full_output and not request.targeted:
+        if successful_fundamentals:
+            runtime.sector_aggregator.update_market_caps(successful_fundamentals, date_str)
+        if successful_quotes and save_results["latest_saved"]:
+            save_results["aggregates_saved"] = runtime.sector_aggregator.publish(
+                runtime.latest_snapshot.quotes(), current_time)
+    
+    # Agregados 15min/60min/diário (barras ingeridas durante a coleta)
+    save_results["rollups_saved"] = runtime.rollups.save() and rollups_saved
+    
+    # Salvar fundamentais (execuções parciais mesclam no arquivo do dia)
+    if successful_fundamentals and collect_fundamentals and full_output:
+        save_results["fundamentals_saved"] = s3_manager.save_fundamentals(successful_fundamentals,
+                                                                          merge=request.targeted)
+        if save_results["fundamentals_saved"] and not request.targeted:
+            runtime.fundamentals_date = date_str
+            if ledger:
+                ledger.record_object("fundamentals", s3_manager.last_written_key)
+    fundamentals_count = len(successful_fundamentals)
+    fundamentals_records = list(successful_fundamentals) if not write else []
+    successful_fundamentals.close()
     
-    # Salvar fundamentais
-    if successful_fundamentals and collect_fundamentals:
-        save_results["fundamentals_saved"] = s3_manager.save_fundamentals(successful_fundamentals)
+    # Falhas da varredura agendada voltam em minutos pela fila de novas tentativas
+    retries_queued = 0
+    if failed_symbols and runtime.retry_queue is not None and request.is_scheduled:
+        retries_queued = runtime.retry_queue.push(failed_symbols, now=current_time.timestamp())
+        logger.info(f"🔁 {retries_queued} símbolos na fila de novas tentativas")
+    
+    # Janela concluída: reexecuções futuras não refazem nada
+    if ledger:
+        ledger.record_failures(failed_symbols)
+        if interrupted:
+            ledger.save()
+        else:
+            ledger.complete()
+    
+    # Backends locais com fsync em lote: a execução termina durável
+    s3_manager.flush()
+    
+    # Resumos analíticos do dia (só os objetos novos; falhas não afetam a execução)
+    if runtime.analytics is not None and full_output:
+        try:
+            runtime.analytics.refresh([date_str], current_date=date_str)
+        except Exception as e:
+            logger.warning(f"⚠️  Falha ao atualizar os resumos analíticos: {str(e)}")
+    
+    api_client.call_limit = None
     
     # Resumo da execução
+    memory.checkpoint()
     execution_time = time.time() - start_time
     logger.info("=" * 50)
     logger.info("🎯 === RESUMO DA EXECUÇÃO ===")
     logger.info(f"✅ Sucessos: {len(successful_quotes)}/{len(symbols)} cotações")
-    logger.info(f"✅ Fundamentais: {len(successful_fundamentals)} coletados")
+    logger.info(f"✅ Fundamentais: {fundamentals_count} coletados")
+    logger.info(f"♻️  Cotações repetidas: {len(successful_quotes) - len(new_quotes)}")
+    logger.info(f"🚨 Alertas emitidos: {len(alerts)}")
     
     if failed_symbols:
         logger.warning(f"⚠️  Falhas: {len(failed_symbols)} símbolos")
-        logger.debug(f"Símbolos com falha: {failed_symbols}")
+        logger.warning(f"Símbolos com falha: {', '.join(failed_symbols)}")
     
     logger.info(f"💾 S3 Quotes: {'✓' if save_results['quotes_saved'] else '✗'}")
     logger.info(f"💾 S3 Fundamentais: {'✓' if save_results['fundamentals_saved'] else '✗'}")
     logger.info(f"⏱️  Tempo total: {execution_time:.1f} segundos")
     logger.info("=" * 50)
     
+    result = {
+        'status': 'interrupted' if interrupted else 'completed',
+        'execution_time_seconds': round(execution_time, 2),
+        'companies_total': len(all_symbols),
+        'companies_scheduled': len(symbols),
+        'quotes_successful': len(successful_quotes),
+        'quotes_new': len(new_quotes),
+        'quotes_recovered': quotes_recovered,
+        'fundamentals_successful': fundamentals_count,
+        'alerts_emitted': len(alerts),
+        'datasets_saved': datasets_saved,
+        'api_calls': api_client.calls_made - calls_at_start,
+        'failed_symbols': failed_symbols,
+        'retries_queued': retries_queued,
+        's3_save_results': save_results,
+        'memory': memory.report(),
+        'request': request.to_event(),
+        'timestamp': current_time.isoformat()
+    }
+    
+    # Saída "response": nada foi gravado, os registros voltam na resposta
+    if not write:
+        result.update({
+            'quotes': successful_quotes,
+            'fundamentals': fundamentals_records,
+            'datasets': dataset_records
+        })
+    return result
+
+# ===== HANDLER PRINCIPAL =====
+def lambda_handler(event, context) -> Dict:
+    """
+    Handler principal da Lambda Function
+    """
+    current_time = datetime.now(timezone.utc)
+    
+    # Evento com pedido explícito (símbolos, endpoints, saída...) ou agendamento
+    try:
+        request = InvocationRequest.from_event(event)
+    except InvalidEventError as e:
+        logger.error(f"❌ Evento inválido: {e}")
+        return {
+            'statusCode': 400,
+            'body': json.dumps({
+                'status': 'invalid_event',
+                'errors': e.errors,
+                'timestamp': current_time.isoformat()
+            })
+        }
+    
+    # Backfill sob demanda: repassado ao handler do backfill
+    if request.backfill:
+        from backfill import backfill_handler
+        return backfill_handler(request.backfill_event(), context)
+    
+    # Fora do pregão (fim de semana, feriado, pré/pós-mercado): sair sem chamadas externas;
+    # pedidos explícitos rodam a qualquer hora
+    if request.is_scheduled and not is_market_open(current_time) and \
+            not os.environ.get('IGNORE_MARKET_HOURS'):
+        logger.info("💤 Mercado fechado - execução ignorada")
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'status': 'skipped',
+                'reason': 'market_closed',
+                'timestamp': current_time.isoformat()
+            })
+        }
+    
+    logger.info("🚀 === INICIANDO PIPELINE DE DADOS ===")
+    
+    # Informações de execução
+    if context:
+        logger.info(f"Request ID: {context.aws_request_id}")
+        logger.info(f"Function: {context.function_name}")
+        logger.info(f"Memory: {context.memory_limit_in_mb}MB")
+    
+    # Componentes reaproveitados entre invocações do mesmo container
+    runtime = get_runtime()
+    runtime.begin_invocation()
+    logger.info(f"{'🧊 Cold start' if runtime.is_cold_start else '🔥 Warm start'} "
+                f"(invocação #{runtime.invocations} neste container)")
+    
+    # Ledger da janela do agendamento (idempotência em retries); execuções
+    # sob demanda não usam o ledger para não encerrar a janela agendada
+    ledger = None
+    if request.is_scheduled:
+        ledger = RunLedger(runtime.s3_manager, schedule_slot(event, current_time))
+        ledger.load()
+    if ledger and ledger.completed:
+        logger.info(f"✅ Janela {ledger.data['slot']} já concluída - nada a fazer")
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'status': 'already_completed',
+                'slot': ledger.data['slot'],
+                'objects': ledger.data['objects'],
+                'timestamp': current_time.isoformat()
+            })
+        }
+    
+    result = run_pipeline(runtime, current_time, ledger=ledger, request=request)
+    
     # Retorno para Lambda
     return {
         'statusCode': 200,
-        'body': json.dumps({
-            'status': 'completed',
-            'execution_time_seconds': round(execution_time, 2),
-            'companies_total': len(symbols),
-            'quotes_successful': len(successful_quotes),
-            'fundamentals_successful': len(successful_fundamentals),
-            'failed_symbols': failed_symbols,
-            's3_save_results': save_results,
-            'timestamp': current_time.isoformat()
-        })
+        'body': json.dumps(result)
     }
 
 # ===== CÓDIGO PARA TESTE LOCAL =====
@@ -0,0 +1,161 @@
+"""
+Calendário da NYSE: feriados, pregões reduzidos e horário de verão.
+
+As sessões de cada ano são pré-calculadas uma única vez (tabela em
+memória com abertura e fechamento em UTC), então verificar se o mercado
+está aberto é uma consulta a dicionário, sem nenhuma chamada externa.
+O fuso America/New_York (pytz) resolve a mudança de horário de verão.
+"""
+
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import pytz
+
+EXCHANGE_TZ = pytz.timezone('America/New_York')
+
+REGULAR_OPEN = time(9, 30)
+REGULAR_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+
+# ===== REGRAS DE FERIADOS =====
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-ésimo dia da semana do mês (n=-1 para o último)"""
+    if n > 0:
+        first = date(year, month, 1)
+        offset = (weekday - first.weekday()) % 7
+        return first + timedelta(days=offset + 7 * (n - 1))
+
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    last = next_month - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    """Domingo de Páscoa (algoritmo gregoriano anônimo)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(day: date) -> date:
+    """Feriado no sábado é observado na sexta; no domingo, na segunda"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=None)
+def nyse_holidays(year: int) -> Dict[date, str]:
+    """Feriados da NYSE no ano"""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3): "Martin Luther King Jr. Day",
+        _nth_weekday(year, 2, 0, 3): "Presidents' Day",
+        _easter(year) - timedelta(days=2): "Good Friday",
+        _nth_weekday(year, 5, 0, -1): "Memorial Day",
+        _observed(date(year, 7, 4)): "Independence Day",
+        _nth_weekday(year, 9, 0, 1): "Labor Day",
+        _nth_weekday(year, 11, 3, 4): "Thanksgiving Day",
+        _observed(date(year, 12, 25)): "Christmas Day",
+    }
+
+    # Ano Novo no sábado não é observado na sexta anterior (regra da NYSE)
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays[_observed(new_year)] = "New Year's Day"
+
+    if year >= 2022:
+        holidays[_observed(date(year, 6, 19))] = "Juneteenth"
+
+    return holidays
+
+
+@lru_cache(maxsize=None)
+def nyse_early_closes(year: int) -> Dict[date, str]:
+    """Pregões encerrados às 13:00 (horário de Nova York)"""
+    candidates = {
+        date(year, 7, 3): "Independence Day Eve",
+        _nth_weekday(year, 11, 3, 4) + timedelta(days=1): "Day after Thanksgiving",
+        date(year, 12, 24): "Christmas Eve",
+    }
+    holidays = nyse_holidays(year)
+    return {day: name for day, name in candidates.items()
+            if day.weekday() < 5 and day not in holidays}
+
+
+# ===== TABELA DE SESSÕES =====
+@lru_cache(maxsize=None)
+def session_table(year: int) -> Dict[date, Tuple[datetime, datetime]]:
+    """Sessões do ano: data -> (abertura UTC, fechamento UTC)"""
+    holidays = nyse_holidays(year)
+    early_closes = nyse_early_closes(year)
+    sessions = {}
+
+    day = date(year, 1, 1)
+    while day.year == year:
+        if day.weekday() < 5 and day not in holidays:
+            close_time = EARLY_CLOSE if day in early_closes else REGULAR_CLOSE
+            market_open = EXCHANGE_TZ.localize(datetime.combine(day, REGULAR_OPEN))
+            market_close = EXCHANGE_TZ.localize(datetime.combine(day, close_time))
+            sessions[day] = (market_open.astimezone(timezone.utc),
+                             market_close.astimezone(timezone.utc))
+        day += timedelta(days=1)
+
+    return sessions
+
+
+def exchange_date(now: datetime) -> date:
+    """Data do pregão correspondente ao instante (horário de Nova York)"""
+    return now.astimezone(EXCHANGE_TZ).date()
+
+
+def get_session(day: date) -> Optional[Tuple[datetime, datetime]]:
+    """Abertura e fechamento (UTC) do pregão no dia, ou None se fechado"""
+    return session_table(day.year).get(day)
+
+
+def is_trading_day(day: date) -> bool:
+    return get_session(day) is not None
+
+
+def is_market_open(now: Optional[datetime] = None) -> bool:
+    """True se o instante está dentro de um pregão regular"""
+    now = now or datetime.now(timezone.utc)
+    session = get_session(exchange_date(now))
+    return session is not None and session[0] <= now < session[1]
+
+
+def next_session_open(now: Optional[datetime] = None) -> datetime:
+    """Próxima abertura de pregão (UTC) a partir do instante dado"""
+    now = now or datetime.now(timezone.utc)
+    day = exchange_date(now)
+    for _ in range(366):
+        session = get_session(day)
+        if session is not None and session[0] > now:
+            return session[0]
+        day += timedelta(days=1)
+    raise ValueError(f"Nenhum pregão encontrado após {now.isoformat()}")
+
+
+if __name__ == "__main__":
+    # Teste das funções
+    year = datetime.now(timezone.utc).year
+    print(f"Feriados {year}:")
+    for day, name in sorted(nyse_holidays(year).items()):
+        print(f"  {day} - {name}")
+    print(f"Pregões reduzidos {year}: {sorted(nyse_early_closes(year))}")
+    print(f"Pregões no ano: {len(session_table(year))}")
+    print(f"Mercado aberto agora: {is_market_open()}")
+    print(f"Próxima abertura: {next_session_open().isoformat()}")
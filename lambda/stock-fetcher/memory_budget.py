@@ -0,0 +1,293 @@
+"""
+Modo de orçamento de memória para a Lambda de 128 MB.
+
+MemoryBudget mede a memória de cada estágio da varredura (RSS atual e
+pico do processo; com MEMORY_TRACE=1 também o pico de alocações Python
+via tracemalloc) e indica quando o RSS passa do limiar de transbordo.
+Acima do limiar, os acumuladores da varredura descarregam: SpillList
+grava os registros em /tmp (JSON Lines) e o pipeline grava os agregados
+pendentes no S3.
+
+Configuração por ambiente:
+    MEMORY_BUDGET_MB    orçamento (padrão: AWS_LAMBDA_FUNCTION_MEMORY_SIZE)
+    MEMORY_SPILL_RATIO  fração do orçamento que dispara o transbordo (0.75)
+    MEMORY_TRACE        1 liga o tracemalloc (custo de CPU e memória)
+
+Varredura sintética de 1.000 símbolos, falha se o pico passar de 128 MB:
+    python memory_budget.py [--symbols 1000] [--limit-mb 128]
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPILL_RATIO = 0.75
+# Após um transbordo, o próximo só ocorre se o RSS crescer mais essa fração
+# do orçamento (o alocador do Python nem sempre devolve memória ao sistema)
+SPILL_STEP_RATIO = 0.05
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss_mb() -> float:
+    """RSS atual (Linux: /proc/self/statm; fallback: pico do processo)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class MemoryBudget:
+    """Medição por estágio e limiar de transbordo"""
+
+    def __init__(self, limit_mb: Optional[float] = None, spill_ratio: float = DEFAULT_SPILL_RATIO,
+                 trace: bool = False):
+        self.limit_mb = limit_mb
+        self.spill_ratio = spill_ratio
+        self.trace = trace
+        self.stages: Dict[str, Dict] = {}
+        self.spills = 0
+        self._next_spill_mb: Optional[float] = None
+        self._stage: Optional[str] = None
+        self._stage_started = 0.0
+
+    @classmethod
+    def from_env(cls) -> "MemoryBudget":
+        limit = os.environ.get('MEMORY_BUDGET_MB') or os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE')
+        return cls(
+            limit_mb=float(limit) if limit else None,
+            spill_ratio=float(os.environ.get('MEMORY_SPILL_RATIO', DEFAULT_SPILL_RATIO)),
+            trace=os.environ.get('MEMORY_TRACE', '').lower() in ('1', 'true', 'yes')
+        )
+
+    @property
+    def threshold_mb(self) -> Optional[float]:
+        return self.limit_mb * self.spill_ratio if self.limit_mb else None
+
+    def over_threshold(self) -> bool:
+        """True quando é hora de transbordar (com histerese entre transbordos)"""
+        if self.limit_mb is None:
+            return False
+        rss = current_rss_mb()
+        if rss < max(self.threshold_mb, self._next_spill_mb or 0):
+            return False
+        self._next_spill_mb = rss + self.limit_mb * SPILL_STEP_RATIO
+        self.spills += 1
+        return True
+
+    def start(self, stage: str):
+        """Inicia a medição da varredura no primeiro estágio"""
+        self.stages = {}
+        self.spills = 0
+        self._next_spill_mb = None
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._begin(stage)
+
+    def _begin(self, stage: str):
+        self._stage = stage
+        self._stage_started = time.perf_counter()
+        if self.trace and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+    def checkpoint(self, next_stage: Optional[str] = None):
+        """Fecha o estágio atual (registrando as medidas) e abre o próximo"""
+        if self._stage is not None:
+            stats = {
+                "seconds": round(time.perf_counter() - self._stage_started, 3),
+                "rss_mb": round(current_rss_mb(), 1),
+                "peak_rss_mb": round(peak_rss_mb(), 1)
+            }
+            if self.trace and tracemalloc.is_tracing():
+                stats["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            self.stages[self._stage] = stats
+        if next_stage:
+            self._begin(next_stage)
+        else:
+            self._stage = None
+
+    def report(self) -> Dict:
+        return {
+            "limit_mb": self.limit_mb,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "spills": self.spills,
+            "stages": self.stages
+        }
+
+
+class SpillList(list):
+    """
+    Lista de registros que transborda para /tmp acima do limiar de memória.
+
+    Só suporta append, iteração e len (o que o pipeline usa). A
+    serialização com json.JSONEncoder.iterencode percorre a lista via
+    __iter__, então os registros transbordados são lidos do disco sem
+    voltar todos para a memória.
+    """
+
+    CHECK_EVERY = 50
+
+    def __init__(self, name: str, budget: Optional[MemoryBudget] = None):
+        super().__init__()
+        self.name = name
+        self.budget = budget
+        self._file = None
+        self._spilled = 0
+
+    def append(self, record):
+        super().append(record)
+        if (self.budget is not None and super().__len__() % self.CHECK_EVERY == 0
+                and self.budget.over_threshold()):
+            self.spill()
+
+    def spill(self):
+        if not super().__len__():
+            return
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(mode="w+", encoding="utf-8",
+                                                prefix=f"spill-{self.name}-", dir="/tmp")
+        self._file.seek(0, os.SEEK_END)
+        for record in super().__iter__():
+            self._file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        self._spilled += super().__len__()
+        logger.info(f"💧 {self.name}: {super().__len__()} registros transbordados para /tmp "
+                    f"(total {self._spilled})")
+        self.clear()
+
+    def __iter__(self) -> Iterator:
+        if self._file is not None:
+            self._file.flush()
+            self._file.seek(0)
+            for line in self._file:
+                yield json.loads(line)
+        yield from super().__iter__()
+
+    def __len__(self) -> int:
+        return self._spilled + super().__len__()
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._spilled = 0
+        self.clear()
+
+
+# ===== VARREDURA SINTÉTICA =====
+def _synthetic_sweep(symbols: int, bars: int, root: Optional[str] = None):
+    """
+    Executa run_pipeline com API e S3 locais (objetos em /tmp). Com root,
+    os objetos ficam nesse diretório para conferência após a varredura.
+    """
+    import io
+    import random
+    import shutil
+    import sys
+    from datetime import datetime, timedelta, timezone
+
+    os.environ.setdefault('ALPHA_VANTAGE_API_KEY', 'SYNTHETIC-SWEEP-KEY')
+    os.environ.setdefault('S3_BUCKET_NAME', 'synthetic-sweep')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ['IGNORE_MARKET_HOURS'] = '1'
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    logging.disable(logging.CRITICAL)
+    import lambda_function
+
+    keep = root is not None
+    root = root or tempfile.mkdtemp(prefix="sweep-s3-")
+
+    class NoSuchKey(Exception):
+        pass
+
+    class LocalS3:
+        """S3 mínimo em disco: os objetos não contam no RSS do processo"""
+        exceptions = type("Exceptions", (), {"NoSuchKey": NoSuchKey})
+
+        def _path(self, key):
+            return os.path.join(root, key.replace("/", "__"))
+
+        def put_object(self, Bucket, Key, Body, **kwargs):
+            with open(self._path(Key), "wb") as handle:
+                handle.write(Body.read() if hasattr(Body, "read") else Body)
+            with open(self._path(Key) + ".encoding", "w") as handle:
+                handle.write(kwargs.get("ContentEncoding") or "")
+
+        def get_object(self, Bucket, Key, **kwargs):
+            if not os.path.exists(self._path(Key)):
+                raise NoSuchKey(Key)
+            with open(self._path(Key), "rb") as handle, open(self._path(Key) + ".encoding") as enc:
+                return {"Body": io.BytesIO(handle.read()), "ContentEncoding": enc.read() or None}
+
+        def head_object(self, Bucket, Key):
+            if not os.path.exists(self._path(Key)):
+                raise NoSuchKey(Key)
+            return {"ContentLength": os.path.getsize(self._path(Key))}
+
+    session_open = datetime(2024, 1, 2, 9, 30)
+    stamps = [(session_open + timedelta(minutes=5 * i)).strftime("%Y-%m-%d %H:%M:%S") for i in range(bars)]
+
+    def intraday(self, symbol, interval="5min"):
+        series = {}
+        for idx, stamp in enumerate(stamps):
+            price = 100 + random.random() * 10
+            series[stamp] = {"1. open": f"{price:.4f}", "2. high": f"{price + 1:.4f}",
+                             "3. low": f"{price - 1:.4f}", "4. close": f"{price + 0.5:.4f}",
+                             "5. volume": str(1000 + idx)}
+        return {"Meta Data": {}, "Time Series (5min)": series}
+
+    def overview(self, symbol):
+        return {"Symbol": symbol, "Name": f"Company {symbol}", "Description": "x" * 600,
+                "MarketCapitalization": str(random.randint(10 ** 9, 10 ** 12)), "PERatio": "21.5"}
+
+    universe = [f"S{idx:04d}" for idx in range(symbols)]
+    lambda_function.get_all_symbols = lambda: universe
+    lambda_function.s3_client = LocalS3()
+    lambda_function.AlphaVantageAPI.get_intraday_quotes = intraday
+    lambda_function.AlphaVantageAPI.get_company_overview = overview
+
+    try:
+        runtime = lambda_function.get_runtime()
+        runtime.begin_invocation()
+        return lambda_function.run_pipeline(runtime, datetime(2024, 1, 2, 21, 0, tzinfo=timezone.utc))
+    finally:
+        if not keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Varredura sintética sob orçamento de memória")
+    parser.add_argument("--symbols", type=int, default=1000)
+    parser.add_argument("--bars", type=int, default=100, help="Barras por resposta (compact = 100)")
+    parser.add_argument("--limit-mb", type=float, default=128)
+    args = parser.parse_args()
+
+    os.environ.setdefault('MEMORY_BUDGET_MB', str(args.limit_mb))
+    start = time.perf_counter()
+    result = _synthetic_sweep(args.symbols, args.bars)
+    elapsed = time.perf_counter() - start
+
+    memory = result["memory"]
+    print(f"{result['quotes_successful']} cotações, {result['fundamentals_successful']} fundamentais "
+          f"em {elapsed:.1f}s; transbordos: {memory['spills']}")
+    for stage, stats in memory["stages"].items():
+        print(f"  {stage:>14}: RSS {stats['rss_mb']:6.1f} MB  pico {stats['peak_rss_mb']:6.1f} MB  "
+              f"{stats['seconds']:6.2f}s" +
+              (f"  tracemalloc {stats['traced_peak_mb']:.1f} MB" if "traced_peak_mb" in stats else ""))
+    print(f"Pico de RSS: {memory['peak_rss_mb']:.1f} MB (limite {args.limit_mb:.0f} MB)")
+    raise SystemExit(0 if memory["peak_rss_mb"] <= args.limit_mb else 1)
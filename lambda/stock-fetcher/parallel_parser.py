@@ -0,0 +1,264 @@
+"""
+Parsing em pool de processos para payloads grandes de backfill.
+
+Respostas com outputsize=full ou fatias mensais trazem dezenas de milhares
+de barras por símbolo; decodificar o JSON e converter os valores em uma
+única thread vira gargalo de CPU quando a busca é paralela. Este módulo
+recebe os bytes brutos das respostas, faz o parsing em processos
+separados e devolve arrays colunares tipados.
+
+Os workers gravam as colunas em memória compartilhada
+(multiprocessing.shared_memory) e retornam apenas o nome do bloco; o
+processo principal lê as colunas via memoryview, sem pagar o custo de
+pickle dos dados. Onde /dev/shm não existe (ex.: AWS Lambda), os arrays
+voltam pelo caminho normal do pool.
+
+Estágio avulso: o pipeline e o backfill recebem as respostas já
+decodificadas pelo requests e continuam limitados pelo rate limit da API,
+então não passam por aqui; o pool serve a reprocessamentos de respostas
+brutas guardadas (e ao benchmark).
+
+Benchmark (1..N núcleos):
+    python parallel_parser.py [--symbols 32] [--bars 20000]
+"""
+
+import argparse
+import json
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Ordem fixa das colunas no bloco de memória compartilhada
+COLUMNS = (("timestamp", "q"), ("open", "d"), ("high", "d"),
+           ("low", "d"), ("close", "d"), ("volume", "q"))
+ITEM_SIZE = 8
+EPOCH = datetime(1970, 1, 1)
+
+
+# ===== PARSING (executado nos workers) =====
+def parse_series_columns(raw: bytes, interval: str = "5min") -> Dict[str, array]:
+    """
+    Converte uma resposta TIME_SERIES_* em colunas tipadas, em ordem
+    cronológica. Timestamps são segundos desde 1970 no horário da bolsa
+    (o fuso informado em "Meta Data").
+    """
+    series = json.loads(raw).get(f"Time Series ({interval})", {})
+    columns = {name: array(code) for name, code in COLUMNS}
+
+    timestamps, opens, highs = columns["timestamp"], columns["open"], columns["high"]
+    lows, closes, volumes = columns["low"], columns["close"], columns["volume"]
+    for stamp in sorted(series):
+        values = series[stamp]
+        timestamps.append(int((datetime.fromisoformat(stamp) - EPOCH).total_seconds()))
+        opens.append(float(values["1. open"]))
+        highs.append(float(values["2. high"]))
+        lows.append(float(values["3. low"]))
+        closes.append(float(values["4. close"]))
+        volumes.append(int(values["5. volume"]))
+
+    return columns
+
+
+def _parse_to_shared_memory(raw: bytes, interval: str) -> Tuple[str, int]:
+    """Worker: grava as colunas em um bloco compartilhado e retorna (nome, n)"""
+    from multiprocessing import shared_memory
+
+    columns = parse_series_columns(raw, interval)
+    count = len(columns["timestamp"])
+    shm = shared_memory.SharedMemory(create=True, size=max(1, count * ITEM_SIZE * len(COLUMNS)))
+
+    # O resource tracker é o do processo principal, que faz o unlink (e o
+    # tracker remove os blocos se o processo principal morrer antes)
+    try:
+        offset = 0
+        for name, _ in COLUMNS:
+            data = columns[name].tobytes()
+            shm.buf[offset:offset + len(data)] = data
+            offset += count * ITEM_SIZE
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return shm.name, count
+
+
+# ===== RESULTADO =====
+class ColumnarBars:
+    """Colunas de barras de um símbolo (memoryviews sobre o buffer)"""
+
+    def __init__(self, symbol: str, count: int, columns: Dict[str, memoryview], shm=None):
+        self.symbol = symbol
+        self.count = count
+        self.columns = columns
+        self._shm = shm
+
+    @classmethod
+    def from_shared_memory(cls, symbol: str, name: str, count: int) -> "ColumnarBars":
+        from multiprocessing import shared_memory
+
+        shm = shared_memory.SharedMemory(name=name)
+        columns = {}
+        offset = 0
+        for column, code in COLUMNS:
+            size = count * ITEM_SIZE
+            columns[column] = shm.buf[offset:offset + size].cast(code)
+            offset += size
+        return cls(symbol, count, columns, shm)
+
+    @classmethod
+    def from_arrays(cls, symbol: str, arrays: Dict[str, array]) -> "ColumnarBars":
+        return cls(symbol, len(arrays["timestamp"]),
+                   {name: memoryview(values) for name, values in arrays.items()})
+
+    def __getitem__(self, column: str) -> memoryview:
+        return self.columns[column]
+
+    def close(self):
+        """Libera as views e o bloco de memória compartilhada"""
+        for view in self.columns.values():
+            view.release()
+        self.columns = {}
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _unlink_block(name: str):
+    """Remove um bloco que não chegou a virar ColumnarBars"""
+    from multiprocessing import shared_memory
+
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def shared_memory_available() -> bool:
+    return os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK)
+
+
+# ===== POOL =====
+class ParallelSeriesParser:
+    """Estágio opcional de parsing em pool de processos"""
+
+    def __init__(self, max_workers: Optional[int] = None, interval: str = "5min",
+                 use_shared_memory: Optional[bool] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.interval = interval
+        self.use_shared_memory = (shared_memory_available() if use_shared_memory is None
+                                  else use_shared_memory)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self):
+        if self.use_shared_memory:
+            from multiprocessing import resource_tracker
+
+            # Tracker iniciado antes dos workers: todos registram os blocos nele
+            resource_tracker.ensure_running()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self
+
+    def __exit__(self, *exc):
+        self._executor.shutdown()
+        self._executor = None
+
+    def parse_many(self, payloads: Dict[str, bytes]) -> Dict[str, ColumnarBars]:
+        """Faz o parsing de {símbolo: bytes brutos} em paralelo"""
+        if self._executor is None:
+            with self:
+                return self.parse_many(payloads)
+
+        symbols = list(payloads)
+        if self.use_shared_memory:
+            futures = [self._executor.submit(_parse_to_shared_memory, payloads[symbol], self.interval)
+                       for symbol in symbols]
+            results: Dict[str, ColumnarBars] = {}
+            blocks: List[Tuple[str, str, int]] = []
+            error: Optional[BaseException] = None
+            try:
+                # Todos os futures são coletados antes de o erro subir: nenhum
+                # bloco já criado por outro worker fica sem unlink
+                for symbol, future in zip(symbols, futures):
+                    try:
+                        blocks.append((symbol, *future.result()))
+                    except BaseException as e:
+                        error = error or e
+                if error is not None:
+                    raise error
+                for symbol, name, count in blocks:
+                    results[symbol] = ColumnarBars.from_shared_memory(symbol, name, count)
+            except BaseException:
+                for bars in results.values():
+                    bars.close()
+                for symbol, name, _ in blocks:
+                    if symbol not in results:
+                        _unlink_block(name)
+                raise
+            return results
+
+        futures = [self._executor.submit(parse_series_columns, payloads[symbol], self.interval)
+                   for symbol in symbols]
+        return {symbol: ColumnarBars.from_arrays(symbol, future.result())
+                for symbol, future in zip(symbols, futures)}
+
+
+# ===== BENCHMARK =====
+def _synthetic_payload(bars: int, interval: str = "5min") -> bytes:
+    series = {}
+    stamp = datetime(2024, 1, 2, 9, 30).timestamp()
+    for i in range(bars):
+        price = 100 + (i % 500) * 0.01
+        series[datetime.fromtimestamp(stamp + i * 300).strftime("%Y-%m-%d %H:%M:%S")] = {
+            "1. open": f"{price:.4f}", "2. high": f"{price + 0.5:.4f}",
+            "3. low": f"{price - 0.5:.4f}", "4. close": f"{price + 0.1:.4f}",
+            "5. volume": str(1000 + i)
+        }
+    return json.dumps({"Meta Data": {}, f"Time Series ({interval})": series}).encode()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do parsing em pool de processos")
+    parser.add_argument("--symbols", type=int, default=32)
+    parser.add_argument("--bars", type=int, default=20000)
+    args = parser.parse_args()
+
+    payload = _synthetic_payload(args.bars)
+    payloads = {f"SYM{i}": payload for i in range(args.symbols)}
+    total_bars = args.symbols * args.bars
+    print(f"Payload: {len(payload) / 1e6:.1f} MB x {args.symbols} símbolos ({total_bars:,} barras)")
+    print(f"Memória compartilhada disponível: {shared_memory_available()}")
+
+    start = time.perf_counter()
+    for raw in payloads.values():
+        parse_series_columns(raw)
+    baseline = time.perf_counter() - start
+    print(f"{'serial':>8}: {baseline:6.2f}s  ({total_bars / baseline:,.0f} barras/s)")
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        with ParallelSeriesParser(max_workers=workers) as pool:
+            # Aquecimento: sobe os processos antes de medir
+            for bars in pool.parse_many({f"warmup{i}": _synthetic_payload(1)
+                                         for i in range(workers)}).values():
+                bars.close()
+            start = time.perf_counter()
+            results = pool.parse_many(payloads)
+            elapsed = time.perf_counter() - start
+        for bars in results.values():
+            bars.close()
+        print(f"{workers:>3} proc: {elapsed:6.2f}s  ({total_bars / elapsed:,.0f} barras/s, "
+              f"speedup {baseline / elapsed:.2f}x)")
+        workers *= 2
@@ -0,0 +1,237 @@
+"""
+Snapshots completos periódicos e diffs entre execuções das cotações.
+
+O publicador mantém em memória (containers quentes) o vetor de cotações
+da execução anterior, {símbolo: {campo: valor}}, e a cada execução grava
+apenas os símbolos e campos que mudaram. A cada QUOTE_SNAPSHOT_EVERY
+execuções (e na primeira do dia) grava o estado completo. O índice do
+dia lista as execuções em ordem, então o leitor reconstrói o estado de
+qualquer execução com o último snapshot anterior + os diffs seguintes, e
+consumidores de streaming leem só as mudanças.
+
+    quote-state/{YYYY-MM-DD}/index.json           execuções do dia
+    quote-state/{YYYY-MM-DD}/full-{HHMMSS}.json   {"quotes": {símbolo: {campo: valor}}}
+    quote-state/{YYYY-MM-DD}/diff-{HHMMSS}.json   {"changed": {símbolo: {campo: valor}}}
+
+QUOTE_STORAGE escolhe o armazenamento das cotações de cada execução:
+    both    arquivos quotes/ e diffs (padrão, transição)
+    diffs   apenas snapshots e diffs
+    files   apenas os arquivos quotes/ (comportamento anterior)
+
+Reconstrução:
+    python quote_diffs.py --date 2024-01-15 [--run 153000] [--changes-since 150000]
+"""
+
+import argparse
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from storage_backends import StorageReadError
+
+logger = logging.getLogger(__name__)
+
+STATE_PREFIX = "quote-state"
+# Campos que variam entre execuções (nome, setor e indústria vêm do company_list)
+FIELDS = ("timestamp", "price", "change", "change_percent", "volume", "open", "high", "low", "close")
+DEFAULT_SNAPSHOT_EVERY = 12   # Um snapshot completo por hora no agendamento de 5 minutos
+STORAGE_MODES = ("both", "diffs", "files")
+
+State = Dict[str, Dict]
+
+
+def index_key(date_str: str) -> str:
+    return f"{STATE_PREFIX}/{date_str}/index.json"
+
+
+def run_key(date_str: str, kind: str, run_id: str) -> str:
+    return f"{STATE_PREFIX}/{date_str}/{kind}-{run_id}.json"
+
+
+def quote_vector(quote: Dict) -> Dict:
+    return {field: quote.get(field) for field in FIELDS}
+
+
+def diff_states(previous: State, current: State) -> State:
+    """Símbolos e campos de current que diferem de previous"""
+    changed = {}
+    for symbol, vector in current.items():
+        before = previous.get(symbol, {})
+        fields = {field: value for field, value in vector.items() if before.get(field) != value}
+        if fields:
+            changed[symbol] = fields
+    return changed
+
+
+def apply_diff(state: State, changed: State) -> State:
+    """Aplica um diff sobre o estado (in place) e o retorna"""
+    for symbol, fields in changed.items():
+        state.setdefault(symbol, {}).update(fields)
+    return state
+
+
+# ===== PUBLICAÇÃO =====
+class QuoteDiffPublisher:
+    """Grava o diff da execução (ou um snapshot completo periódico)"""
+
+    def __init__(self, s3_manager, storage: str = "both", snapshot_every: int = DEFAULT_SNAPSHOT_EVERY):
+        self.s3_manager = s3_manager
+        self.storage = storage
+        self.snapshot_every = snapshot_every
+        # Estado após a última execução publicada (reaproveitado em containers quentes)
+        self.state: Optional[State] = None
+        self.index: Optional[Dict] = None
+
+    @classmethod
+    def from_env(cls, s3_manager) -> "QuoteDiffPublisher":
+        storage = os.environ.get('QUOTE_STORAGE', 'both')
+        if storage not in STORAGE_MODES:
+            logger.warning(f"QUOTE_STORAGE inválido ({storage}), usando 'both'")
+            storage = "both"
+        return cls(s3_manager, storage,
+                   int(os.environ.get('QUOTE_SNAPSHOT_EVERY', DEFAULT_SNAPSHOT_EVERY)))
+
+    @property
+    def enabled(self) -> bool:
+        return self.storage != "files"
+
+    @property
+    def write_files(self) -> bool:
+        return self.storage != "diffs"
+
+    def _load(self, date_str: str):
+        """
+        Índice do dia, relido a cada execução. O estado em memória só é
+        reaproveitado se o índice não mudou desde a última publicação; no
+        cold start (ou se outro container publicou) é reconstruído do S3.
+        Uma falha de leitura levanta StorageReadError: tratá-la como dia
+        vazio regravaria o índice só com esta execução
+        """
+        cached = self.index is not None and self.index["date"] == date_str
+        stored = self.s3_manager.read_json(index_key(date_str))
+        if cached and stored is not None and stored["runs"] == self.index["runs"]:
+            return
+        if cached:
+            logger.info(f"🧩 Índice de {date_str} alterado por outra execução, reconstruindo o estado")
+        index = stored or {"date": date_str, "runs": []}
+        state = QuoteStateReader(self.s3_manager).state_at(date_str, index=index) if index["runs"] else {}
+        self.index, self.state = index, state
+
+    def publish(self, quotes: List[Dict], current_time: datetime) -> bool:
+        """Grava o diff (ou snapshot) da execução e o registra no índice do dia"""
+        date_str = current_time.strftime("%Y-%m-%d")
+        run_id = current_time.strftime("%H%M%S")
+        try:
+            self._load(date_str)
+        except (StorageReadError, RuntimeError) as e:
+            # Publicação falha; o próximo diff inclui estas mudanças
+            logger.error(f"❌ Estado das cotações de {date_str} não lido: {str(e)}")
+            self.index = None
+            return False
+
+        state = {symbol: dict(vector) for symbol, vector in self.state.items()}
+        for quote in quotes:
+            current = state.get(quote["symbol"])
+            if current is not None and (current.get("timestamp") or "") > (quote.get("timestamp") or ""):
+                continue
+            state[quote["symbol"]] = quote_vector(quote)
+        changed = diff_states(self.state, state)
+
+        runs = self.index["runs"]
+        since_full = next((idx for idx, run in enumerate(reversed(runs)) if run["kind"] == "full"), None)
+        full = since_full is None or since_full + 1 >= self.snapshot_every
+
+        if full:
+            key = run_key(date_str, "full", run_id)
+            document = {"date": date_str, "run": run_id, "fields": list(FIELDS), "quotes": state}
+        elif changed:
+            key = run_key(date_str, "diff", run_id)
+            document = {"date": date_str, "run": run_id, "previous": runs[-1]["run"], "changed": changed}
+        else:
+            key = None
+
+        if key and not self.s3_manager.write_json(key, document, {'changed-symbols': str(len(changed))}):
+            # Mantém o estado anterior: o próximo diff inclui estas mudanças
+            return False
+
+        # Índice depois do objeto: leitores nunca veem uma execução sem objeto
+        runs.append({"run": run_id, "kind": "full" if full else "diff", "key": key,
+                     "changed": len(changed)})
+        if not self.s3_manager.write_json(index_key(date_str), self.index, {'total-runs': str(len(runs))}):
+            runs.pop()
+            return False
+
+        self.state = state
+        logger.info(f"🧩 Cotações: {'snapshot completo' if full else 'diff'} com "
+                    f"{len(changed)}/{len(state)} símbolos alterados")
+        return True
+
+
+# ===== LEITURA =====
+class QuoteStateReader:
+    """Reconstrói o estado de qualquer execução a partir de snapshot + diffs"""
+
+    def __init__(self, s3_manager):
+        self.s3_manager = s3_manager
+
+    def runs(self, date_str: str) -> List[Dict]:
+        return (self.s3_manager.read_json(index_key(date_str)) or {"runs": []})["runs"]
+
+    def state_at(self, date_str: str, run_id: Optional[str] = None,
+                 index: Optional[Dict] = None) -> State:
+        """Estado após a execução run_id (padrão: a última do dia)"""
+        runs = (index or {}).get("runs") or self.runs(date_str)
+        runs = [run for run in runs if run_id is None or run["run"] <= run_id]
+        base = next((idx for idx in range(len(runs) - 1, -1, -1) if runs[idx]["kind"] == "full"), None)
+        if base is None:
+            return {}
+
+        keys = [run["key"] for run in runs[base:] if run["key"]]
+        documents = self.s3_manager.read_many(keys)
+        if any(document is None for document in documents):
+            missing = [key for key, document in zip(keys, documents) if document is None]
+            raise RuntimeError(f"Objetos de estado ausentes: {missing}")
+
+        state = {symbol: dict(vector) for symbol, vector in documents[0]["quotes"].items()}
+        for document in documents[1:]:
+            apply_diff(state, document["changed"])
+        return state
+
+    def changes_since(self, date_str: str, run_id: str) -> List[Dict]:
+        """Diffs das execuções posteriores a run_id (para consumidores de streaming)"""
+        index = {"runs": self.runs(date_str)}
+        runs = [run for run in index["runs"] if run["run"] > run_id and run["key"]]
+        # Estado corrente, avançado a cada diff; só é necessário se houver snapshots
+        state = self.state_at(date_str, run_id, index) if any(run["kind"] == "full" for run in runs) else None
+        changes = []
+        for run, document in zip(runs, self.s3_manager.read_many([run["key"] for run in runs])):
+            if run["kind"] == "full":
+                # Snapshot: as mudanças são a diferença para o estado anterior
+                changed = diff_states(state, document["quotes"])
+                state = {symbol: dict(vector) for symbol, vector in document["quotes"].items()}
+            else:
+                changed = document["changed"]
+                if state is not None:
+                    apply_diff(state, changed)
+            changes.append({"run": run["run"], "changed": changed})
+        return changes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstrói o estado das cotações de uma execução")
+    parser.add_argument("--date", required=True, help="Dia (YYYY-MM-DD)")
+    parser.add_argument("--run", help="Execução (HHMMSS, padrão: a última)")
+    parser.add_argument("--changes-since", metavar="HHMMSS", help="Lista só as mudanças posteriores")
+    args = parser.parse_args()
+
+    # Import tardio: lambda_function valida variáveis de ambiente ao carregar
+    from lambda_function import get_runtime
+
+    reader = QuoteStateReader(get_runtime().s3_manager)
+    if args.changes_since:
+        output = reader.changes_since(args.date, args.changes_since)
+    else:
+        output = reader.state_at(args.date, args.run)
+    print(json.dumps(output, indent=2))
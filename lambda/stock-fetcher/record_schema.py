@@ -0,0 +1,205 @@
+"""
+Especificações de campos e conversores pré-compilados dos registros.
+
+Cada especificação lista (campo de saída, campo de origem, tipo, opções).
+compile_converter gera, uma única vez, o código Python de uma função que
+lê cada campo da origem uma vez, converte para o tipo declarado e coleta
+os erros de validação em uma lista (em vez de engolir tudo com um
+`except Exception`). A função gerada é código linear, sem laço sobre a
+especificação nem chamadas de função por campo.
+
+Tipos:
+    str     texto (default se ausente)
+    text    texto truncado em max_length, com "..." no final
+    float   número; "None", "N/A", "-" e vazio viram None; vírgulas de
+            milhar são aceitas
+    int     inteiro (aceita "123.0")
+    now     timestamp ISO (UTC) da conversão
+
+Campos com required=True ausentes ou inválidos invalidam o registro.
+
+Benchmark do custo por registro:
+    python record_schema.py [--records 20000]
+"""
+
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+NULL_VALUES = frozenset(("", "None", "N/A", "-"))
+
+# (campo, valor, motivo)
+FieldError = Tuple[str, object, str]
+Converter = Callable[[Dict], Tuple[Optional[Dict], List[FieldError]]]
+
+OVERVIEW_SPEC = [
+    ("symbol", "Symbol", "str", {"required": True}),
+    ("name", "Name", "str", {}),
+    ("description", "Description", "text", {"max_length": 400}),
+    ("sector", "Sector", "str", {}),
+    ("industry", "Industry", "str", {}),
+    ("exchange", "Exchange", "str", {}),
+    ("currency", "Currency", "str", {}),
+    ("country", "Country", "str", {}),
+    ("market_cap", "MarketCapitalization", "float", {}),
+    ("pe_ratio", "PERatio", "float", {}),
+    ("dividend_yield", "DividendYield", "float", {}),
+    ("roe", "ReturnOnEquityTTM", "float", {}),
+    ("revenue_ttm", "RevenueTTM", "float", {}),
+    ("gross_profit_ttm", "GrossProfitTTM", "float", {}),
+    ("profit_margin", "ProfitMargin", "float", {}),
+    ("operating_margin", "OperatingMarginTTM", "float", {}),
+    ("eps", "EPS", "float", {}),
+    ("beta", "Beta", "float", {}),
+    ("52_week_high", "52WeekHigh", "float", {}),
+    ("52_week_low", "52WeekLow", "float", {}),
+    ("50_day_moving_avg", "50DayMovingAverage", "float", {}),
+    ("200_day_moving_avg", "200DayMovingAverage", "float", {}),
+    ("shares_outstanding", "SharesOutstanding", "float", {}),
+    ("analyst_target_price", "AnalystTargetPrice", "float", {}),
+    ("analyst_rating", "AnalystRating", "str", {}),
+    ("last_updated", None, "now", {}),
+]
+
+BAR_SPEC = [
+    ("open", "1. open", "float", {"required": True}),
+    ("high", "2. high", "float", {"required": True}),
+    ("low", "3. low", "float", {"required": True}),
+    ("close", "4. close", "float", {"required": True}),
+    ("volume", "5. volume", "int", {"required": True}),
+]
+
+
+# ===== GERAÇÃO DE CÓDIGO =====
+def _number_lines(var: str, field: str, source: str, cast: str, required: bool) -> List[str]:
+    missing = (f"errors.append(({field!r}, value, 'obrigatório'))" if required else "pass")
+    return [
+        f"value = get({source!r})",
+        "try:",
+        "    null = value is None or value in NULL_VALUES",
+        "except TypeError:",
+        "    null = False  # não hashable (lista, dict): cai em 'valor inválido'",
+        "if null:",
+        f"    {var} = None",
+        f"    {missing}",
+        "else:",
+        "    try:",
+        f"        {var} = {cast}(value)",
+        "    except (TypeError, ValueError):",
+        "        try:",
+        f"            {var} = {cast}(float(str(value).replace(',', '')))",
+        "        except (TypeError, ValueError):",
+        f"            {var} = None",
+        f"            errors.append(({field!r}, value, 'valor inválido'))",
+    ]
+
+
+def compile_converter(spec: List[tuple], name: str = "convert") -> Converter:
+    """Gera a função de conversão para a especificação"""
+    lines = [f"def {name}(source):", "    errors = []", "    get = source.get"]
+    outputs = []
+    required = []
+
+    for idx, (field, source, kind, options) in enumerate(spec):
+        var = f"f{idx}"
+        outputs.append((field, var))
+        if options.get("required"):
+            required.append(field)
+
+        if kind == "str":
+            body = [f"{var} = get({source!r}, {options.get('default', '')!r})"]
+            if options.get("required"):
+                body += [f"if not {var}:",
+                         f"    errors.append(({field!r}, {var}, 'obrigatório'))"]
+        elif kind == "text":
+            limit = options["max_length"]
+            body = [f"{var} = get({source!r}, '') or ''",
+                    f"if len({var}) > {limit}:",
+                    f"    {var} = {var}[:{limit}] + '...'"]
+        elif kind in ("float", "int"):
+            body = _number_lines(var, field, source, kind, options.get("required", False))
+        elif kind == "now":
+            body = [f"{var} = now()"]
+        else:
+            raise ValueError(f"Tipo de campo desconhecido: {kind}")
+        lines += ["    " + line for line in body]
+
+    if required:
+        fields = ", ".join(repr(field) for field in required)
+        lines += [f"    if errors and any(error[0] in ({fields},) for error in errors):",
+                  "        return None, errors"]
+    lines.append("    return {" + ", ".join(f"{field!r}: {var}" for field, var in outputs) + "}, errors")
+
+    namespace = {
+        "NULL_VALUES": NULL_VALUES,
+        "now": lambda: datetime.now(timezone.utc).isoformat(),
+    }
+    exec(compile("\n".join(lines), f"<converter {name}>", "exec"), namespace)
+    converter = namespace[name]
+    converter.source = "\n".join(lines)
+    return converter
+
+
+convert_overview = compile_converter(OVERVIEW_SPEC, "convert_overview")
+convert_bar = compile_converter(BAR_SPEC, "convert_bar")
+
+
+# ===== BENCHMARK =====
+def _reference_safe_float(value) -> Optional[float]:
+    """Conversão campo a campo anterior (para comparação)"""
+    if not value or value in ["None", "N/A", "-"]:
+        return None
+    try:
+        return float(str(value).replace(',', ''))
+    except (ValueError, TypeError):
+        return None
+
+
+def _reference_overview(api_data: Dict) -> Optional[Dict]:
+    if not api_data or "Symbol" not in api_data:
+        return None
+    record = {}
+    for field, source, kind, options in OVERVIEW_SPEC:
+        if kind == "float":
+            record[field] = _reference_safe_float(api_data.get(source))
+        elif kind == "text":
+            text = api_data.get(source, "")
+            record[field] = text[:400] + "..." if len(text) > 400 else text
+        elif kind == "now":
+            record[field] = datetime.now(timezone.utc).isoformat()
+        else:
+            record[field] = api_data.get(source, "")
+    return record
+
+
+def _synthetic_overview(idx: int) -> Dict:
+    payload = {source: f"{1000.5 + idx * 3.7:.4f}" for _, source, kind, _ in OVERVIEW_SPEC
+               if kind == "float"}
+    payload.update({"Symbol": f"SYM{idx}", "Name": f"Company {idx}", "Description": "x" * 600,
+                    "Sector": "TECHNOLOGY", "Industry": "SOFTWARE", "Exchange": "NASDAQ",
+                    "Currency": "USD", "Country": "USA", "AnalystRating": "",
+                    "PERatio": "None", "DividendYield": "-", "SharesOutstanding": "1,234,567"})
+    if idx % 50 == 0:
+        payload["Beta"] = "n/d"   # Valor inválido, deve gerar erro de validação
+    return payload
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da conversão de registros OVERVIEW")
+    parser.add_argument("--records", type=int, default=20000)
+    args = parser.parse_args()
+
+    payloads = [_synthetic_overview(idx) for idx in range(args.records)]
+    for label, convert in (("campo a campo", _reference_overview),
+                           ("pré-compilado", lambda payload: convert_overview(payload)[0])):
+        convert(payloads[0])
+        start = time.perf_counter()
+        for payload in payloads:
+            convert(payload)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>14}: {elapsed * 1e6 / len(payloads):6.2f} µs/registro "
+              f"({len(payloads)} registros em {elapsed * 1000:.1f} ms)")
+
+    invalid = sum(1 for payload in payloads if convert_overview(payload)[1])
+    print(f"Registros com erros de validação coletados: {invalid}")
@@ -0,0 +1,438 @@
+"""
+Fila de novas tentativas para símbolos que falharam na varredura.
+
+Os failed_symbols da varredura agendada entram na fila com atraso
+exponencial (RETRY_BASE_DELAY, 2x, 4x... até 15 minutos, o máximo do
+DelaySeconds do SQS). O RetryWorker consome apenas as mensagens vencidas,
+limitado a RETRY_CALLS_PER_RUN chamadas, e refaz as cotações com uma
+execução parcial (InvocationRequest com os símbolos). Falhas voltam para
+a fila com a tentativa seguinte; após RETRY_MAX_ATTEMPTS são descartadas.
+
+O worker não grava os documentos compartilhados da varredura (índice de
+deduplicação, diffs, snapshot latest, agregados): eles ficam em cache no
+container da varredura, que é o único escritor. As cotações recuperadas
+vão para um objeto próprio por execução do worker,
+
+    retry/recovered/{YYYY-MM-DD}/{HHMMSS}-{id}.json
+
+e a varredura agendada seguinte as incorpora às suas cotações e apaga os
+objetos depois de gravá-las.
+
+Backends:
+    RETRY_QUEUE_URL    fila SQS (produção)
+    RETRY_QUEUE_FILE   arquivo JSON local (testes, worker daemon)
+Sem nenhum dos dois, a fila fica desativada.
+
+O worker roda entre as varreduras: no worker daemon após cada varredura
+e, na AWS, pelo retry_handler agendado a cada minuto do pregão. Ele não
+consome nada enquanto houver lease de varredura ativo (run_ledger.py) na
+janela atual ou nas anteriores, nem no primeiro minuto de uma janela
+ainda sem ledger, e termina antes da janela seguinte: as duas execuções
+nunca dividem o rate limit da API. O handler também limita as chamadas
+ao tempo restante da Lambda e interrompe a execução antes do timeout,
+para que as mensagens recebidas sempre voltem à fila ou sejam confirmadas.
+
+A incorporação depende de uma varredura agendada a cada 5 minutos
+(infrastructure/cloudformation-template.yaml); com a varredura diária do
+template.yaml, as cotações recuperadas esperam a varredura do dia seguinte.
+
+    python retry_queue.py --list
+    python retry_queue.py --push AAPL MSFT
+    python retry_queue.py --drain [--max-calls 5]
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from run_ledger import SLOT_MINUTES, RunLedger, lease_active, schedule_slot
+from storage_backends import StorageReadError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_DELAY = 60
+MAX_DELAY = 900             # Limite do DelaySeconds do SQS
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_CALLS_PER_RUN = 5   # Um minuto da cota gratuita
+VISIBILITY_TIMEOUT = 300    # Mensagem recebida fica invisível até o ack
+SQS_BATCH = 10
+RECOVERED_PREFIX = "retry/recovered"
+CALL_MARGIN = 5             # Segundos de folga por chamada, além do rate limit
+DEADLINE_MARGIN = 10        # Reservados para ack/requeue antes do timeout da Lambda
+SWEEP_LOOKBACK = 900        # Duração máxima de uma varredura (timeout máximo da Lambda)
+SWEEP_START_GRACE = 60      # Início de janela sem ledger: a varredura pode estar começando
+
+
+class RetryQueue(ABC):
+    """Interface comum: push, receive (só vencidas), ack e requeue"""
+
+    def __init__(self, base_delay: float = DEFAULT_BASE_DELAY,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.base_delay = base_delay
+        self.max_attempts = max_attempts
+
+    def delay_for(self, attempt: int) -> int:
+        """Atraso exponencial da tentativa (1 = primeira nova tentativa)"""
+        return int(min(self.base_delay * 2 ** (attempt - 1), MAX_DELAY))
+
+    @abstractmethod
+    def push(self, symbols: List[str], attempt: int = 1, now: Optional[float] = None,
+             first_failed_at: Optional[float] = None) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def receive(self, max_messages: int, now: Optional[float] = None) -> List[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def ack(self, message: Dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def size(self) -> int:
+        raise NotImplementedError
+
+    def release(self, message: Dict, now: Optional[float] = None):
+        """Devolve à fila sem contar tentativa (símbolo não processado)"""
+        self.ack(message)
+        self.push([message["symbol"]], message["attempt"], now, message["first_failed_at"])
+
+    def requeue(self, message: Dict, now: Optional[float] = None) -> bool:
+        """Reenfileira com a próxima tentativa; False se esgotou as tentativas"""
+        # Ack antes do push: a fila local deduplica por símbolo
+        self.ack(message)
+        attempt = message["attempt"] + 1
+        if attempt > self.max_attempts:
+            logger.error(f"🗑️  {message['symbol']}: {message['attempt']} novas tentativas sem sucesso, "
+                         f"descartado da fila")
+            return False
+        self.push([message["symbol"]], attempt, now, message["first_failed_at"])
+        return True
+
+    @staticmethod
+    def _body(symbol: str, attempt: int, first_failed_at: float) -> Dict:
+        return {"symbol": symbol, "attempt": attempt, "first_failed_at": first_failed_at}
+
+
+class LocalRetryQueue(RetryQueue):
+    """Fila em arquivo JSON (um processo); deduplica por símbolo"""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def _load(self) -> List[Dict]:
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                return json.load(handle)["messages"]
+        except FileNotFoundError:
+            return []
+
+    def _save(self, messages: List[Dict]):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory,
+                                         delete=False, suffix=".tmp") as handle:
+            json.dump({"messages": messages}, handle)
+        os.replace(handle.name, self.path)
+
+    def push(self, symbols: List[str], attempt: int = 1, now: Optional[float] = None,
+             first_failed_at: Optional[float] = None) -> int:
+        now = now or time.time()
+        messages = self._load()
+        queued = {message["symbol"] for message in messages}
+        added = 0
+        for symbol in symbols:
+            if symbol in queued:
+                continue
+            message = self._body(symbol, attempt, first_failed_at or now)
+            message.update(id=uuid.uuid4().hex, visible_at=now + self.delay_for(attempt))
+            messages.append(message)
+            queued.add(symbol)
+            added += 1
+        self._save(messages)
+        return added
+
+    def receive(self, max_messages: int, now: Optional[float] = None) -> List[Dict]:
+        now = now or time.time()
+        messages = self._load()
+        due = sorted((message for message in messages if message["visible_at"] <= now),
+                     key=lambda message: message["visible_at"])[:max_messages]
+        for message in due:
+            message["visible_at"] = now + VISIBILITY_TIMEOUT
+        if due:
+            self._save(messages)
+        return [dict(message, receipt=message["id"]) for message in due]
+
+    def ack(self, message: Dict):
+        self._save([stored for stored in self._load() if stored["id"] != message["receipt"]])
+
+    def size(self) -> int:
+        return len(self._load())
+
+
+class SqsRetryQueue(RetryQueue):
+    """Fila SQS padrão: o atraso usa DelaySeconds e o ack apaga a mensagem"""
+
+    def __init__(self, queue_url: str, sqs_client, **kwargs):
+        super().__init__(**kwargs)
+        self.queue_url = queue_url
+        self.sqs_client = sqs_client
+
+    def push(self, symbols: List[str], attempt: int = 1, now: Optional[float] = None,
+             first_failed_at: Optional[float] = None) -> int:
+        now = now or time.time()
+        sent = 0
+        for start in range(0, len(symbols), SQS_BATCH):
+            entries = [{
+                "Id": str(idx),
+                "MessageBody": json.dumps(self._body(symbol, attempt, first_failed_at or now)),
+                "DelaySeconds": self.delay_for(attempt)
+            } for idx, symbol in enumerate(symbols[start:start + SQS_BATCH])]
+            try:
+                response = self.sqs_client.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            except Exception as e:
+                logger.error(f"❌ Falha ao enfileirar novas tentativas: {str(e)}")
+                continue
+            for failure in response.get("Failed", []):
+                logger.error(f"❌ SQS recusou {entries[int(failure['Id'])]['MessageBody']}: "
+                             f"{failure.get('Message')}")
+            sent += len(response.get("Successful", []))
+        return sent
+
+    def receive(self, max_messages: int, now: Optional[float] = None) -> List[Dict]:
+        received = []
+        while len(received) < max_messages:
+            response = self.sqs_client.receive_message(
+                QueueUrl=self.queue_url,
+                MaxNumberOfMessages=min(SQS_BATCH, max_messages - len(received)),
+                VisibilityTimeout=VISIBILITY_TIMEOUT,
+                WaitTimeSeconds=0
+            )
+            batch = response.get("Messages", [])
+            if not batch:
+                break
+            for item in batch:
+                message = json.loads(item["Body"])
+                message["receipt"] = item["ReceiptHandle"]
+                received.append(message)
+        return received
+
+    def ack(self, message: Dict):
+        self.sqs_client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=message["receipt"])
+
+    def size(self) -> int:
+        attributes = self.sqs_client.get_queue_attributes(
+            QueueUrl=self.queue_url,
+            AttributeNames=["ApproximateNumberOfMessages", "ApproximateNumberOfMessagesDelayed",
+                            "ApproximateNumberOfMessagesNotVisible"]
+        )["Attributes"]
+        return sum(int(value) for value in attributes.values())
+
+
+def retry_queue_from_env() -> Optional[RetryQueue]:
+    """Fila configurada por ambiente (None = novas tentativas desativadas)"""
+    options = {
+        "base_delay": float(os.environ.get('RETRY_BASE_DELAY', DEFAULT_BASE_DELAY)),
+        "max_attempts": int(os.environ.get('RETRY_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS))
+    }
+    if os.environ.get('RETRY_QUEUE_URL'):
+        import boto3
+        return SqsRetryQueue(os.environ['RETRY_QUEUE_URL'], boto3.client('sqs'), **options)
+    if os.environ.get('RETRY_QUEUE_FILE'):
+        return LocalRetryQueue(os.environ['RETRY_QUEUE_FILE'], **options)
+    return None
+
+
+def retry_calls_per_run() -> int:
+    return int(os.environ.get('RETRY_CALLS_PER_RUN', DEFAULT_CALLS_PER_RUN))
+
+
+# ===== COTAÇÕES RECUPERADAS =====
+def save_recovered(s3_manager, quotes: List[Dict], current_time: datetime) -> bool:
+    """Grava as cotações do worker em um objeto próprio (chave única, sem concorrência)"""
+    key = (f"{RECOVERED_PREFIX}/{current_time.strftime('%Y-%m-%d')}/"
+           f"{current_time.strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}.json")
+    return s3_manager.write_json(key, {"recovered_at": current_time.isoformat(), "quotes": quotes},
+                                 {'total-quotes': str(len(quotes))})
+
+
+def load_recovered(s3_manager) -> Tuple[List[Dict], List[str]]:
+    """Cotações pendentes de gravação (a mais nova por símbolo) e as chaves lidas"""
+    try:
+        keys = [item["key"] for item in s3_manager.backend.list(f"{RECOVERED_PREFIX}/")]
+    except Exception as e:
+        logger.error(f"❌ Falha ao listar cotações recuperadas: {str(e)}")
+        return [], []
+
+    try:
+        documents = s3_manager.read_many(keys)
+    except StorageReadError:
+        # Ficam para a próxima varredura (só as chaves lidas são apagadas)
+        return [], []
+
+    latest: Dict[str, Dict] = {}
+    read = []
+    for key, document in zip(keys, documents):
+        if document is None:
+            continue
+        read.append(key)
+        for quote in document["quotes"]:
+            current = latest.get(quote["symbol"])
+            if current is None or current["timestamp"] < quote["timestamp"]:
+                latest[quote["symbol"]] = quote
+    return list(latest.values()), read
+
+
+def clear_recovered(s3_manager, keys: List[str]):
+    """Apaga os objetos já incorporados por uma varredura"""
+    for key in keys:
+        try:
+            s3_manager.backend.delete(key)
+        except Exception as e:
+            logger.warning(f"⚠️  Falha ao apagar {key}: {str(e)}")
+
+
+# ===== WORKER =====
+def sweep_in_progress(s3_manager, now: datetime) -> bool:
+    """
+    True se uma varredura agendada pode estar chamando a API: lease ativo
+    no ledger da janela atual ou de uma anterior (até SWEEP_LOOKBACK), ou
+    janela iniciada há menos de SWEEP_START_GRACE ainda sem ledger
+    """
+    slot = schedule_slot(None, now)
+    for back in range(SWEEP_LOOKBACK // (SLOT_MINUTES * 60) + 1):
+        ledger = RunLedger(s3_manager, slot - timedelta(minutes=SLOT_MINUTES * back))
+        try:
+            stored = s3_manager.read_json(ledger.key)
+        except StorageReadError:
+            return True
+        if stored is None and back == 0 and (now - slot).total_seconds() < SWEEP_START_GRACE:
+            return True
+        if lease_active(stored, now):
+            return True
+    return False
+
+
+class RetryWorker:
+    """Consome as mensagens vencidas com o orçamento de chamadas que sobra"""
+
+    def __init__(self, runtime, queue: RetryQueue):
+        self.runtime = runtime
+        self.queue = queue
+
+    def run(self, max_calls: int, current_time: Optional[datetime] = None,
+            should_stop: Optional[Callable[[], bool]] = None) -> Dict:
+        """Refaz as cotações dos símbolos vencidos (uma chamada por símbolo)"""
+        from invocation_event import InvocationRequest
+        from lambda_function import run_pipeline
+
+        current_time = current_time or datetime.now(timezone.utc)
+        now = current_time.timestamp()
+        messages = self.queue.receive(max_calls, now) if max_calls > 0 else []
+        if not messages:
+            return {"received": 0, "recovered": [], "requeued": [], "dropped": [], "released": []}
+
+        # Mensagens repetidas do mesmo símbolo (SQS padrão) viram uma chamada
+        by_symbol: Dict[str, List[Dict]] = {}
+        for message in messages:
+            by_symbol.setdefault(message["symbol"], []).append(message)
+
+        logger.info(f"🔁 Novas tentativas: {', '.join(by_symbol)}")
+        # Saída "response": a varredura agendada grava as cotações (único escritor)
+        request = InvocationRequest(symbols=list(by_symbol), endpoints=["intraday"], output="response")
+        result = run_pipeline(self.runtime, current_time, should_stop, request=request)
+
+        quotes = result["quotes"]
+        if quotes and not save_recovered(self.runtime.s3_manager, quotes, current_time):
+            logger.error("❌ Cotações recuperadas não gravadas: símbolos voltam à fila")
+            quotes = []
+        fetched = {quote["symbol"] for quote in quotes}
+        failed = set(result["failed_symbols"])
+
+        recovered, requeued, dropped, released = [], [], [], []
+        for symbol, symbol_messages in by_symbol.items():
+            latest = max(symbol_messages, key=lambda message: message["attempt"])
+            for message in symbol_messages:
+                if message is not latest:
+                    self.queue.ack(message)
+            if symbol in fetched:
+                self.queue.ack(latest)
+                recovered.append(symbol)
+            elif symbol in failed:
+                (requeued if self.queue.requeue(latest, now) else dropped).append(symbol)
+            else:
+                # Não chegou a ser buscado (interrupção) ou não foi entregue: mesma tentativa
+                self.queue.release(latest, now)
+                released.append(symbol)
+
+        if recovered:
+            logger.info(f"✅ Recuperados após falha: {', '.join(recovered)}")
+        return {"received": len(messages), "recovered": recovered, "requeued": requeued,
+                "dropped": dropped, "released": released, "api_calls": result["api_calls"]}
+
+
+def retry_handler(event, context) -> Dict:
+    """Handler Lambda do worker de novas tentativas (agendado a cada minuto do pregão)"""
+    # Import tardio: lambda_function valida variáveis de ambiente ao carregar
+    from lambda_function import get_runtime
+    from market_calendar import is_market_open
+
+    current_time = datetime.now(timezone.utc)
+    if not is_market_open(current_time) and not os.environ.get('IGNORE_MARKET_HOURS'):
+        body = {"status": "skipped", "reason": "market_closed", "timestamp": current_time.isoformat()}
+        return {'statusCode': 200, 'body': json.dumps(body)}
+
+    runtime = get_runtime()
+    runtime.begin_invocation()
+
+    # Chamadas que cabem antes da próxima janela (com um intervalo do rate
+    # limit para a varredura) e no tempo restante da Lambda
+    call_seconds = runtime.api_client.RATE_LIMIT_DELAY + CALL_MARGIN
+    next_slot = schedule_slot(None, current_time) + timedelta(minutes=SLOT_MINUTES)
+    deadline = next_slot.timestamp() - runtime.api_client.RATE_LIMIT_DELAY
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        deadline = min(deadline, time.time() + context.get_remaining_time_in_millis() / 1000)
+    deadline -= DEADLINE_MARGIN
+    max_calls = min(retry_calls_per_run(), max(0, int((deadline - time.time()) // call_seconds)))
+    should_stop = lambda: time.time() + call_seconds > deadline
+
+    if runtime.retry_queue is None:
+        body = {"status": "disabled"}
+    elif sweep_in_progress(runtime.s3_manager, current_time):
+        logger.info("⏳ Varredura agendada em andamento - novas tentativas adiadas")
+        body = {"status": "skipped", "reason": "sweep_in_progress"}
+    else:
+        body = dict(RetryWorker(runtime, runtime.retry_queue).run(max_calls, current_time, should_stop),
+                    status="completed")
+    body["timestamp"] = current_time.isoformat()
+    return {'statusCode': 200, 'body': json.dumps(body)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fila de novas tentativas de símbolos com falha")
+    parser.add_argument("--list", action="store_true", help="Mostra o tamanho da fila")
+    parser.add_argument("--push", nargs="+", metavar="SÍMBOLO", help="Enfileira símbolos")
+    parser.add_argument("--drain", action="store_true", help="Executa o worker uma vez")
+    parser.add_argument("--max-calls", type=int, default=None)
+    args = parser.parse_args()
+
+    queue = retry_queue_from_env()
+    if queue is None:
+        raise SystemExit("Defina RETRY_QUEUE_URL ou RETRY_QUEUE_FILE")
+    if args.push:
+        print(f"Enfileirados: {queue.push([symbol.upper() for symbol in args.push])}")
+    if args.drain:
+        from lambda_function import get_runtime
+        runtime = get_runtime()
+        runtime.begin_invocation()
+        max_calls = retry_calls_per_run() if args.max_calls is None else args.max_calls
+        print(json.dumps(RetryWorker(runtime, queue).run(max_calls), indent=2))
+    if args.list or not (args.push or args.drain):
+        print(f"Mensagens na fila: {queue.size()}")
@@ -0,0 +1,247 @@
+"""
+Agregados multi-intervalo (15min, 60min, diário) mantidos na ingestão.
+
+As barras de 5 minutos de cada execução são agregadas em OHLCV de
+intervalos maiores e mescladas de forma incremental aos agregados já
+gravados: cada barra agregada guarda a última barra de 5 minutos incluída
+(last_bar), então apenas as barras posteriores são somadas, sem reler os
+dados brutos. Consultas de granularidade grossa leem só os agregados.
+
+Regras:
+    - apenas o pregão regular entra nos agregados (pré e pós-mercado são
+      descartados; pregões reduzidos fecham às 13:00);
+    - a barra de 5 minutos ainda aberta (início + 5 min > agora) é ignorada
+      e entra na execução seguinte, já fechada;
+    - barras de 15min/60min são alinhadas ao relógio (a primeira barra de
+      60min do dia cobre 09:30-10:00); "complete" indica que o intervalo
+      (ou o pregão, para o diário) já terminou.
+
+    rollups/15min/{YYYY-MM-DD}.json
+    rollups/60min/{YYYY-MM-DD}.json
+    rollups/daily/{YYYY-MM}.json
+"""
+
+import logging
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from market_calendar import EXCHANGE_TZ, get_session
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_PREFIX = "rollups"
+BASE_MINUTES = 5
+# Intervalo -> minutos (None = pregão inteiro)
+ROLLUP_INTERVALS = {"15min": 15, "60min": 60, "daily": None}
+
+
+def partition_for(interval: str, date_str: str) -> str:
+    """Partição do objeto: por dia no intraday, por mês no diário"""
+    return date_str[:7] if ROLLUP_INTERVALS[interval] is None else date_str
+
+
+def rollup_key(interval: str, partition: str) -> str:
+    return f"{ROLLUP_PREFIX}/{interval}/{partition}.json"
+
+
+@lru_cache(maxsize=512)
+def session_minutes(date_str: str) -> Optional[Tuple[int, int]]:
+    """Abertura e fechamento do pregão em minutos do dia (horário da bolsa)"""
+    session = get_session(date.fromisoformat(date_str))
+    if session is None:
+        return None
+    opens, closes = (moment.astimezone(EXCHANGE_TZ) for moment in session)
+    return opens.hour * 60 + opens.minute, closes.hour * 60 + closes.minute
+
+
+def _minute_of_day(timestamp: str) -> int:
+    return int(timestamp[11:13]) * 60 + int(timestamp[14:16])
+
+
+def _format(date_str: str, minutes: int) -> str:
+    return f"{date_str} {minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+# ===== AGREGAÇÃO =====
+def aggregate(bars: List[Dict], interval: str, now: Optional[datetime] = None) -> List[Dict]:
+    """
+    Agrega barras de 5 minutos (um símbolo, ordem cronológica) no intervalo
+    pedido. As colunas são extraídas uma vez e agrupadas em uma passada.
+    """
+    width = ROLLUP_INTERVALS[interval]
+    cutoff = now.astimezone(EXCHANGE_TZ).strftime("%Y-%m-%d %H:%M:%S") if now else None
+
+    # Colunas (apenas barras fechadas do pregão regular)
+    stamps, opens, highs, lows, closes, volumes, buckets = [], [], [], [], [], [], []
+    for bar in bars:
+        stamp = bar["timestamp"]
+        day = stamp[:10]
+        bounds = session_minutes(day)
+        minute = _minute_of_day(stamp)
+        if bounds is None or not bounds[0] <= minute < bounds[1]:
+            continue
+        if cutoff and _format(day, minute + BASE_MINUTES) > cutoff:
+            continue
+        stamps.append(stamp)
+        opens.append(bar["open"])
+        highs.append(bar["high"])
+        lows.append(bar["low"])
+        closes.append(bar["close"])
+        volumes.append(bar["volume"])
+        buckets.append(_format(day, bounds[0] if width is None else minute - minute % width))
+
+    rollups: List[Dict] = []
+    current = None
+    for idx, bucket in enumerate(buckets):
+        if current is None or current["timestamp"] != bucket:
+            current = {"timestamp": bucket, "open": opens[idx], "high": highs[idx],
+                       "low": lows[idx], "close": closes[idx], "volume": volumes[idx],
+                       "bars": 1, "last_bar": stamps[idx]}
+            rollups.append(current)
+            continue
+        if highs[idx] > current["high"]:
+            current["high"] = highs[idx]
+        if lows[idx] < current["low"]:
+            current["low"] = lows[idx]
+        current["close"] = closes[idx]
+        current["volume"] += volumes[idx]
+        current["bars"] += 1
+        current["last_bar"] = stamps[idx]
+
+    for rollup in rollups:
+        rollup["complete"] = is_complete(rollup, interval)
+    return rollups
+
+
+def is_complete(rollup: Dict, interval: str) -> bool:
+    """True quando a última barra incluída fecha o intervalo (ou o pregão)"""
+    width = ROLLUP_INTERVALS[interval]
+    day = rollup["timestamp"][:10]
+    close = session_minutes(day)[1]
+    end = close if width is None else min(_minute_of_day(rollup["timestamp"]) + width, close)
+    return _minute_of_day(rollup["last_bar"]) + BASE_MINUTES >= end
+
+
+def merge_rollup(current: Dict, newer: Dict, interval: str) -> Dict:
+    """Soma a uma barra agregada as barras de 5 minutos posteriores a last_bar"""
+    current["high"] = max(current["high"], newer["high"])
+    current["low"] = min(current["low"], newer["low"])
+    current["close"] = newer["close"]
+    current["volume"] += newer["volume"]
+    current["bars"] += newer["bars"]
+    current["last_bar"] = newer["last_bar"]
+    current["complete"] = is_complete(current, interval)
+    return current
+
+
+# ===== ARMAZENAMENTO =====
+class RollupStore:
+    """Mantém os objetos de agregados e grava apenas os alterados"""
+
+    def __init__(self, s3_manager, intervals: Optional[List[str]] = None):
+        self.s3_manager = s3_manager
+        self.intervals = intervals or list(ROLLUP_INTERVALS)
+        # (intervalo, partição) -> documento; reaproveitado em containers quentes
+        self.documents: Dict[Tuple[str, str], Dict] = {}
+        self._dirty: set = set()
+        self._touched: set = set()
+
+    def _document(self, interval: str, partition: str) -> Dict:
+        doc_key = (interval, partition)
+        self._touched.add(doc_key)
+        if doc_key not in self.documents:
+            self.documents[doc_key] = self.s3_manager.read_json(rollup_key(interval, partition)) or {
+                "interval": interval, "partition": partition, "symbols": {}
+            }
+        return self.documents[doc_key]
+
+    def ingest(self, bars_by_symbol: Dict[str, List[Dict]], now: Optional[datetime] = None) -> int:
+        """
+        Mescla as barras de 5 minutos de cada símbolo nos agregados.
+        Retorna o número de barras agregadas criadas ou alteradas.
+        """
+        changed = 0
+        for symbol, bars in bars_by_symbol.items():
+            by_date: Dict[str, List[Dict]] = {}
+            for bar in bars:
+                by_date.setdefault(bar["timestamp"][:10], []).append(bar)
+
+            for date_str, day_bars in by_date.items():
+                if session_minutes(date_str) is None:
+                    continue
+                for interval in self.intervals:
+                    changed += self._ingest_day(symbol, date_str, day_bars, interval, now)
+        return changed
+
+    def _ingest_day(self, symbol: str, date_str: str, day_bars: List[Dict],
+                    interval: str, now: Optional[datetime]) -> int:
+        partition = partition_for(interval, date_str)
+        document = self._document(interval, partition)
+        rows = document["symbols"].setdefault(symbol, [])
+
+        # Barras de 5 minutos já incluídas nos agregados deste dia
+        watermark = max((row["last_bar"] for row in rows if row["timestamp"][:10] == date_str),
+                        default="")
+        fresh = aggregate([bar for bar in day_bars if bar["timestamp"] > watermark], interval, now)
+        if not fresh:
+            return 0
+
+        by_timestamp = {row["timestamp"]: row for row in rows}
+        for rollup in fresh:
+            current = by_timestamp.get(rollup["timestamp"])
+            if current is None:
+                by_timestamp[rollup["timestamp"]] = rollup
+            else:
+                merge_rollup(current, rollup, interval)
+        document["symbols"][symbol] = [by_timestamp[ts] for ts in sorted(by_timestamp)]
+        self._dirty.add((interval, partition))
+        return len(fresh)
+
+    def save(self) -> bool:
+        """Grava os documentos alterados e descarta do cache os não usados"""
+        items = []
+        for interval, partition in sorted(self._dirty):
+            document = self.documents[(interval, partition)]
+            document["updated_at"] = datetime.now(EXCHANGE_TZ).isoformat()
+            items.append((rollup_key(interval, partition), document,
+                          {'total-symbols': str(len(document["symbols"]))}))
+
+        # Objetos dos três intervalos gravados em paralelo
+        written = self.s3_manager.write_many(items)
+        success = all(written.values())
+        for interval, partition in sorted(self._dirty):
+            if not written[rollup_key(interval, partition)]:
+                # Força recarregar do S3 na próxima ingestão
+                self.documents.pop((interval, partition), None)
+
+        if self._dirty:
+            logger.info(f"📊 Agregados gravados: {len(self._dirty)} objetos")
+        self._dirty = set()
+        self.documents = {doc_key: document for doc_key, document in self.documents.items()
+                          if doc_key in self._touched}
+        self._touched = set()
+        return success
+
+    def flush(self) -> bool:
+        """Grava os alterados e libera todos os documentos da memória"""
+        success = self.save()
+        self.documents = {}
+        return success
+
+    def session_bars(self, date_str: str) -> Dict[str, Dict]:
+        """Barra diária (abertura, volume acumulado...) de cada símbolo no pregão date_str"""
+        document = self._document("daily", partition_for("daily", date_str))
+        bars = {}
+        for symbol, rows in document["symbols"].items():
+            for row in rows:
+                if row["timestamp"][:10] == date_str:
+                    bars[symbol] = row
+        return bars
+
+    def load(self, interval: str, partition: str, symbols: Optional[List[str]] = None) -> Dict[str, List[Dict]]:
+        """Lê os agregados de uma partição (todos os símbolos ou os pedidos)"""
+        document = self.s3_manager.read_json(rollup_key(interval, partition)) or {"symbols": {}}
+        if symbols is None:
+            return document["symbols"]
+        return {symbol: document["symbols"].get(symbol, []) for symbol in symbols}
@@ -0,0 +1,159 @@
+"""
+Ledger de execução por janela do agendamento (slot de 5 minutos).
+
+Quando a Lambda é reexecutada pelo EventBridge/retry para a mesma janela,
+o ledger informa o que já foi feito: símbolos buscados (com as cotações
+obtidas), símbolos já avaliados pelos alertas, símbolos já gravados e
+objetos gravados. A nova tentativa busca apenas os símbolos que faltam,
+reaproveita as cotações anteriores, não emite de novo os alertas e grava
+só as cotações que ainda não estão em nenhum objeto (em um objeto novo,
+registrado como "quotes.{tentativa}"). Uma janela concluída não é
+reprocessada.
+
+O ledger também é o lease da varredura: é gravado antes da primeira
+chamada à API e regravado (heartbeat_at) a cada HEARTBEAT_SECONDS; o
+worker de novas tentativas não chama a API enquanto houver lease ativo.
+
+    ledger/{YYYY-MM-DD}/{HHMM}.json
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LEDGER_PREFIX = "ledger"
+SLOT_MINUTES = 5
+CHECKPOINT_EVERY = 5  # Grava o ledger a cada N símbolos buscados
+HEARTBEAT_SECONDS = 30  # Intervalo máximo entre gravações do ledger em andamento
+LEASE_SECONDS = 90      # Sem heartbeat por esse tempo, a varredura é dada como encerrada
+
+
+def schedule_slot(event: Optional[Dict], now: datetime) -> datetime:
+    """
+    Janela do agendamento: o campo "time" do evento do EventBridge (igual
+    em todas as tentativas da mesma janela) ou o instante atual, truncados
+    para múltiplos de SLOT_MINUTES.
+
+    now é só o fallback de execuções manuais: um retry assíncrono da
+    Lambda cai em outra janela se o evento não trouxer "time" (o alvo do
+    EventBridge não pode usar Input fixo).
+    """
+    slot_time = now
+    if event and event.get("time"):
+        try:
+            slot_time = datetime.fromisoformat(event["time"].replace("Z", "+00:00"))
+        except ValueError:
+            logger.warning(f"Campo 'time' inválido no evento: {event['time']}")
+
+    slot_time = slot_time.astimezone(timezone.utc)
+    return slot_time.replace(minute=slot_time.minute - slot_time.minute % SLOT_MINUTES,
+                             second=0, microsecond=0)
+
+
+class RunLedger:
+    """Registro idempotente do trabalho de uma janela"""
+
+    def __init__(self, s3_manager, slot: datetime):
+        self.s3_manager = s3_manager
+        self.slot = slot
+        self.key = f"{LEDGER_PREFIX}/{slot.strftime('%Y-%m-%d')}/{slot.strftime('%H%M')}.json"
+        self.data: Dict = {}
+        self._pending_checkpoint = 0
+        self._saved_at = 0.0
+
+    def load(self) -> Dict:
+        """Carrega (ou cria) o ledger e, se a janela não terminou, grava o lease"""
+        self.data = self.s3_manager.read_json(self.key) or {
+            "slot": self.slot.isoformat(),
+            "attempts": 0,
+            "status": "in_progress",
+            "quotes": {},
+            "failed": [],
+            "objects": {}
+        }
+        self.data["attempts"] += 1
+        if self.data["attempts"] > 1:
+            logger.info(f"🔁 Tentativa #{self.data['attempts']} da janela {self.data['slot']}: "
+                        f"{len(self.data['quotes'])} símbolos já buscados")
+        if not self.completed:
+            self.save()
+        return self.data
+
+    @property
+    def completed(self) -> bool:
+        return self.data.get("status") == "completed"
+
+    @property
+    def fetched_quotes(self) -> List[Dict]:
+        return list(self.data["quotes"].values())
+
+    def pending(self, symbols: List[str]) -> List[str]:
+        """Símbolos que ainda não foram buscados nesta janela"""
+        return [symbol for symbol in symbols if symbol not in self.data["quotes"]]
+
+    def record_quote(self, quote: Dict):
+        self.data["quotes"][quote["symbol"]] = quote
+        self._pending_checkpoint += 1
+        if self._pending_checkpoint >= CHECKPOINT_EVERY:
+            self.save()
+
+    def record_failures(self, symbols: List[str]):
+        self.data["failed"] = sorted(set(symbols) - set(self.data["quotes"]))
+
+    def unalerted(self, quotes: List[Dict]) -> List[Dict]:
+        """Cotações ainda não avaliadas pelos alertas em nenhuma tentativa"""
+        alerted = set(self.data.get("alerted", []))
+        return [quote for quote in quotes if quote["symbol"] not in alerted]
+
+    def record_alerted(self, symbols: List[str]):
+        self.data["alerted"] = sorted(set(self.data.get("alerted", [])) | set(symbols))
+        self.save()
+
+    def unsaved(self, quotes: List[Dict]) -> List[Dict]:
+        """Cotações de símbolos ainda não gravados em nenhuma tentativa"""
+        saved = set(self.data.get("saved", []))
+        return [quote for quote in quotes if quote["symbol"] not in saved]
+
+    def record_saved(self, symbols: List[str]):
+        self.data["saved"] = sorted(set(self.data.get("saved", [])) | set(symbols))
+        self.save()
+
+    def is_written(self, output: str) -> bool:
+        return output in self.data["objects"]
+
+    def record_object(self, output: str, s3_key: str):
+        """
+        Registra um objeto gravado (output: 'quotes', 'fundamentals', ...);
+        o de uma tentativa seguinte fica em '{output}.{tentativa}'
+        """
+        if output in self.data["objects"] and self.data["objects"][output] != s3_key:
+            output = f"{output}.{self.data['attempts']}"
+        self.data["objects"][output] = s3_key
+        self.save()
+
+    def complete(self) -> bool:
+        self.data["status"] = "completed"
+        self.data["completed_at"] = datetime.now(timezone.utc).isoformat()
+        return self.save()
+
+    def heartbeat(self):
+        """Renova o lease se a última gravação tem mais de HEARTBEAT_SECONDS"""
+        if time.time() - self._saved_at >= HEARTBEAT_SECONDS:
+            self.save()
+
+    def save(self) -> bool:
+        self._pending_checkpoint = 0
+        self._saved_at = time.time()
+        self.data["heartbeat_at"] = datetime.now(timezone.utc).isoformat()
+        return self.s3_manager.write_json(self.key, self.data)
+
+
+def lease_active(data: Optional[Dict], now: datetime) -> bool:
+    """True se o ledger indica varredura em andamento com heartbeat recente"""
+    if not data or data.get("status") == "completed" or not data.get("heartbeat_at"):
+        return False
+    heartbeat = datetime.fromisoformat(data["heartbeat_at"])
+    return (now - heartbeat).total_seconds() < LEASE_SECONDS
@@ -0,0 +1,176 @@
+"""
+Downloader paralelo para leitura de históricos armazenados no S3.
+
+Lista um prefixo uma única vez e baixa os objetos em paralelo, dividindo
+objetos grandes em GETs por faixa (header Range). Os bytes são entregues
+em ordem a um decoder, já descomprimidos conforme o Content-Encoding,
+sem montar o arquivo inteiro quando o decoder é incremental. Usado por jobs de compactação e leitores analíticos.
+"""
+
+import json
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from compression import decompress_stream
+
+logger = logging.getLogger(__name__)
+
+Decoder = Callable[[Iterable[bytes]], Any]
+
+
+# ===== DECODERS =====
+def json_decoder(chunks: Iterable[bytes]) -> Any:
+    """Decodifica um documento JSON a partir dos pedaços recebidos"""
+    return json.loads(b"".join(chunks))
+
+
+def ndjson_decoder(chunks: Iterable[bytes]) -> List[Any]:
+    """Decodifica JSON por linha de forma incremental (uma linha por vez)"""
+    records = []
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        records.extend(json.loads(line) for line in lines if line.strip())
+    if pending.strip():
+        records.append(json.loads(pending))
+    return records
+
+
+# ===== DOWNLOADER =====
+class ParallelS3Downloader:
+    """Baixa objetos de um prefixo em paralelo com GETs por faixa"""
+
+    DEFAULT_MAX_WORKERS = 16
+    DEFAULT_PART_SIZE = 8 * 1024 * 1024          # 8 MB por faixa
+    DEFAULT_MULTIPART_THRESHOLD = 16 * 1024 * 1024
+    STREAM_CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, bucket_name: str, s3_client, max_workers: Optional[int] = None,
+                 part_size: Optional[int] = None, multipart_threshold: Optional[int] = None):
+        self.bucket_name = bucket_name
+        self.s3_client = s3_client
+        self.max_workers = max_workers or self.DEFAULT_MAX_WORKERS
+        self.part_size = part_size or self.DEFAULT_PART_SIZE
+        self.multipart_threshold = multipart_threshold or self.DEFAULT_MULTIPART_THRESHOLD
+
+    def list_objects(self, prefix: str) -> List[Dict]:
+        """Lista o prefixo uma única vez (Key e Size de cada objeto)"""
+        objects = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for item in page.get('Contents', []):
+                objects.append({"key": item["Key"], "size": item.get("Size", 0)})
+
+        logger.debug(f"Listados {len(objects)} objetos em s3://{self.bucket_name}/{prefix}")
+        return objects
+
+    def _get_range(self, key: str, start: int, end: int) -> bytes:
+        """Baixa o intervalo fechado [start, end] de um objeto"""
+        response = self.s3_client.get_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Range=f"bytes={start}-{end}"
+        )
+        return response["Body"].read()
+
+    def _stream_whole(self, key: str) -> Iterator[bytes]:
+        """Stream de um objeto pequeno com um único GET (já descomprimido)"""
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+        body = response["Body"]
+
+        def raw_chunks() -> Iterator[bytes]:
+            while True:
+                chunk = body.read(self.STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+        yield from decompress_stream(raw_chunks(), response.get("ContentEncoding"))
+
+    def _stream_ranges(self, key: str, size: int, executor: ThreadPoolExecutor) -> Iterator[bytes]:
+        """Stream de um objeto grande com faixas em paralelo, entregues em ordem"""
+        ranges = deque(
+            (start, min(start + self.part_size, size) - 1)
+            for start in range(0, size, self.part_size)
+        )
+        in_flight = deque()
+
+        # Janela limitada de faixas em voo mantém a memória sob controle
+        while ranges or in_flight:
+            while ranges and len(in_flight) < self.max_workers:
+                start, end = ranges.popleft()
+                in_flight.append(executor.submit(self._get_range, key, start, end))
+            yield in_flight.popleft().result()
+
+    def _stream_large(self, key: str, size: int, executor: ThreadPoolExecutor) -> Iterator[bytes]:
+        """Faixas concatenadas formam o stream comprimido; descomprime em ordem"""
+        encoding = self.s3_client.head_object(Bucket=self.bucket_name, Key=key).get("ContentEncoding")
+        yield from decompress_stream(self._stream_ranges(key, size, executor), encoding)
+
+    def iter_chunks(self, key: str, size: int,
+                    executor: Optional[ThreadPoolExecutor] = None) -> Iterator[bytes]:
+        """Retorna os bytes de um objeto como iterador de pedaços ordenados"""
+        if size <= self.multipart_threshold:
+            yield from self._stream_whole(key)
+            return
+
+        if executor is not None:
+            yield from self._stream_large(key, size, executor)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as own_executor:
+            yield from self._stream_large(key, size, own_executor)
+
+    def download_prefix(self, prefix: str,
+                        decoder: Decoder = json_decoder) -> Iterator[Tuple[str, Any]]:
+        """
+        Baixa e decodifica todos os objetos de um prefixo.
+
+        Gera tuplas (key, objeto decodificado) na ordem da listagem, com
+        no máximo 2 * max_workers objetos em voo ao mesmo tempo.
+        """
+        objects = self.list_objects(prefix)
+        if not objects:
+            return
+
+        logger.info(f"⬇️  Baixando {len(objects)} objetos de s3://{self.bucket_name}/{prefix}")
+
+        def fetch(obj: Dict) -> Tuple[str, Any]:
+            chunks = self.iter_chunks(obj["key"], obj["size"], part_executor)
+            return obj["key"], decoder(chunks)
+
+        # Pools separados: objetos e faixas não disputam os mesmos workers
+        with ThreadPoolExecutor(max_workers=self.max_workers) as object_executor, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as part_executor:
+            pending = deque(objects)
+            in_flight = deque()
+
+            while pending or in_flight:
+                while pending and len(in_flight) < self.max_workers * 2:
+                    in_flight.append(object_executor.submit(fetch, pending.popleft()))
+
+                future = in_flight.popleft()
+                try:
+                    yield future.result()
+                except Exception as e:
+                    logger.error(f"❌ Falha ao baixar objeto: {str(e)}")
+
+    def download_keys(self, keys: Iterable[str], decoder: Decoder = json_decoder) -> Dict[str, Any]:
+        """Baixa uma lista explícita de chaves (objetos pequenos) em paralelo"""
+        results = {}
+
+        def fetch(key: str) -> Tuple[str, Any]:
+            return key, decoder(self._stream_whole(key))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for future in [executor.submit(fetch, key) for key in keys]:
+                try:
+                    key, value = future.result()
+                    results[key] = value
+                except Exception as e:
+                    logger.error(f"❌ Falha ao baixar objeto: {str(e)}")
+
+        return results
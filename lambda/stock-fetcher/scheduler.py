@@ -0,0 +1,122 @@
+"""
+Agendamento de símbolos por prioridade (liquidez, volatilidade e defasagem).
+
+Cada símbolo recebe uma prioridade a partir do volume médio recente e da
+volatilidade (média móvel exponencial de |change_percent|). Símbolos de
+alta prioridade são consultados em toda execução; os demais, a cada 2 ou
+3 execuções. Nenhum símbolo fica mais antigo que max_staleness: os
+vencidos entram no topo da fila, antes de qualquer outro.
+
+Estado persistido em state/scheduler.json:
+    {"AAPL": {"last_polled": <epoch>, "avg_volume": ..., "volatility": ...}}
+"""
+
+import logging
+import math
+import os
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY = "state/scheduler.json"
+
+
+class SymbolScheduler:
+    """Planeja a ordem e o subconjunto de símbolos de cada execução"""
+
+    RUN_INTERVAL = 300          # Intervalo do cron (5 minutos)
+    EWMA_ALPHA = 0.3
+    # Multiplicador do intervalo por faixa de prioridade (alta, média, baixa)
+    TIER_MULTIPLIERS = (1, 2, 3)
+
+    def __init__(self, s3_manager, max_staleness: Optional[int] = None,
+                 max_symbols: Optional[int] = None):
+        self.s3_manager = s3_manager
+        self.max_staleness = max_staleness or int(
+            os.environ.get('SCHEDULER_MAX_STALENESS_SECONDS', 1800))
+        self.max_symbols = max_symbols or int(os.environ.get('SCHEDULER_MAX_SYMBOLS', 0)) or None
+        self.state: Dict[str, Dict] = {}
+        self._loaded = False
+
+    def load(self) -> Dict[str, Dict]:
+        if not self._loaded:
+            self.state = self.s3_manager.read_json(STATE_KEY) or {}
+            self._loaded = True
+        return self.state
+
+    def save(self) -> bool:
+        return self.s3_manager.write_json(STATE_KEY, self.state)
+
+    def priorities(self, symbols: List[str]) -> Dict[str, float]:
+        """Prioridade em [0, 1]: metade liquidez, metade volatilidade (por rank)"""
+        def ranks(values: Dict[str, float]) -> Dict[str, float]:
+            ordered = sorted(values, key=values.get)
+            if len(ordered) <= 1:
+                return {symbol: 1.0 for symbol in ordered}
+            return {symbol: idx / (len(ordered) - 1) for idx, symbol in enumerate(ordered)}
+
+        known = [symbol for symbol in symbols if symbol in self.state]
+        liquidity = ranks({s: math.log1p(self.state[s].get("avg_volume", 0)) for s in known})
+        volatility = ranks({s: self.state[s].get("volatility", 0) for s in known})
+
+        # Símbolos sem histórico recebem prioridade máxima até serem medidos
+        return {
+            symbol: (0.5 * liquidity[symbol] + 0.5 * volatility[symbol]) if symbol in known else 1.0
+            for symbol in symbols
+        }
+
+    def refresh_interval(self, priority: float) -> int:
+        """Intervalo de atualização desejado para uma prioridade"""
+        high, medium, low = self.TIER_MULTIPLIERS
+        if priority >= 2 / 3:
+            multiplier = high
+        elif priority >= 1 / 3:
+            multiplier = medium
+        else:
+            multiplier = low
+        return min(self.RUN_INTERVAL * multiplier, self.max_staleness)
+
+    def plan(self, symbols: List[str], now: Optional[float] = None) -> List[str]:
+        """
+        Retorna os símbolos desta execução, em ordem de consulta:
+        vencidos (idade >= max_staleness) primeiro, depois os devidos por
+        prioridade decrescente.
+        """
+        self.load()
+        now = now or time.time()
+        priorities = self.priorities(symbols)
+        # Folga de meio intervalo absorve a variação de horário do cron
+        slack = self.RUN_INTERVAL / 2
+
+        overdue, due = [], []
+        for symbol in symbols:
+            age = now - self.state.get(symbol, {}).get("last_polled", 0)
+            if age + slack >= self.max_staleness:
+                overdue.append((age, symbol))
+            elif age + slack >= self.refresh_interval(priorities[symbol]):
+                due.append((priorities[symbol], symbol))
+
+        planned = ([symbol for _, symbol in sorted(overdue, reverse=True)] +
+                   [symbol for _, symbol in sorted(due, reverse=True)])
+        if self.max_symbols:
+            planned = planned[:self.max_symbols]
+
+        logger.info(f"🗓️  Agendados {len(planned)}/{len(symbols)} símbolos "
+                    f"({len(overdue)} no limite de defasagem)")
+        return planned
+
+    def record(self, quote: Dict, now: Optional[float] = None):
+        """Atualiza volume médio, volatilidade e horário da última consulta"""
+        entry = self.state.setdefault(quote["symbol"], {})
+        alpha = self.EWMA_ALPHA
+        volume = float(quote.get("volume", 0))
+        move = abs(float(quote.get("change_percent", 0)))
+
+        if "avg_volume" in entry:
+            entry["avg_volume"] = alpha * volume + (1 - alpha) * entry["avg_volume"]
+            entry["volatility"] = alpha * move + (1 - alpha) * entry["volatility"]
+        else:
+            entry["avg_volume"] = volume
+            entry["volatility"] = move
+        entry["last_polled"] = now or time.time()
@@ -0,0 +1,187 @@
+"""
+Agregados por setor e indústria calculados a cada execução.
+
+Para cada setor e indústria do company_list: variação média ponderada
+pela capitalização de mercado (dos fundamentais gravados), variação média
+simples, avanços/quedas/estáveis e volume total. Os grupos vêm do índice
+pré-calculado em company_list.get_group_index, e setores e indústrias são
+acumulados juntos em uma única passada sobre as cotações.
+
+Os agregados cobrem o universo inteiro: as cotações vêm do snapshot latest
+mesclado (não só dos símbolos devidos nesta execução), e a variação de
+cada símbolo é o retorno do dia, último preço contra a abertura do pregão
+no agregado diário (rollups.py), com o volume acumulado do dia. Símbolos
+sem cotação ou sem agregado diário no pregão mais recente ficam de fora.
+
+    latest/aggregates.json          agregados da última execução
+    aggregates/{YYYY-MM-DD}.json    histórico do dia, por timestamp da barra
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from company_list import get_group_index
+from storage_backends import StorageReadError
+
+logger = logging.getLogger(__name__)
+
+LATEST_KEY = "latest/aggregates.json"
+HISTORY_PREFIX = "aggregates"
+GROUP_FIELDS = {"sector": "sectors", "industry": "industries"}
+FUNDAMENTALS_LOOKBACK_DAYS = 7
+CACHE_CONTROL = "max-age=60"
+
+
+def day_returns(quotes: List[Dict], session_bars: Dict[str, Dict]) -> List[Dict]:
+    """Retorno e volume do dia de cada símbolo com barra diária do pregão"""
+    records = []
+    for quote in quotes:
+        bar = session_bars.get(quote["symbol"])
+        if not bar or not bar.get("open") or quote.get("price") is None:
+            continue
+        records.append({
+            "symbol": quote["symbol"],
+            "change_percent": (quote["price"] - bar["open"]) / bar["open"] * 100,
+            "volume": bar["volume"]
+        })
+    return records
+
+
+def group_aggregates(quotes: List[Dict], market_caps: Dict[str, float]) -> Dict[str, Dict[str, Dict]]:
+    """Calcula os agregados de todos os campos de GROUP_FIELDS em uma passada"""
+    indexes = []
+    for field in GROUP_FIELDS:
+        groups, index = get_group_index(field)
+        size = len(groups)
+        indexes.append((field, groups, index, {
+            "members": [0] * size, "change_sum": [0.0] * size,
+            "weighted_sum": [0.0] * size, "weight": [0.0] * size,
+            "advances": [0] * size, "declines": [0] * size, "volume": [0] * size
+        }))
+
+    for quote in quotes:
+        symbol = quote["symbol"]
+        change = quote.get("change_percent", 0.0)
+        volume = quote.get("volume", 0)
+        cap = market_caps.get(symbol) or 0.0
+
+        for _, _, index, acc in indexes:
+            group = index.get(symbol)
+            if group is None:
+                continue
+            acc["members"][group] += 1
+            acc["change_sum"][group] += change
+            acc["volume"][group] += volume
+            if cap > 0:
+                acc["weighted_sum"][group] += change * cap
+                acc["weight"][group] += cap
+            if change > 0:
+                acc["advances"][group] += 1
+            elif change < 0:
+                acc["declines"][group] += 1
+
+    result = {}
+    for field, groups, _, acc in indexes:
+        result[GROUP_FIELDS[field]] = {
+            group: {
+                "companies": acc["members"][idx],
+                "weighted_change_percent": (round(acc["weighted_sum"][idx] / acc["weight"][idx], 4)
+                                            if acc["weight"][idx] else None),
+                "mean_change_percent": round(acc["change_sum"][idx] / acc["members"][idx], 4),
+                "advances": acc["advances"][idx],
+                "declines": acc["declines"][idx],
+                "unchanged": acc["members"][idx] - acc["advances"][idx] - acc["declines"][idx],
+                "volume": acc["volume"][idx],
+                "market_cap": acc["weight"][idx]
+            }
+            for idx, group in enumerate(groups) if acc["members"][idx]
+        }
+    return result
+
+
+class SectorAggregator:
+    """Calcula e publica os agregados; a capitalização é carregada uma vez por dia"""
+
+    def __init__(self, s3_manager, rollups):
+        self.s3_manager = s3_manager
+        # Agregados diários (abertura e volume do pregão) mantidos na ingestão
+        self.rollups = rollups
+        self.market_caps: Dict[str, float] = {}
+        self.fundamentals_date: Optional[str] = None
+        self._loaded_for: Optional[str] = None
+
+    def update_market_caps(self, fundamentals: List[Dict], date_str: str):
+        """Usa os fundamentais recém-coletados (evita reler do S3)"""
+        caps = {company["symbol"]: company.get("market_cap") for company in fundamentals
+                if company.get("market_cap")}
+        if caps:
+            self.market_caps = caps
+            self.fundamentals_date = self._loaded_for = date_str
+
+    def _load_market_caps(self, current_time: datetime):
+        """Fundamentais mais recentes gravados (até FUNDAMENTALS_LOOKBACK_DAYS atrás)"""
+        date_str = current_time.strftime("%Y-%m-%d")
+        if self._loaded_for == date_str:
+            return
+        self._loaded_for = date_str
+
+        for days_back in range(FUNDAMENTALS_LOOKBACK_DAYS + 1):
+            day = (current_time - timedelta(days=days_back)).strftime("%Y-%m-%d")
+            stored = self.s3_manager.read_json(f"fundamentals/{day}/company-fundamentals.json")
+            if stored:
+                self.update_market_caps(stored.get("companies", []), day)
+                self._loaded_for = date_str
+                return
+        logger.warning("⚠️  Sem fundamentais recentes: agregados sem ponderação por capitalização")
+
+    def compute(self, quotes: List[Dict], current_time: datetime) -> Optional[Dict]:
+        """Agregados do pregão mais recente; None se nenhum símbolo tem barra diária"""
+        as_of = max(quote["timestamp"] for quote in quotes)
+        session = [quote for quote in quotes if quote["timestamp"][:10] == as_of[:10]]
+        records = day_returns(session, self.rollups.session_bars(as_of[:10]))
+        if not records:
+            return None
+
+        self._load_market_caps(current_time)
+        document = {
+            "as_of": as_of,
+            "computed_at": current_time.isoformat(),
+            "fundamentals_date": self.fundamentals_date,
+            "companies": len(records)
+        }
+        document.update(group_aggregates(records, self.market_caps))
+        return document
+
+    def publish(self, quotes: List[Dict], current_time: datetime) -> bool:
+        """
+        Grava o snapshot latest e acrescenta ao histórico do dia; quotes é
+        o universo inteiro (as cotações mais recentes de cada símbolo)
+        """
+        if not quotes:
+            return True
+
+        try:
+            document = self.compute(quotes, current_time)
+        except StorageReadError:
+            return False
+        if document is None:
+            logger.info("📊 Agregados: sem barras diárias do pregão ainda")
+            return True
+        success = self.s3_manager.write_json(LATEST_KEY, document, cache_control=CACHE_CONTROL)
+
+        date_str = document["as_of"][:10]
+        history_key = f"{HISTORY_PREFIX}/{date_str}.json"
+        try:
+            history = self.s3_manager.read_json(history_key) or {"date": date_str, "runs": {}}
+        except StorageReadError:
+            # Histórico não lido: regravá-lo só com esta execução apagaria as anteriores
+            return False
+        history["runs"][document["as_of"]] = {field: document[field] for field in GROUP_FIELDS.values()}
+        success &= self.s3_manager.write_json(history_key, history,
+                                              {'total-runs': str(len(history["runs"]))})
+
+        if success:
+            logger.info(f"📊 Agregados: {len(document['sectors'])} setores, "
+                        f"{len(document['industries'])} indústrias")
+        return success
@@ -0,0 +1,110 @@
+"""
+Snapshot "latest": a cotação mais recente de cada símbolo em um único objeto.
+
+Dashboards leem um objeto pequeno com um único GET, sem listar o prefixo
+quotes/ do dia. O snapshot é mesclado por símbolo (execuções parciais não
+apagam os demais) e substituído a cada execução; o PUT do S3 é atômico,
+então leitores sempre veem a versão anterior ou a nova, nunca um objeto
+parcial.
+
+    latest/quotes.json                  todos os símbolos
+    latest/sectors/{setor}.json         um objeto por setor (company_list)
+
+Formato compacto (colunar):
+    {"updated_at": "...", "fields": ["timestamp", "price", ...],
+     "quotes": {"AAPL": ["2024-01-15 15:55:00", 185.2, ...]}}
+"""
+
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from company_list import COMPANIES
+from storage_backends import StorageReadError
+
+logger = logging.getLogger(__name__)
+
+LATEST_KEY = "latest/quotes.json"
+SECTOR_PREFIX = "latest/sectors"
+FIELDS = ("timestamp", "price", "change", "change_percent", "volume", "open", "high", "low")
+CACHE_CONTROL = "max-age=60"
+
+
+def sector_slug(sector: str) -> str:
+    """'Consumer Cyclical' -> 'consumer-cyclical'"""
+    return re.sub(r"[^a-z0-9]+", "-", sector.lower()).strip("-")
+
+
+class LatestSnapshot:
+    """Mantém e publica o snapshot das cotações mais recentes"""
+
+    def __init__(self, s3_manager):
+        self.s3_manager = s3_manager
+        self.rows: Optional[Dict[str, list]] = None
+
+    def _load(self) -> Dict[str, list]:
+        if self.rows is None:
+            stored = self.s3_manager.read_json(LATEST_KEY) or {}
+            self.rows = stored.get("quotes", {}) if stored.get("fields") == list(FIELDS) else {}
+        return self.rows
+
+    def quotes(self) -> List[Dict]:
+        """Cotação mais recente de cada símbolo (universo inteiro), como dicts"""
+        return [dict(zip(FIELDS, row), symbol=symbol) for symbol, row in self._load().items()]
+
+    def merge(self, quotes: List[Dict]) -> List[str]:
+        """Mescla cotações mais novas no snapshot; retorna os símbolos alterados"""
+        rows = self._load()
+        changed = []
+        for quote in quotes:
+            row = [quote.get(field) for field in FIELDS]
+            current = rows.get(quote["symbol"])
+            if current is not None and (current[0] or "") > (row[0] or ""):
+                continue
+            if current != row:
+                rows[quote["symbol"]] = row
+                changed.append(quote["symbol"])
+        return changed
+
+    def _document(self, symbols: List[str], updated_at: str) -> Dict:
+        return {
+            "updated_at": updated_at,
+            "fields": list(FIELDS),
+            "quotes": {symbol: self.rows[symbol] for symbol in sorted(symbols)}
+        }
+
+    def publish(self, quotes: List[Dict]) -> bool:
+        """Atualiza o snapshot geral e os snapshots dos setores alterados"""
+        try:
+            changed = self.merge(quotes)
+        except StorageReadError:
+            # Sem o snapshot anterior, gravar só estas cotações apagaria os demais símbolos
+            return False
+        if not changed:
+            logger.debug("Snapshot latest inalterado")
+            return True
+
+        updated_at = datetime.now(timezone.utc).isoformat()
+        items = [(LATEST_KEY, self._document(list(self.rows), updated_at), None)]
+
+        by_sector: Dict[str, List[str]] = {}
+        for symbol in self.rows:
+            sector = COMPANIES.get(symbol, {}).get("sector", "Other")
+            by_sector.setdefault(sector, []).append(symbol)
+
+        changed_sectors = {COMPANIES.get(symbol, {}).get("sector", "Other") for symbol in changed}
+        for sector in sorted(changed_sectors):
+            document = self._document(by_sector[sector], updated_at)
+            document["sector"] = sector
+            items.append((f"{SECTOR_PREFIX}/{sector_slug(sector)}.json", document, None))
+
+        # Objeto geral e setores gravados em paralelo
+        success = all(self.s3_manager.write_many(items, CACHE_CONTROL).values())
+
+        if success:
+            logger.info(f"📌 Snapshot latest: {len(changed)} símbolos, {len(changed_sectors)} setores")
+        else:
+            # Força recarregar do S3 na próxima execução
+            self.rows = None
+        return success
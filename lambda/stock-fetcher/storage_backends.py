@@ -0,0 +1,634 @@
+"""
+Backends de armazenamento dos objetos do pipeline.
+
+O S3DataManager grava e lê objetos por chave (layout do S3: quotes/...,
+latest/..., bars/...) sem depender do boto3: as operações passam por um
+backend com a mesma API em todas as implementações:
+
+    put / put_many        grava um objeto / um lote (bytes já serializados)
+    get / get_many        lê um objeto / um lote (None para inexistentes;
+                          demais erros de leitura levantam exceção)
+    get_range             bytes [start, end] do objeto armazenado
+    head                  tamanho, Content-Encoding e metadados
+    list                  chaves e tamanhos de um prefixo
+    flush                 torna duráveis as gravações pendentes
+
+Implementações:
+    S3Backend             bucket S3 (padrão); lotes em paralelo
+    LocalFSBackend        diretório local, um arquivo por chave (+ metadados
+                          em .{nome}.meta); fsync por objeto ou em lotes
+    SQLiteBackend         um arquivo SQLite (WAL), lote em uma transação
+    DuckDBBackend         um arquivo DuckDB (opcional, requer o pacote `duckdb`)
+
+Configuração por ambiente:
+    STORAGE_BACKEND       s3 (padrão), local, sqlite ou duckdb
+    STORAGE_PATH          diretório (local) ou arquivo (sqlite/duckdb)
+    LOCAL_FSYNC           batch (padrão), always ou never
+    LOCAL_FSYNC_EVERY     objetos por lote de fsync (padrão 64)
+
+Benchmark lado a lado (S3 local via HTTP, diretório e arquivos de banco):
+    python storage_backends.py [--objects 400] [--latency-ms 5]
+
+Referência (400 objetos de ~0,7 KB, objetos/s): S3 local com 5 ms por
+requisição ~150 put, ~630 put_many, ~780 get_many; diretório local ~2.100
+put com fsync por objeto, ~2.700 em lotes e ~4.600 sem fsync; SQLite
+~50.000 put e ~150.000 put_many; DuckDB ~370 put e ~1.300 put_many
+(o formato colunar não favorece gravações de objetos por chave). Leituras pontuais: ~6 ms no S3 local, <0,05 ms nos demais.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+try:
+    import duckdb
+except ImportError:  # DuckDB é opcional
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("s3", "local", "sqlite", "duckdb")
+FSYNC_MODES = ("batch", "always", "never")
+DEFAULT_STORAGE_PATHS = {"local": "/tmp/stock-data", "sqlite": "/tmp/stock-data.db",
+                         "duckdb": "/tmp/stock-data.duckdb"}
+DEFAULT_FSYNC_EVERY = 64
+SQL_BATCH_KEYS = 500
+# Códigos do ClientError de HEAD/GET para objeto inexistente
+NOT_FOUND_CODES = ("404", "NoSuchKey", "NotFound")
+
+Body = Union[bytes, BinaryIO]
+# (chave, corpo, Content-Encoding, metadados)
+PutItem = Tuple[str, Body, Optional[str], Optional[Dict]]
+
+
+class StorageReadError(Exception):
+    """Falha ao ler um objeto existente (diferente de chave inexistente)"""
+
+
+def _read_body(body: Body) -> bytes:
+    return body if isinstance(body, bytes) else body.read()
+
+
+class StorageBackend(ABC):
+    """Interface comum; location/put/get/get_range/head/list/delete são obrigatórios"""
+
+    name = ""
+
+    @abstractmethod
+    def location(self, key: str) -> str:
+        """Endereço legível de uma chave (para logs)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, key: str, body: Body, content_encoding: Optional[str] = None,
+            metadata: Optional[Dict] = None, cache_control: Optional[str] = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict]:
+        """{"body": bytes, "content_encoding": ..., "metadata": {...}} ou None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_range(self, key: str, start: int, end: int) -> bytes:
+        """Intervalo fechado [start, end] dos bytes armazenados"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def head(self, key: str) -> Optional[Dict]:
+        """
+        {"size": ..., "content_encoding": ..., "metadata": {...}}; None só se o
+        objeto não existe (outras falhas levantam a exceção do backend)
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def list(self, prefix: str) -> List[Dict]:
+        """[{"key": ..., "size": ...}] em ordem de chave"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def _try_put(self, item: PutItem, cache_control: Optional[str]) -> bool:
+        key, body, content_encoding, metadata = item
+        try:
+            self.put(key, body, content_encoding, metadata, cache_control)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Falha ao gravar {self.location(key)}: {str(e)}")
+            return False
+
+    def put_many(self, items: List[PutItem], cache_control: Optional[str] = None) -> Dict[str, bool]:
+        """Grava um lote e retorna {chave: sucesso}, na ordem dos itens"""
+        results = {item[0]: self._try_put(item, cache_control) for item in items}
+        self.flush()
+        return results
+
+    def get_many(self, keys: List[str]) -> List[Optional[Dict]]:
+        return [self.get(key) for key in keys]
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+# ===== S3 =====
+class S3Backend(StorageBackend):
+    """Bucket S3; lotes gravados e lidos pelas threads do ParallelS3Writer"""
+
+    name = "s3"
+
+    def __init__(self, bucket_name: str, s3_client, writer=None):
+        from s3_writer import ParallelS3Writer
+
+        self.bucket_name = bucket_name
+        self.s3_client = s3_client
+        self.writer = writer or ParallelS3Writer()
+
+    def location(self, key: str) -> str:
+        return f"s3://{self.bucket_name}/{key}"
+
+    def put(self, key, body, content_encoding=None, metadata=None, cache_control=None):
+        extra_args = {'ContentEncoding': content_encoding} if content_encoding else {}
+        if cache_control:
+            extra_args['CacheControl'] = cache_control
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=body,
+            ContentType='application/json',
+            Metadata=metadata or {},
+            **extra_args
+        )
+
+    def put_many(self, items, cache_control=None):
+        results = self.writer.map(lambda item: self._try_put(item, cache_control), items)
+        return dict(zip((item[0] for item in items), results))
+
+    def get(self, key):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        return {"body": response['Body'].read(), "content_encoding": response.get('ContentEncoding'),
+                "metadata": response.get('Metadata') or {}}
+
+    def get_many(self, keys):
+        return self.writer.map(self.get, keys)
+
+    def get_range(self, key, start, end):
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key,
+                                             Range=f"bytes={start}-{end}")
+        return response['Body'].read()
+
+    def head(self, key):
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+        except Exception as e:
+            # HEAD não tem corpo: o 404 chega como ClientError com código "404".
+            # Outros erros (403, throttling, timeout) não significam "não existe"
+            code = getattr(e, "response", {}).get("Error", {}).get("Code")
+            if isinstance(e, self.s3_client.exceptions.NoSuchKey) or code in NOT_FOUND_CODES:
+                return None
+            raise
+        return {"size": response.get('ContentLength', 0), "content_encoding": response.get('ContentEncoding'),
+                "metadata": response.get('Metadata') or {}}
+
+    def list(self, prefix):
+        objects = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for item in page.get('Contents', []):
+                objects.append({"key": item["Key"], "size": item.get("Size", 0)})
+        return objects
+
+    def delete(self, key):
+        self.s3_client.delete_object(Bucket=self.bucket_name, Key=key)
+
+
+# ===== SISTEMA DE ARQUIVOS =====
+class LocalFSBackend(StorageBackend):
+    """
+    Um arquivo por chave sob root (gravado em temporário + rename atômico)
+    e os metadados em .{nome}.meta ao lado. Com fsync="batch" os arquivos e
+    diretórios alterados recebem fsync juntos a cada fsync_every objetos,
+    ao fim de cada lote e em flush(): uma queda perde no máximo o lote em
+    aberto. "always" faz fsync de cada objeto; "never" deixa para o SO.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str, fsync: str = "batch", fsync_every: int = DEFAULT_FSYNC_EVERY):
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f"fsync inválido: {fsync} (use {', '.join(FSYNC_MODES)})")
+        self.root = os.path.abspath(root)
+        self.fsync = fsync
+        self.fsync_every = fsync_every
+        self._pending: Dict[str, None] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def location(self, key):
+        return self._path(key)
+
+    def _path(self, key: str) -> str:
+        parts = key.split("/")
+        if any(part in ("", ".", "..") for part in parts):
+            raise ValueError(f"Chave inválida: {key}")
+        return os.path.join(self.root, *parts)
+
+    @staticmethod
+    def _meta_path(path: str) -> str:
+        directory, name = os.path.split(path)
+        return os.path.join(directory, f".{name}.meta")
+
+    def _write_file(self, path: str, body: Body):
+        temp_path = os.path.join(os.path.dirname(path),
+                                 f".{os.path.basename(path)}.tmp-{os.getpid()}-{threading.get_ident()}")
+        with open(temp_path, "wb") as handle:
+            if isinstance(body, bytes):
+                handle.write(body)
+            else:
+                shutil.copyfileobj(body, handle)
+            if self.fsync == "always":
+                handle.flush()
+                os.fsync(handle.fileno())
+        os.replace(temp_path, path)
+
+    def put(self, key, body, content_encoding=None, metadata=None, cache_control=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {"content_encoding": content_encoding, "metadata": metadata or {}}
+        self._write_file(self._meta_path(path), json.dumps(meta).encode())
+        self._write_file(path, body)
+
+        if self.fsync == "always":
+            self._fsync_path(os.path.dirname(path))
+        elif self.fsync == "batch":
+            with self._lock:
+                self._pending[path] = None
+                full = len(self._pending) >= self.fsync_every
+            if full:
+                self.flush()
+
+    @staticmethod
+    def _fsync_path(path: str):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def flush(self):
+        with self._lock:
+            paths, self._pending = list(self._pending), {}
+        directories = {}
+        for path in paths:
+            for target in (self._meta_path(path), path):
+                try:
+                    self._fsync_path(target)
+                except FileNotFoundError:
+                    pass  # Removido depois da gravação
+            directories[os.path.dirname(path)] = None
+        # Um fsync por diretório torna os renames do lote duráveis
+        for directory in directories:
+            self._fsync_path(directory)
+
+    def _read_meta(self, path: str) -> Dict:
+        try:
+            with open(self._meta_path(path), "rb") as handle:
+                return json.loads(handle.read())
+        except FileNotFoundError:
+            return {"content_encoding": None, "metadata": {}}
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as handle:
+                body = handle.read()
+        except FileNotFoundError:
+            return None
+        return dict(self._read_meta(path), body=body)
+
+    def get_range(self, key, start, end):
+        with open(self._path(key), "rb") as handle:
+            handle.seek(start)
+            return handle.read(end - start + 1)
+
+    def head(self, key):
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return None
+        return dict(self._read_meta(path), size=size)
+
+    def list(self, prefix):
+        # Percorre só o diretório que contém o prefixo
+        directory = os.path.join(self.root, *prefix.split("/")[:-1])
+        objects = []
+        for current, dirs, files in os.walk(directory):
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for name in files:
+                if name.startswith("."):
+                    continue
+                path = os.path.join(current, name)
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    objects.append({"key": key, "size": os.path.getsize(path)})
+        return sorted(objects, key=lambda item: item["key"])
+
+    def delete(self, key):
+        path = self._path(key)
+        for target in (path, self._meta_path(path)):
+            try:
+                os.remove(target)
+            except FileNotFoundError:
+                pass
+
+
+# ===== BANCO EMBUTIDO =====
+class SQLiteBackend(StorageBackend):
+    """
+    Objetos em uma tabela (chave primária = chave do S3) de um arquivo
+    SQLite em modo WAL; put_many grava o lote em uma única transação.
+    """
+
+    name = "sqlite"
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS objects (
+            key VARCHAR PRIMARY KEY,
+            body BLOB NOT NULL,
+            content_encoding VARCHAR,
+            metadata VARCHAR,
+            size BIGINT NOT NULL
+        )
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.connection = self._connect()
+        self.connection.execute(self.SCHEMA)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def location(self, key):
+        return f"{self.name}://{self.path}#{key}"
+
+    @staticmethod
+    def _row(key: str, body: Body, content_encoding: Optional[str], metadata: Optional[Dict]) -> Tuple:
+        data = _read_body(body)
+        return key, data, content_encoding, json.dumps(metadata or {}), len(data)
+
+    def _upsert(self, rows: List[Tuple]):
+        with self._lock:
+            self.connection.execute("BEGIN TRANSACTION")
+            try:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO objects (key, body, content_encoding, metadata, size) "
+                    "VALUES (?, ?, ?, ?, ?)", rows)
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def put(self, key, body, content_encoding=None, metadata=None, cache_control=None):
+        self._upsert([self._row(key, body, content_encoding, metadata)])
+
+    def put_many(self, items, cache_control=None):
+        try:
+            self._upsert([self._row(*item) for item in items])
+            return {item[0]: True for item in items}
+        except Exception as e:
+            logger.error(f"❌ Falha ao gravar lote de {len(items)} objetos em {self.path}: {str(e)}")
+            return {item[0]: False for item in items}
+
+    @staticmethod
+    def _object(row: Tuple) -> Dict:
+        body, content_encoding, metadata = row
+        return {"body": bytes(body), "content_encoding": content_encoding, "metadata": json.loads(metadata)}
+
+    def get(self, key):
+        rows = self._query("SELECT body, content_encoding, metadata FROM objects WHERE key = ?", (key,))
+        return self._object(rows[0]) if rows else None
+
+    def get_many(self, keys):
+        found = {}
+        for offset in range(0, len(keys), SQL_BATCH_KEYS):
+            batch = keys[offset:offset + SQL_BATCH_KEYS]
+            rows = self._query("SELECT key, body, content_encoding, metadata FROM objects "
+                               f"WHERE key IN ({', '.join('?' * len(batch))})", tuple(batch))
+            found.update((row[0], self._object(row[1:])) for row in rows)
+        return [found.get(key) for key in keys]
+
+    def get_range(self, key, start, end):
+        rows = self._query("SELECT substr(body, ?, ?) FROM objects WHERE key = ?",
+                           (start + 1, end - start + 1, key))
+        if not rows:
+            raise KeyError(key)
+        return bytes(rows[0][0])
+
+    def head(self, key):
+        rows = self._query("SELECT size, content_encoding, metadata FROM objects WHERE key = ?", (key,))
+        if not rows:
+            return None
+        size, content_encoding, metadata = rows[0]
+        return {"size": size, "content_encoding": content_encoding, "metadata": json.loads(metadata)}
+
+    def list(self, prefix):
+        # Faixa de chaves [prefix, prefix + U+10FFFF) usa o índice da chave primária
+        rows = self._query("SELECT key, size FROM objects WHERE key >= ? AND key < ? ORDER BY key",
+                           (prefix, prefix + "\U0010ffff"))
+        return [{"key": key, "size": size} for key, size in rows]
+
+    def delete(self, key):
+        with self._lock:
+            self.connection.execute("DELETE FROM objects WHERE key = ?", (key,))
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+
+class DuckDBBackend(SQLiteBackend):
+    """Mesma tabela em um arquivo DuckDB (requer o pacote `duckdb`)"""
+
+    name = "duckdb"
+
+    def _connect(self):
+        if duckdb is None:
+            raise RuntimeError("STORAGE_BACKEND=duckdb requer o pacote duckdb (pip install duckdb)")
+        return duckdb.connect(self.path)
+
+    def _upsert(self, rows: List[Tuple]):
+        # executemany do DuckDB insere linha a linha; um INSERT com várias
+        # linhas por lote grava o lote inteiro de uma vez (chaves repetidas no
+        # mesmo INSERT são rejeitadas: vale a última)
+        rows = list({row[0]: row for row in rows}.values())
+        with self._lock:
+            self.connection.execute("BEGIN TRANSACTION")
+            try:
+                for offset in range(0, len(rows), SQL_BATCH_KEYS):
+                    batch = rows[offset:offset + SQL_BATCH_KEYS]
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO objects (key, body, content_encoding, metadata, size) "
+                        f"VALUES {', '.join(['(?, ?, ?, ?, ?)'] * len(batch))}",
+                        [value for row in batch for value in row])
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def get_range(self, key, start, end):
+        # substr do DuckDB não aceita BLOB: o recorte é feito no Python
+        rows = self._query("SELECT body FROM objects WHERE key = ?", (key,))
+        if not rows:
+            raise KeyError(key)
+        return bytes(rows[0][0][start:end + 1])
+
+
+def storage_backend_from_env(bucket_name: str, s3_client) -> StorageBackend:
+    """Backend escolhido por STORAGE_BACKEND (padrão: o bucket S3)"""
+    name = os.environ.get('STORAGE_BACKEND', 's3')
+    if name not in BACKENDS:
+        raise ValueError(f"STORAGE_BACKEND inválido: {name} (use {', '.join(BACKENDS)})")
+    if name == "s3":
+        return S3Backend(bucket_name, s3_client)
+
+    path = os.environ.get('STORAGE_PATH', DEFAULT_STORAGE_PATHS[name])
+    logger.info(f"🗄️  Armazenamento {name}: {path}")
+    if name == "local":
+        return LocalFSBackend(path, os.environ.get('LOCAL_FSYNC', 'batch'),
+                              int(os.environ.get('LOCAL_FSYNC_EVERY', DEFAULT_FSYNC_EVERY)))
+    if name == "sqlite":
+        return SQLiteBackend(path)
+    return DuckDBBackend(path)
+
+
+# ===== BENCHMARK =====
+def _bench_objects(count: int) -> List[Tuple[str, bytes]]:
+    """Objetos no formato de bars/5min/{dia}/{símbolo}.json (78 barras, gzip)"""
+    from compression import json_body
+
+    objects = []
+    for idx in range(count):
+        date_str = f"2024-01-{idx % 20 + 2:02d}"
+        symbol = f"S{idx // 20:04d}"
+        bars = [{"symbol": symbol, "timestamp": f"{date_str} {9 + (30 + 5 * bar) // 60:02d}:{(30 + 5 * bar) % 60:02d}:00",
+                 "open": 100.0 + bar * 0.01, "high": 101.5, "low": 99.25, "close": 100.75 + idx % 7,
+                 "volume": 1000 + bar} for bar in range(78)]
+        document = {"symbol": symbol, "interval": "5min", "date": date_str, "bars": bars}
+        objects.append((f"bars/5min/{date_str}/{symbol}.json", json_body(document).read()))
+    return objects
+
+
+def _median_ms(samples: List[float]) -> float:
+    return sorted(samples)[len(samples) // 2] * 1000
+
+
+def _bench_backend(backend: StorageBackend, objects: List[Tuple[str, bytes]], sample: int) -> Dict:
+    half = len(objects) // 2
+    results = {}
+
+    start = time.perf_counter()
+    for key, body in objects[:half]:
+        backend.put(key, body, "gzip", {"total-bars": "78"})
+    backend.flush()
+    results["put"] = half / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    written = backend.put_many([(key, body, "gzip", {"total-bars": "78"}) for key, body in objects[half:]])
+    results["put_many"] = (len(objects) - half) / (time.perf_counter() - start)
+    assert all(written.values())
+
+    keys = [key for key, _ in objects]
+    start = time.perf_counter()
+    found = backend.get_many(keys)
+    results["get_many"] = len(keys) / (time.perf_counter() - start)
+    assert all(stored is not None for stored in found)
+
+    step = max(1, len(keys) // sample)
+    point_keys = keys[::step][:sample]
+    timings = {"get": [], "range": []}
+    for key in point_keys:
+        start = time.perf_counter()
+        backend.get(key)
+        timings["get"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        backend.get_range(key, 0, 511)
+        timings["range"].append(time.perf_counter() - start)
+    results["get_ms"] = _median_ms(timings["get"])
+    results["range_ms"] = _median_ms(timings["range"])
+
+    start = time.perf_counter()
+    listed = backend.list("bars/5min/2024-01-02/")
+    results["list_ms"] = (time.perf_counter() - start) * 1000
+    results["listed"] = len(listed)
+    return results
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Compara os backends de armazenamento")
+    parser.add_argument("--objects", type=int, default=400)
+    parser.add_argument("--latency-ms", type=float, default=5, help="Latência simulada do S3 local")
+    parser.add_argument("--sample", type=int, default=50, help="Leituras pontuais medidas")
+    args = parser.parse_args()
+
+    from s3_writer import _bench_client, _local_s3, s3_client_config
+
+    logging.basicConfig(level=logging.WARNING)
+    objects = _bench_objects(args.objects)
+    workdir = tempfile.mkdtemp(prefix="storage-bench-")
+    server, _ = _local_s3(args.latency_ms / 1000)
+
+    backends = [
+        (f"s3 (local, {args.latency_ms:.0f} ms)",
+         lambda: S3Backend("bench", _bench_client(f"http://127.0.0.1:{server.server_address[1]}",
+                                                  s3_client_config()))),
+        ("local, fsync always", lambda: LocalFSBackend(os.path.join(workdir, "always"), "always")),
+        ("local, fsync batch", lambda: LocalFSBackend(os.path.join(workdir, "batch"), "batch")),
+        ("local, fsync never", lambda: LocalFSBackend(os.path.join(workdir, "never"), "never")),
+        ("sqlite", lambda: SQLiteBackend(os.path.join(workdir, "bench.db"))),
+    ]
+    if duckdb is not None:
+        backends.append(("duckdb", lambda: DuckDBBackend(os.path.join(workdir, "bench.duckdb"))))
+    else:
+        print("(duckdb não instalado: backend omitido)")
+
+    size = sum(len(body) for _, body in objects)
+    print(f"{args.objects} objetos ({size / len(objects) / 1024:.1f} KB cada, gzip); "
+          f"metade com put, metade com put_many")
+    print(f"  {'backend':>22}  {'put/s':>8}  {'put_many/s':>10}  {'get_many/s':>10}  "
+          f"{'get ms':>7}  {'range ms':>8}  {'list ms':>7}")
+    try:
+        for label, factory in backends:
+            backend = factory()
+            stats = _bench_backend(backend, objects, args.sample)
+            backend.close()
+            print(f"  {label:>22}  {stats['put']:8.0f}  {stats['put_many']:10.0f}  {stats['get_many']:10.0f}  "
+                  f"{stats['get_ms']:7.2f}  {stats['range_ms']:8.2f}  {stats['list_ms']:7.1f}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
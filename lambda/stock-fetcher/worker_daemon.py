@@ -0,0 +1,190 @@
+"""
+Worker daemon: executa o pipeline continuamente fora da Lambda.
+
+Mantém um único PipelineRuntime (sessão HTTP, rate limit, caches) durante
+toda a vida do processo e inicia uma nova varredura assim que a anterior
+termina, sem cold starts nem a fronteira fixa de 5 minutos do cron. As
+saídas no S3 são as mesmas da Lambda. Com a fila de novas tentativas
+configurada (retry_queue.py), os símbolos com falha vencidos são refeitos
+entre uma varredura e a seguinte.
+
+Uso:
+    python worker_daemon.py [--port 8080] [--idle-sleep 30] [--ignore-market-hours]
+
+Endpoints locais:
+    GET /health   -> {"status": "ok", ...}
+    GET /metrics  -> contadores das varreduras
+"""
+
+import argparse
+import json
+import logging
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerDaemon:
+    """Loop de coleta contínuo com desligamento gracioso"""
+
+    MAX_SLEEP = 300  # Nunca dormir mais que isso de uma vez (reavalia o calendário)
+
+    def __init__(self, runtime, idle_sleep: float = 30, ignore_market_hours: bool = False):
+        self.runtime = runtime
+        self.idle_sleep = idle_sleep
+        self.ignore_market_hours = ignore_market_hours
+        self.stop_event = threading.Event()
+        self.started_at = time.time()
+        self.metrics: Dict = {
+            "sweeps": 0,
+            "sweeps_interrupted": 0,
+            "quotes_successful": 0,
+            "quotes_new": 0,
+            "symbols_failed": 0,
+            "retries_recovered": 0,
+            "last_sweep_at": None,
+            "last_sweep_seconds": None,
+            "state": "starting"
+        }
+
+    def request_stop(self, signum=None, frame=None):
+        """Handler de SIGTERM/SIGINT: termina após o símbolo em andamento"""
+        logger.info(f"⏹️  Sinal {signum} recebido, encerrando após o símbolo atual...")
+        self.stop_event.set()
+
+    def _sleep_until_market_open(self) -> None:
+        from market_calendar import next_session_open
+
+        next_open = next_session_open()
+        wait = (next_open - datetime.now(timezone.utc)).total_seconds()
+        self.metrics["state"] = "market_closed"
+        logger.info(f"💤 Mercado fechado - próxima abertura {next_open.isoformat()}")
+        self.stop_event.wait(max(1.0, min(wait, self.MAX_SLEEP)))
+
+    def run_once(self) -> Dict:
+        """Executa uma varredura e atualiza as métricas"""
+        from lambda_function import run_pipeline
+
+        self.metrics["state"] = "running"
+        self.runtime.begin_invocation()
+        result = run_pipeline(self.runtime, datetime.now(timezone.utc),
+                              should_stop=self.stop_event.is_set)
+
+        self.metrics["sweeps"] += 1
+        if result["status"] == "interrupted":
+            self.metrics["sweeps_interrupted"] += 1
+        self.metrics["quotes_successful"] += result["quotes_successful"]
+        self.metrics["quotes_new"] += result["quotes_new"]
+        self.metrics["symbols_failed"] += len(result["failed_symbols"])
+        self.metrics["last_sweep_at"] = result["timestamp"]
+        self.metrics["last_sweep_seconds"] = result["execution_time_seconds"]
+        return result
+
+    def run_retries(self) -> Optional[Dict]:
+        """Novas tentativas vencidas, com o orçamento de RETRY_CALLS_PER_RUN"""
+        if self.runtime.retry_queue is None:
+            return None
+        from retry_queue import RetryWorker, retry_calls_per_run
+
+        self.metrics["state"] = "retrying"
+        result = RetryWorker(self.runtime, self.runtime.retry_queue).run(
+            retry_calls_per_run(), should_stop=self.stop_event.is_set)
+        self.metrics["retries_recovered"] += len(result["recovered"])
+        return result
+
+    def run_forever(self) -> None:
+        from market_calendar import is_market_open
+
+        logger.info("🚀 === WORKER DAEMON INICIADO ===")
+        while not self.stop_event.is_set():
+            if not self.ignore_market_hours and not is_market_open():
+                self._sleep_until_market_open()
+                continue
+
+            try:
+                result = self.run_once()
+                self.run_retries()
+            except Exception as e:
+                logger.error(f"💥 Erro inesperado na varredura: {str(e)}")
+                self.metrics["state"] = "error"
+                self.stop_event.wait(self.idle_sleep)
+                continue
+
+            # Nenhum símbolo devido: aguardar antes de consultar o agendador de novo
+            if result["companies_scheduled"] == 0:
+                self.metrics["state"] = "idle"
+                self.stop_event.wait(self.idle_sleep)
+
+        self.metrics["state"] = "stopped"
+        logger.info("👋 Worker daemon encerrado")
+
+    def snapshot(self) -> Dict:
+        return dict(self.metrics,
+                    uptime_seconds=round(time.time() - self.started_at, 1),
+                    invocations=self.runtime.invocations,
+                    http=self.runtime.api_client.http.stats())
+
+
+def start_health_server(daemon: WorkerDaemon, port: int,
+                        host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Sobe o servidor de health/metrics em uma thread daemon"""
+
+    class HealthHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/health":
+                healthy = daemon.metrics["state"] != "error"
+                payload = {"status": "ok" if healthy else "degraded",
+                           "state": daemon.metrics["state"]}
+                status = 200 if healthy else 503
+            elif self.path == "/metrics":
+                payload, status = daemon.snapshot(), 200
+            else:
+                payload, status = {"error": "not found"}, 404
+
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(f"HTTP {self.address_string()} {format % args}")
+
+    server = ThreadingHTTPServer((host, port), HealthHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"🩺 Health/metrics em http://{host}:{port}/health")
+    return server
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Worker contínuo do pipeline de cotações")
+    parser.add_argument("--port", type=int, default=8080, help="Porta do health/metrics (0 desativa)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--idle-sleep", type=float, default=30,
+                        help="Espera (s) quando nenhum símbolo está devido")
+    parser.add_argument("--ignore-market-hours", action="store_true")
+    args = parser.parse_args(argv)
+
+    # Import tardio: lambda_function valida variáveis de ambiente ao carregar
+    from lambda_function import get_runtime
+
+    daemon = WorkerDaemon(get_runtime(), args.idle_sleep, args.ignore_market_hours)
+    signal.signal(signal.SIGTERM, daemon.request_stop)
+    signal.signal(signal.SIGINT, daemon.request_stop)
+
+    server = start_health_server(daemon, args.port, args.host) if args.port else None
+    try:
+        daemon.run_forever()
+    finally:
+        if server:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Varredura sintética de 1.000 símbolos sob o orçamento de 128 MB.
+
+Cada varredura roda em um processo próprio: o pico de RSS é do processo
+inteiro e a varredura substitui a API e o cliente S3 do módulo.
+
+    python -m pytest tests/test_memory_budget.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda', 'stock-fetcher')
+SYMBOLS = 1000
+LIMIT_MB = 128
+
+SWEEP = """
+import json, sys
+from datetime import datetime, timezone
+sys.path.insert(0, sys.argv[1])
+from memory_budget import _synthetic_sweep
+
+result = _synthetic_sweep(int(sys.argv[2]), 100, root=sys.argv[3])
+import lambda_function
+key = f"fundamentals/{datetime.now(timezone.utc):%Y-%m-%d}/company-fundamentals.json"
+stored = lambda_function.get_runtime().s3_manager.read_json(key)
+print(json.dumps({"quotes": result["quotes_successful"], "memory": result["memory"],
+                  "fundamentals": [company["symbol"] for company in stored["companies"]]}))
+"""
+
+
+def run_sweep(tmp_path, budget_mb):
+    env = {name: value for name, value in os.environ.items()
+           if name not in ("STORAGE_BACKEND", "RETRY_QUEUE_URL", "RETRY_QUEUE_FILE", "ANALYTICS_DB_PATH")}
+    env.update({"MEMORY_BUDGET_MB": str(budget_mb), "S3_MAX_ATTEMPTS": "1",
+                "AWS_ACCESS_KEY_ID": "test", "AWS_SECRET_ACCESS_KEY": "test",
+                "AWS_ENDPOINT_URL_S3": "http://127.0.0.1:9"})
+    completed = subprocess.run([sys.executable, "-c", SWEEP, LAMBDA_DIR, str(SYMBOLS), str(tmp_path)],
+                               env=env, capture_output=True, text=True, timeout=300)
+    assert completed.returncode == 0, completed.stderr[-2000:]
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="RSS medido via /proc")
+def test_sweep_fits_default_budget(tmp_path):
+    result = run_sweep(tmp_path, LIMIT_MB)
+    assert result["quotes"] == SYMBOLS
+    assert result["memory"]["spills"] == 0
+    assert result["memory"]["peak_rss_mb"] <= LIMIT_MB
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="RSS medido via /proc")
+def test_spilled_fundamentals_are_all_saved(tmp_path):
+    # Orçamento abaixo do RSS da própria varredura: todo checkpoint transborda
+    result = run_sweep(tmp_path, 40)
+    assert result["memory"]["spills"] > 0
+    assert result["quotes"] == SYMBOLS
+    assert sorted(result["fundamentals"]) == [f"S{idx:04d}" for idx in range(SYMBOLS)]
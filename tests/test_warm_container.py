@@ -0,0 +1,114 @@
+"""
+Invocações sequenciais da Lambda no mesmo processo (container quente).
+
+A API Alpha Vantage é substituída por uma sessão falsa e o S3 por um
+diretório local (STORAGE_BACKEND=local); o rate limit é zerado.
+
+    python -m pytest tests/test_warm_container.py
+"""
+
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'stock-fetcher'))
+
+BAR_TIME = "2024-01-16 10:00:00"
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """Responde a mesma barra de 5min para todo símbolo e conta as chamadas"""
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, params=None, **kwargs):
+        self.calls.append(params["function"])
+        if params["function"] == "OVERVIEW":
+            return FakeResponse({"Symbol": params["symbol"], "MarketCapitalization": "1000"})
+        return FakeResponse({"Time Series (5min)": {BAR_TIME: {
+            "1. open": "10", "2. high": "11", "3. low": "9", "4. close": "10.5", "5. volume": "100"}}})
+
+
+@pytest.fixture(scope="module")
+def lambda_module(tmp_path_factory):
+    root = tmp_path_factory.mktemp("warm")
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in {
+            "ALPHA_VANTAGE_API_KEY": "TESTKEY1234567", "S3_BUCKET_NAME": "test-bucket",
+            "STORAGE_BACKEND": "local", "STORAGE_PATH": str(root / "store"),
+            "IGNORE_MARKET_HOURS": "1", "HTTP_MAX_RETRIES": "0",
+            # Todos os símbolos vencidos a cada invocação (o agendador usa o relógio real)
+            "SCHEDULER_MAX_STALENESS_SECONDS": "1",
+            # Sem S3 real: o teste de conexão do import falha rápido
+            "AWS_DEFAULT_REGION": "us-east-1", "AWS_ACCESS_KEY_ID": "test",
+            "AWS_SECRET_ACCESS_KEY": "test", "AWS_ENDPOINT_URL_S3": "http://127.0.0.1:9",
+            "S3_MAX_ATTEMPTS": "1",
+        }.items():
+            patch.setenv(name, value)
+        for name in ("RETRY_QUEUE_URL", "RETRY_QUEUE_FILE", "ANALYTICS_DB_PATH"):
+            patch.delenv(name, raising=False)
+
+        lambda_function = importlib.import_module("lambda_function")
+        patch.setattr(lambda_function, "_runtime", None)
+        patch.setattr(lambda_function.AlphaVantageAPI, "RATE_LIMIT_DELAY", 0)
+        yield lambda_function
+
+
+def invoke(lambda_function, event_time):
+    response = lambda_function.lambda_handler({"time": event_time}, None)
+    assert response["statusCode"] == 200
+    return json.loads(response["body"])
+
+
+def test_runtime_reused_across_invocations(lambda_module):
+    runtime = lambda_module.get_runtime()
+    session = FakeSession()
+    runtime.api_client.session = runtime.api_client.http.session = session
+    api_client, s3_manager = runtime.api_client, runtime.s3_manager
+    response_cache, watermarks = runtime.api_client.response_cache, runtime.watermarks
+
+    first = invoke(lambda_module, "2024-01-16T15:00:00Z")
+    assert runtime.is_cold_start
+    assert first["quotes_new"] == first["quotes_successful"] > 0
+    stored_watermarks = dict(watermarks)
+    assert stored_watermarks and set(stored_watermarks.values()) == {BAR_TIME}
+    last_request_time = api_client.last_request_time
+    assert last_request_time > 0
+    calls_after_first = len(session.calls)
+
+    second = invoke(lambda_module, "2024-01-16T15:05:00Z")
+    third = invoke(lambda_module, "2024-01-16T15:10:00Z")
+
+    # Mesmo runtime, clientes, caches e watermarks
+    assert lambda_module.get_runtime() is runtime
+    assert runtime.invocations == 3 and not runtime.is_cold_start
+    assert runtime.api_client is api_client and api_client.session is session
+    assert runtime.s3_manager is s3_manager
+    assert api_client.response_cache is response_cache and response_cache
+    assert runtime.watermarks is watermarks and watermarks == stored_watermarks
+    assert api_client.last_request_time >= last_request_time
+    assert len(session.calls) > calls_after_first
+    # Fundamentais uma vez por dia por container
+    assert "OVERVIEW" not in session.calls[calls_after_first:]
+
+    # As barras já gravadas não são gravadas de novo
+    for result in (second, third):
+        assert result["quotes_successful"] > 0
+        assert result["quotes_new"] == 0